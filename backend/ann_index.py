@@ -0,0 +1,206 @@
+"""
+Approximate maximum-inner-product retrieval over the SVD item factors.
+
+Ranking a user's items only depends on pu . qi + bi, i.e. the inner product of
+[pu, 1] with [qi, bi]. Appending sqrt(M^2 - |x|^2) to every item vector turns
+that into a nearest-neighbour problem, which an inverted file (IVF) answers by
+clustering items with k-means and only scoring the clusters closest to the user.
+
+Build the index and compare it against exact scoring with:
+    python -m backend.ann_index build
+    python -m backend.ann_index benchmark --nprobe 1 2 4 8 16
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from backend.logging_config import get_logger
+from backend.scoring import top_k
+
+logger = get_logger("ANNIndex")
+
+
+def _augment_items(engine):
+    vectors = np.hstack([engine.qi, engine.bi[:, None]])
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    pad = np.sqrt(np.maximum(norms.max() - norms, 0.0))
+    return np.ascontiguousarray(np.hstack([vectors, pad[:, None]]), dtype=np.float32)
+
+
+def _kmeans(vectors, n_clusters, n_iter, seed):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        # argmin |x - c|^2 == argmax (x . c - |c|^2 / 2)
+        assignment = np.argmax(vectors @ centroids.T - 0.5 * np.einsum('ij,ij->i', centroids, centroids), axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return centroids, assignment
+
+
+class IVFIndex:
+    """Inverted file over augmented item factors.
+
+    The items of list l are `list_items[list_indptr[l]:list_indptr[l + 1]]`.
+    """
+
+    def __init__(self, centroids, list_indptr, list_items, model_version):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_indptr = np.asarray(list_indptr)
+        self.list_items = np.asarray(list_items)
+        self.model_version = str(model_version)
+        self._half_norms = 0.5 * np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, engine, model_version, n_lists=None, n_iter=15, seed=0):
+        vectors = _augment_items(engine)
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        centroids, assignment = _kmeans(vectors, n_lists, n_iter, seed)
+        order = np.argsort(assignment, kind='stable')
+        indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=indptr[1:])
+        return cls(centroids, indptr, order.astype(np.int32), model_version)
+
+    def save(self, path):
+        # Replaced rather than rewritten: registry copies of a version hard-link this file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_indptr=self.list_indptr,
+                list_items=self.list_items,
+                model_version=np.array(self.model_version),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['list_indptr'], data['list_items'], data['model_version'].item())
+
+    @classmethod
+    def open(cls, path, engine, model_version):
+        """Load the index saved at `path`, rebuilding and saving it if it is missing or stale.
+
+        Returns None if the file cannot be read, so the caller falls back to exact scoring.
+        """
+        try:
+            index = cls.load(path)
+        except FileNotFoundError:
+            logger.info(f"No IVF index at {path}; building one.")
+        except Exception as e:
+            logger.error(f"Failed to load IVF index at {path}: {e}; using exact scoring.")
+            return None
+        else:
+            if index.model_version == model_version:
+                logger.info(f"Loaded IVF index with {index.n_lists} lists from {path}.")
+                return index
+            logger.warning(f"IVF index at {path} was built from model {index.model_version}; rebuilding.")
+        index = cls.build(engine, model_version)
+        try:
+            index.save(path)
+        except OSError as e:
+            logger.error(f"Failed to save IVF index to {path}: {e}")
+        return index
+
+    def candidates(self, engine, user_id, nprobe):
+        """Item inner ids in the nprobe lists closest to the user."""
+        factors = engine.user_factors(user_id)
+        query = np.zeros(self.centroids.shape[1], dtype=np.float32)
+        if factors is not None:
+            query[:-2] = factors[0]
+        query[-2] = 1.0
+        lists = top_k(self.centroids @ query - self._half_norms, nprobe)
+        return np.concatenate([self.list_items[self.list_indptr[l]:self.list_indptr[l + 1]] for l in lists])
+
+    def _probe(self, engine, user_id, n, exclude, nprobe):
+        """Unexcluded candidates; the probe count (at least 1) is doubled until n are found."""
+        nprobe = max(1, nprobe)
+        while True:
+            items = self.candidates(engine, user_id, nprobe)
+            if exclude is not None:
+                items = items[~exclude[items]]
+            if len(items) >= n or nprobe >= self.n_lists:
+                return items
+            nprobe *= 2
+
+    def top_n(self, engine, user_id, n, exclude=None, nprobe=8):
+        """Approximate top-n item inner ids and clipped scores for a user, best first."""
+        items = self._probe(engine, user_id, n, exclude, nprobe)
+        scores = engine.score_items(user_id, items)
+        top = top_k(scores, n)
+        return items[top], engine.clip(scores[top])
+
+    def ranking(self, engine, user_id, n, exclude=None, nprobe=8):
+        """Every candidate of the lists probed for at least n items, best first.
+
+        Unlike top_n, its prefixes do not depend on how many items are asked for,
+        so pages sliced from it neither repeat nor skip items.
+        """
+        items = self._probe(engine, user_id, n, exclude, nprobe)
+        scores = engine.score_items(user_id, items)
+        return items[top_k(scores, len(items))]
+
+
+def benchmark(index, engine, rating_index, not_in_catalog, nprobes, n=10, n_users=200, seed=0):
+    """Recall@n and mean latency of the IVF index against exact scoring for sampled users."""
+    rng = np.random.default_rng(seed)
+    users = rng.choice(rating_index.user_ids, min(n_users, len(rating_index.user_ids)), replace=False)
+    masks = {u: rating_index.exclusion_mask(u, engine.n_items) | not_in_catalog for u in users}
+
+    started = time.perf_counter()
+    exact = {u: set(engine.top_n(u, n, masks[u])[0].tolist()) for u in users}
+    results = [{'mode': 'exact', 'nprobe': None, 'recall': 1.0,
+                'latency_ms': 1000 * (time.perf_counter() - started) / len(users)}]
+    for nprobe in nprobes:
+        hits = 0
+        started = time.perf_counter()
+        for u in users:
+            top, _ = index.top_n(engine, u, n, masks[u], nprobe=nprobe)
+            hits += len(exact[u] & set(top.tolist()))
+        elapsed = time.perf_counter() - started
+        results.append({'mode': 'ivf', 'nprobe': nprobe,
+                        'recall': hits / max(1, sum(len(e) for e in exact.values())),
+                        'latency_ms': 1000 * elapsed / len(users)})
+    return results
+
+
+def main():
+    from backend import recommender
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the IVF item index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Build the index and save it next to the model.")
+    build.add_argument('--lists', type=int, default=None, help="Number of k-means lists (default: sqrt(items)).")
+    bench = sub.add_parser('benchmark', help="Measure recall and latency against exact scoring.")
+    bench.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    bench.add_argument('--n', type=int, default=10)
+    bench.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    state = recommender.get_state()
+    if args.command == 'build':
+        index = IVFIndex.build(state.engine, state.trained_version, n_lists=args.lists)
+        index.save(recommender.ANN_INDEX_PATH)
+        logger.info(f"Saved IVF index with {index.n_lists} lists to {recommender.ANN_INDEX_PATH}")
+    else:
+        index = IVFIndex.open(recommender.ANN_INDEX_PATH, state.engine, state.trained_version)
+        results = benchmark(index, state.engine, state.rating_index, state.not_in_catalog,
+                            args.nprobe, n=args.n, n_users=args.users)
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,58 @@
 
-from fastapi import FastAPI, Request
+import asyncio
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.recommender import get_user_recommendations, get_genre_recommendations
-from backend.chatbot import chat_with_bot
-from backend.logging_config import get_logger
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from backend.recommender import (
+    get_user_recommendations,
+    get_genre_recommendations,
+    get_batch_user_recommendations,
+    stream_movie_descriptions,
+    search_movies,
+    get_popular_movies,
+    get_similar_movies,
+    active_model_version,
+    reload_state,
+    start_registry_watcher,
+    add_user_ratings,
+    compact_ratings,
+    start_ratings_compactor,
+    start_ratings_sync,
+    MODEL_REGISTRY_DIR,
+)
+from backend.model_registry import ModelRegistry
+from backend.chatbot import chat_with_bot, CHATBOT_POOL_SIZE, CHATBOT_MAX_PENDING, CHATBOT_TIMEOUT
+from backend.logging_config import SAMPLED, get_logger
+from backend import metrics
 
+# Admin endpoints require it in the X-Admin-Token header and are disabled while it is unset
+ADMIN_TOKEN = os.getenv('RECOMMENDER_ADMIN_TOKEN')
 
-app = FastAPI()
 logger = get_logger("BackendApp")
 
+
+@asynccontextmanager
+async def lifespan(app):
+    watcher = start_registry_watcher()
+    compactor = start_ratings_compactor()
+    sync = start_ratings_sync()
+    yield
+    for task in (watcher, compactor, sync):
+        if task is not None:
+            task.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,34 +61,186 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and times the whole request
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=metrics.SERVER_TIMING)
+
+# Agent runs are blocking, so they go to their own bounded pool instead of the event loop.
+# A slot is held from submission until the run finishes, even if the request timed out.
+chatbot_executor = ThreadPoolExecutor(max_workers=CHATBOT_POOL_SIZE, thread_name_prefix="chatbot")
+chatbot_slots = threading.BoundedSemaphore(CHATBOT_POOL_SIZE + CHATBOT_MAX_PENDING)
+
 @app.get("/recommend/user/{user_id}")
-def recommend_user(user_id: int, n: int = 10):
-    logger.info(f"Recommendation request for user_id: {user_id}, n: {n}")
+def recommend_user(user_id: int, n: int = 10, describe: bool = True,
+                   genres: Optional[List[str]] = Query(None), exclude_genres: Optional[List[str]] = Query(None),
+                   year_from: Optional[int] = None, year_to: Optional[int] = None,
+                   exclude: Optional[List[int]] = Query(None), cursor: Optional[str] = None):
+    logger.info(f"Recommendation request for user_id: {user_id}, n: {n}, describe: {describe}", extra=SAMPLED)
+    filters = {"genres": genres, "exclude_genres": exclude_genres, "year_from": year_from, "year_to": year_to,
+               "exclude": exclude}
     try:
-        result = get_user_recommendations(user_id, n)
-        logger.info(f"Recommendations for user {user_id}: {result}")
-        return result
+        return get_user_recommendations(user_id, n, describe, filters=filters, cursor=cursor)
     except Exception as e:
         logger.error(f"Error in recommend_user: {e}")
         return {"error": str(e)}
 
+@app.get("/recommend/similar/{movie_id}")
+def recommend_similar(movie_id: int, n: int = 10, genre_rerank: bool = False):
+    return get_similar_movies(movie_id, n, genre_rerank)
+
+@app.get("/movies/search")
+def movies_search(q: str = "", genre: Optional[str] = None, year_from: Optional[int] = None,
+                  year_to: Optional[int] = None, limit: int = 10):
+    return search_movies(q, genre, year_from, year_to, limit)
+
+@app.get("/movies/popular")
+def movies_popular(n: int = 10, by: str = "top_rated", genre: Optional[str] = None):
+    return get_popular_movies(n, by, genre)
+
+@app.get("/movies/descriptions")
+def movie_descriptions(movie_ids: List[int] = Query(...)):
+    """Stream one JSON line per movie as its description is served from cache or generated."""
+    lines = (json.dumps(update) + "\n" for update in stream_movie_descriptions(movie_ids))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[int]
+    n: int = 10
+
+@app.post("/recommend/users")
+def recommend_users(request: BatchRecommendationRequest):
+    """Stream one JSON line of recommendations per requested user."""
+    logger.info(f"Batch recommendation request for {len(request.user_ids)} users, n: {request.n}")
+    lines = (json.dumps(result) + "\n" for result in get_batch_user_recommendations(request.user_ids, request.n))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+class MovieRating(BaseModel):
+    movieId: int
+    rating: float
+
+class RatingsRequest(BaseModel):
+    user_id: int
+    ratings: List[MovieRating]
+
+@app.post("/ratings")
+def post_ratings(request: RatingsRequest):
+    """Record new ratings; the user's next recommendations already reflect them."""
+    logger.info(f"Ratings submitted for user_id: {request.user_id} ({len(request.ratings)} ratings)")
+    ratings = [{"movieId": rating.movieId, "rating": rating.rating} for rating in request.ratings]
+    return add_user_ratings(request.user_id, ratings)
+
 @app.get("/recommend/genre/{user_id}")
-def recommend_genre(user_id: int):
-    logger.info(f"Genre recommendation request for user_id: {user_id}")
+def recommend_genre(user_id: int, n: int = 1):
+    logger.info(f"Genre recommendation request for user_id: {user_id}, n: {n}", extra=SAMPLED)
     try:
-        result = get_genre_recommendations(user_id)
-        logger.info(f"Genre recommendations for user {user_id}: {result}")
-        return result
+        return get_genre_recommendations(user_id, n)
     except Exception as e:
         logger.error(f"Error in recommend_genre: {e}")
         return {"error": str(e)}
 
 
+def _run_chat(message):
+    try:
+        return chat_with_bot(message)
+    finally:
+        chatbot_slots.release()
+
+
 @app.post("/chatbot")
 async def chatbot_endpoint(request: Request):
     data = await request.json()
     user_message = data.get("message", "")
     logger.info(f"Chatbot endpoint called with message: {user_message}")
-    response = chat_with_bot(user_message)
-    logger.info(f"Chatbot structured response: {response}")
+    if not chatbot_slots.acquire(blocking=False):
+        logger.warning("Chatbot overloaded: all agent slots are busy.")
+        return JSONResponse(status_code=503, content={
+            "success": False,
+            "response": None,
+            "error": "The chatbot is busy right now. Please try again shortly.",
+            "validation_error": None
+        })
+    future = chatbot_executor.submit(_run_chat, user_message)
+    try:
+        response = await asyncio.wait_for(asyncio.wrap_future(future), timeout=CHATBOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"Chatbot timed out after {CHATBOT_TIMEOUT}s for message: {user_message}")
+        return JSONResponse(status_code=504, content={
+            "success": False,
+            "response": None,
+            "error": "The chatbot took too long to answer. Please try again.",
+            "validation_error": None
+        })
+    logger.info(f"Chatbot answered (success: {response.get('success')}, "
+                f"{len(response.get('response') or '')} chars)", extra=SAMPLED)
     return response
+
+
+def _admin_forbidden(token):
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={
+            "success": False, "error": "Admin endpoints are disabled: set RECOMMENDER_ADMIN_TOKEN."
+        })
+    if not hmac.compare_digest((token or '').encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse(status_code=403, content={"success": False, "error": "Invalid admin token."})
+    return None
+
+
+class ModelReloadRequest(BaseModel):
+    version: Optional[str] = None
+
+
+@app.get("/admin/model")
+def model_status(x_admin_token: Optional[str] = Header(None)):
+    forbidden = _admin_forbidden(x_admin_token)
+    if forbidden:
+        return forbidden
+    registry = ModelRegistry(MODEL_REGISTRY_DIR)
+    return {
+        "success": True,
+        "model_version": active_model_version(),
+        "registry_version": registry.current(),
+        "registry_versions": registry.versions(),
+        "error": None
+    }
+
+
+@app.post("/admin/model/reload")
+async def model_reload(request: Optional[ModelReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    """Load and warm a model version (default: the registry's active one) off the event loop, then swap it in."""
+    forbidden = _admin_forbidden(x_admin_token)
+    if forbidden:
+        return forbidden
+    version = request.version if request else None
+    logger.info(f"Model reload requested (version: {version or 'registry default'})")
+    try:
+        result = await asyncio.to_thread(reload_state, version)
+    except ValueError as e:
+        logger.warning(f"Model reload rejected: {e}")
+        return JSONResponse(status_code=404, content={
+            "success": False,
+            "model_version": active_model_version(),
+            "error": str(e)
+        })
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
+        return JSONResponse(status_code=500, content={
+            "success": False,
+            "model_version": active_model_version(),
+            "error": f"Model reload failed: {e}"
+        })
+    return {"success": True, **result, "error": None}
+
+
+@app.post("/admin/ratings/compact")
+async def ratings_compact(x_admin_token: Optional[str] = Header(None)):
+    """Merge the ratings log into the base ratings now instead of waiting for the periodic compaction."""
+    forbidden = _admin_forbidden(x_admin_token)
+    if forbidden:
+        return forbidden
+    return await asyncio.to_thread(compact_ratings)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Counters and latency histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,197 @@
+"""
+Compact binary artifacts of the model and data.
+
+The export turns movies.csv, ratings.csv and the pickled SVD into a directory of
+.npy arrays that the backend memory-maps instead of parsing CSVs and
+unpickling at startup, so every worker process shares the same pages through
+the OS page cache:
+
+    meta.json                   model version, global mean, rating scale
+    pu, qi, bu, bi              float32 factors and biases by inner id
+    user_ids, item_ids          raw ids by inner id
+    ratings_*                   ratings by user in CSR layout (int32 items, float32 values)
+    movie_ids, title_codes      int32 catalog columns; titles.json holds the title categories
+    movie_genre_*               genres of each movie in CSR layout; genres.json holds the names
+    genre_*                     genre -> item index used by the genre recommendations
+
+Export with:
+    python -m backend.artifacts export --out Model/artifacts
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from backend.logging_config import get_logger
+from backend.scoring import ScoringEngine
+from backend.ratings_index import RatingsIndex
+from backend.genre_index import GenreIndex
+
+ARTIFACT_FORMAT = 1
+
+logger = get_logger("Artifacts")
+
+
+def _save(path, name, array, dtype=None):
+    np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array, dtype=dtype))
+
+
+def _load(path, name):
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+
+def export_artifacts(state, out_dir):
+    """Write the engine, ratings index, catalog and genre index of a loaded state to `out_dir`."""
+    tmp_dir = out_dir.rstrip('/') + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    engine = state.engine
+    for name in ('pu', 'qi', 'bu', 'bi'):
+        _save(tmp_dir, name, getattr(engine, name), np.float32)
+    _save(tmp_dir, 'user_ids', engine.user_ids, np.int64)
+    _save(tmp_dir, 'item_ids', engine.item_ids, np.int64)
+
+    ratings = state.rating_index
+    _save(tmp_dir, 'ratings_user_ids', ratings.user_ids, np.int64)
+    _save(tmp_dir, 'ratings_indptr', ratings.indptr, np.int64)
+    _save(tmp_dir, 'ratings_indices', ratings.indices, np.int32)
+    _save(tmp_dir, 'ratings_values', ratings.values, np.float32)
+
+    movies = state.movies_df
+    titles = pd.Categorical(movies['title'].astype(str))
+    _save(tmp_dir, 'movie_ids', movies['movieId'], np.int32)
+    _save(tmp_dir, 'title_codes', titles.codes, np.int32)
+    genres = pd.Categorical(state.movies_df_expanded['genres'].fillna('(no genres listed)').astype(str))
+    counts = movies['genres'].map(len).to_numpy()
+    indptr = np.zeros(len(movies) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    _save(tmp_dir, 'movie_genre_indptr', indptr)
+    _save(tmp_dir, 'movie_genre_codes', genres.codes, np.int16)
+    with open(os.path.join(tmp_dir, 'titles.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(titles.categories), f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, 'genres.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(genres.categories), f, ensure_ascii=False)
+
+    genre_index = state.genre_index
+    _save(tmp_dir, 'genre_indptr', genre_index.indptr, np.int64)
+    _save(tmp_dir, 'genre_items', genre_index.items, np.int32)
+
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'model_version': state.model_version,
+        'global_mean': float(engine.global_mean),
+        'rating_scale': list(engine.rating_scale),
+        'n_users': int(len(engine.user_ids)),
+        'n_items': int(engine.n_items),
+        'n_factors': int(engine.qi.shape[1]),
+        'n_ratings': int(len(ratings.values)),
+        'genre_index_genres': list(genre_index.genres),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.rename(tmp_dir, out_dir)
+    logger.info(f"Exported artifacts for model {state.model_version} to {out_dir}")
+    return meta
+
+
+def write_ratings(path, rating_index, model_version=None):
+    """Replace the ratings arrays of an existing artifact directory, e.g. after ratings compaction.
+
+    Files are replaced, not rewritten, so processes that already mapped the old
+    arrays keep reading them and hard-linked copies are left alone. A new
+    `model_version` renames the directory's model (a registry copy); the name
+    the factors were published as is kept in meta['trained_version'].
+    """
+    arrays = {
+        'ratings_user_ids': (rating_index.user_ids, np.int64),
+        'ratings_indptr': (rating_index.indptr, np.int64),
+        'ratings_indices': (rating_index.indices, np.int32),
+        'ratings_values': (rating_index.values, np.float32),
+    }
+    for name, (array, dtype) in arrays.items():
+        _save(path, f"{name}.tmp", array, dtype)
+    for name in arrays:
+        os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    meta['n_ratings'] = int(len(rating_index.values))
+    meta['ratings_revision'] = meta.get('ratings_revision', 0) + 1
+    if model_version is not None:
+        meta['trained_version'] = meta.get('trained_version', meta['model_version'])
+        meta['model_version'] = model_version
+    with open(os.path.join(path, 'meta.json.tmp'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+
+
+def has_artifacts(path):
+    return os.path.exists(os.path.join(path, 'meta.json'))
+
+
+def load_ratings(path):
+    """Memory-map the ratings index of an artifact directory."""
+    rating_index = RatingsIndex(
+        _load(path, 'ratings_user_ids'), _load(path, 'ratings_indptr'),
+        _load(path, 'ratings_indices'), _load(path, 'ratings_values'),
+    )
+    if not rating_index.indptr[-1] == len(rating_index.indices) == len(rating_index.values):
+        raise ValueError(f"Inconsistent ratings arrays in {path}")
+    return rating_index
+
+
+def load_artifacts(path):
+    """Memory-map an artifact directory.
+
+    Returns (meta, engine, rating_index, movies_df, genre_index); movies_df has
+    'genres' split into lists and a categorical 'title'.
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format {meta.get('format')} in {path}")
+
+    engine = ScoringEngine(
+        _load(path, 'pu'), _load(path, 'qi'), _load(path, 'bu'), _load(path, 'bi'),
+        meta['global_mean'], _load(path, 'user_ids'), _load(path, 'item_ids'),
+        rating_scale=tuple(meta['rating_scale']),
+    )
+    rating_index = load_ratings(path)
+
+    with open(os.path.join(path, 'titles.json'), encoding='utf-8') as f:
+        titles = json.load(f)
+    with open(os.path.join(path, 'genres.json'), encoding='utf-8') as f:
+        genre_names = np.array(json.load(f), dtype=object)
+    indptr = _load(path, 'movie_genre_indptr')
+    genre_codes = _load(path, 'movie_genre_codes')
+    movie_genres = np.split(genre_names[genre_codes], indptr[1:-1])
+    movies_df = pd.DataFrame({
+        'movieId': _load(path, 'movie_ids'),
+        'title': pd.Categorical.from_codes(_load(path, 'title_codes'), categories=titles),
+        'genres': [genres.tolist() for genres in movie_genres],
+    })
+
+    genre_index = GenreIndex(meta['genre_index_genres'], _load(path, 'genre_indptr'), _load(path, 'genre_items'))
+    return meta, engine, rating_index, movies_df, genre_index
+
+
+def main():
+    from backend.recommender import ARTIFACT_DIR, load_state_from_csv
+
+    parser = argparse.ArgumentParser(description="Export the model and data as memory-mappable artifacts.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Convert the CSVs and pickled model into an artifact directory.")
+    export.add_argument('--out', default=ARTIFACT_DIR, help="Artifact directory to write.")
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_artifacts(load_state_from_csv(), args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+In-process search over the local movie catalog (movies.csv).
+
+Titles are normalized ("Godfather, The (1972)" -> "the godfather", year 1972)
+and indexed by character trigrams, so fuzzy title lookups and genre/year
+filters are answered without any network call.
+"""
+
+import re
+
+import numpy as np
+
+YEAR_PATTERN = re.compile(r'\((\d{4})\)')
+TRAILING_ARTICLE = re.compile(r'^(.*), (the|a|an|les|la|le|il|el|das|der|die)$')
+DECADE_PATTERN = re.compile(r'\b(\d{3})0s\b')
+STANDALONE_YEAR = re.compile(r'\b(18\d\d|19\d\d|20\d\d)\b')
+FILLER_WORDS = re.compile(r'\b(find|show|tell|give|me|about|some|good|movie|movies|film|films|on imdb)\b|[?!.]')
+
+
+def split_title(title):
+    """Normalized title and release year (or None) of a catalog title."""
+    years = YEAR_PATTERN.findall(title)
+    year = int(years[-1]) if years else None
+    name = YEAR_PATTERN.sub(' ', title)
+    name = re.sub(r'[^\w\s,]', ' ', name.lower())
+    name = ' '.join(name.split())
+    # "godfather, the" -> "the godfather"
+    match = TRAILING_ARTICLE.match(name)
+    if match:
+        name = f"{match.group(2)} {match.group(1)}"
+    return name.replace(',', ''), year
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """Trigram postings over normalized titles plus genre and year filters."""
+
+    def __init__(self, movie_ids, titles, names, years, genres, popularity=None):
+        self.movie_ids = np.asarray(movie_ids)
+        self.titles = list(titles)
+        self.names = list(names)
+        self.years = np.asarray([-1 if y is None else y for y in years], dtype=np.int32)
+        self.genres = [list(g) for g in genres]
+        self.popularity = np.zeros(len(self.titles)) if popularity is None else np.asarray(popularity, dtype=float)
+        self._name_rows = {}
+        postings = {}
+        self._gram_counts = np.zeros(len(self.names), dtype=np.int32)
+        for row, name in enumerate(self.names):
+            self._name_rows.setdefault(name, []).append(row)
+            grams = trigrams(name)
+            self._gram_counts[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self._postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        genre_rows = {}
+        for row, movie_genres in enumerate(self.genres):
+            for genre in movie_genres:
+                genre_rows.setdefault(genre.lower(), []).append(row)
+        self._genre_rows = {genre: np.asarray(rows, dtype=np.int32) for genre, rows in genre_rows.items()}
+        self.genre_names = sorted({g for movie_genres in self.genres for g in movie_genres})
+
+    @classmethod
+    def from_frame(cls, movies_df, popularity=None):
+        """Build from movies_df with 'genres' already split into lists."""
+        split = [split_title(title) for title in movies_df['title']]
+        return cls(
+            movies_df['movieId'].to_numpy(),
+            movies_df['title'].tolist(),
+            [name for name, _ in split],
+            [year for _, year in split],
+            movies_df['genres'].tolist(),
+            popularity,
+        )
+
+    def _filter(self, genre, year_from, year_to):
+        mask = np.ones(len(self.titles), dtype=bool)
+        if genre:
+            mask[:] = False
+            mask[self._genre_rows.get(genre.lower(), np.empty(0, dtype=np.int32))] = True
+        if year_from is not None:
+            mask &= self.years >= year_from
+        if year_to is not None:
+            mask &= (self.years <= year_to) & (self.years >= 0)
+        return mask
+
+    def search(self, query='', genre=None, year_from=None, year_to=None, limit=10, min_similarity=0.3):
+        """Best matching catalog rows as dicts, most similar (then most rated) first.
+
+        Without a query, movies passing the filters are ranked by popularity.
+        """
+        mask = self._filter(genre, year_from, year_to)
+        name, _ = split_title(query or '')
+        if name:
+            similarity = np.zeros(len(self.titles))
+            exact = self._name_rows.get(name)
+            query_grams = trigrams(name)
+            hits = [self._postings[g] for g in query_grams if g in self._postings]
+            if hits:
+                shared = np.bincount(np.concatenate(hits), minlength=len(self.titles))
+                similarity = shared / (len(query_grams) + self._gram_counts - shared)
+            if exact:
+                similarity[exact] = 1.0
+            mask &= similarity >= min_similarity
+        else:
+            similarity = np.zeros(len(self.titles))
+        rows = np.flatnonzero(mask)
+        order = np.lexsort((-self.popularity[rows], -similarity[rows]))[:limit]
+        return [
+            {
+                "movieId": int(self.movie_ids[row]),
+                "title": self.titles[row],
+                "year": None if self.years[row] < 0 else int(self.years[row]),
+                "genres": self.genres[row],
+                "score": round(float(similarity[row]), 3),
+            }
+            for row in rows[order]
+        ]
+
+    def parse_query(self, text):
+        """Split free text like "a comedy from the 1990s" into search() keyword arguments.
+
+        Genre names and years or decades are turned into filters; what is left is the title query.
+        """
+        rest = text.lower()
+        kwargs = {}
+        for genre in sorted(self.genre_names, key=len, reverse=True):
+            pattern = re.compile(rf'\b{re.escape(genre.lower())}\b')
+            if genre != '(no genres listed)' and pattern.search(rest):
+                kwargs['genre'] = genre
+                rest = pattern.sub(' ', rest)
+                break
+        decade = DECADE_PATTERN.search(rest)
+        if decade:
+            kwargs['year_from'] = int(decade.group(1)) * 10
+            kwargs['year_to'] = kwargs['year_from'] + 9
+            rest = DECADE_PATTERN.sub(' ', rest)
+        else:
+            year = STANDALONE_YEAR.search(rest)
+            if year:
+                kwargs['year_from'] = kwargs['year_to'] = int(year.group(1))
+                rest = STANDALONE_YEAR.sub(' ', rest)
+        rest = FILLER_WORDS.sub(' ', rest)
+        if kwargs:
+            # With a filter, a leftover article or preposition is not a title ("a comedy from the 1990s")
+            rest = re.sub(r'^(?:\s*\b(?:a|an|the|from|in|of)\b)+\s*$', ' ', rest)
+        kwargs['query'] = ' '.join(rest.split())
+        return kwargs
@@ -2,22 +2,57 @@ from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.tools import Tool
 from langchain.agents import initialize_agent, AgentType
+from langchain_core.callbacks import BaseCallbackHandler
+import logging
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
-from backend.logging_config import get_logger
-from backend.imdb_utils import search_imdb
+from backend.logging_config import SAMPLED, get_logger
+from backend.imdb_utils import search_imdb, search_imdb_async
+from backend.metrics import AGENT_TOOL_CALLS, AGENT_TOOL_HOPS, LLM_CALLS, stage
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Agents kept ready for concurrent requests; also the number of agent runs at once
+CHATBOT_POOL_SIZE = int(os.getenv('CHATBOT_POOL_SIZE', '4'))
+# Requests allowed to wait for a free agent before the endpoint reports overload
+CHATBOT_MAX_PENDING = int(os.getenv('CHATBOT_MAX_PENDING', '8'))
+# Seconds an agent run may take before the endpoint gives up on it
+CHATBOT_TIMEOUT = float(os.getenv('CHATBOT_TIMEOUT', '60'))
+# Seconds to wait before trying to build the agents again after the LLM failed to initialize
+AGENT_RETRY_INTERVAL = 60.0
+
+def summarize_imdb_result(result):
+    """Short form of an OMDb result for the logs."""
+    if isinstance(result, dict):
+        if 'error' in result or result.get('Response') == 'False':
+            return f"error: {result.get('error') or result.get('Error')}"
+        return f"{result.get('Title')} ({result.get('Year')})"
+    return f"{type(result).__name__} result"
+
 # Define IMDB as a LangChain tool
 def imdb_tool_func(query: str) -> str:
     """Search IMDB for movie information."""
     logger = get_logger("IMDBTool")
     try:
         result = search_imdb(query)
-        logger.info(f"IMDB search for query: {query} | Result: {result}")
+        logger.info(f"IMDB search for query: {query} | {summarize_imdb_result(result)}", extra=SAMPLED)
+        return str(result)
+    except Exception as e:
+        logger.error(f"IMDB search failed for query '{query}': {e}")
+        return f"IMDB search error: {e}"
+
+async def imdb_tool_coro(query: str) -> str:
+    """Search IMDB for movie information without blocking the event loop."""
+    logger = get_logger("IMDBTool")
+    try:
+        result = await search_imdb_async(query)
+        logger.info(f"IMDB search for query: {query} | {summarize_imdb_result(result)}", extra=SAMPLED)
         return str(result)
     except Exception as e:
         logger.error(f"IMDB search failed for query '{query}': {e}")
@@ -26,9 +61,39 @@ def imdb_tool_func(query: str) -> str:
 imdb_tool = Tool(
     name="IMDB Search",
     func=imdb_tool_func,
+    coroutine=imdb_tool_coro,
     description="Useful for searching movie information from IMDB."
 )
 
+def catalog_tool_func(query: str) -> str:
+    """Search the local movie catalog by title, genre and year."""
+    logger = get_logger("CatalogTool")
+    try:
+        # Imported here: the catalog index is built from the recommender data
+        from backend.recommender import get_state
+        catalog_index = get_state().catalog_index
+        with stage('catalog_tool'):
+            results = catalog_index.search(**catalog_index.parse_query(query), limit=5)
+        logger.info(f"Catalog search for query: {query} | {len(results)} results", extra=SAMPLED)
+        if not results:
+            return "No matching movies in the local catalog."
+        return "\n".join(
+            f"{r['title']} | movieId {r['movieId']} | genres: {', '.join(r['genres'])}" for r in results
+        )
+    except Exception as e:
+        logger.error(f"Catalog search failed for query '{query}': {e}")
+        return f"Catalog search error: {e}"
+
+catalog_tool = Tool(
+    name="Movie Catalog Search",
+    func=catalog_tool_func,
+    description=(
+        "Use this first. Instantly looks up movies in the local catalog by title, genre and year "
+        "(e.g. 'Inception', 'comedy', 'horror 1990s') and returns titles, years and genres. "
+        "Only use the other tools for details the catalog does not have, such as plot, cast or directors."
+    )
+)
+
 duckduckgo_tool = DuckDuckGoSearchRun()
 
 # Lazy-load Gemini LLM to avoid import-time credential errors
@@ -42,25 +107,75 @@ def get_llm():
 
 
 
-def get_agent():
-    llm = get_llm()
-    if llm is None:
-        return None
+def build_agent(llm):
     return initialize_agent(
-        [imdb_tool, duckduckgo_tool],
+        [catalog_tool, imdb_tool, duckduckgo_tool],
         llm,
         agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
         verbose=False
     )
 
 
+_agent_pool = None
+_agent_pool_failed_at = None
+_agent_pool_lock = threading.Lock()
+
+
+def get_agent_pool():
+    """Queue of CHATBOT_POOL_SIZE agents sharing one Gemini client, built on first use.
+
+    Returns None if the LLM is not configured; building is then retried after
+    AGENT_RETRY_INTERVAL seconds instead of on every message.
+    """
+    global _agent_pool, _agent_pool_failed_at
+    with _agent_pool_lock:
+        if _agent_pool is None:
+            if _agent_pool_failed_at is not None and time.monotonic() - _agent_pool_failed_at < AGENT_RETRY_INTERVAL:
+                return None
+            llm = get_llm()
+            if llm is None:
+                _agent_pool_failed_at = time.monotonic()
+                return None
+            pool = queue.Queue()
+            for _ in range(CHATBOT_POOL_SIZE):
+                pool.put(build_agent(llm))
+            _agent_pool = pool
+        return _agent_pool
+
+
+class AgentMetrics(BaseCallbackHandler):
+    """Counts the LLM calls and tool hops of one agent run."""
+
+    def __init__(self):
+        self.tool_hops = 0
+
+    def on_llm_end(self, response, **kwargs):
+        LLM_CALLS.inc('chatbot', 'ok')
+
+    def on_llm_error(self, error, **kwargs):
+        LLM_CALLS.inc('chatbot', 'error')
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tool_hops += 1
+        AGENT_TOOL_CALLS.inc((serialized or {}).get('name') or 'unknown')
+
+
+@contextmanager
+def borrowed_agent(pool, timeout=CHATBOT_TIMEOUT):
+    """Take an agent out of the pool for one run and put it back afterwards."""
+    agent = pool.get(timeout=timeout)
+    try:
+        yield agent
+    finally:
+        pool.put(agent)
+
+
 
 def chat_with_bot(message: str) -> dict:
     """Chat with the AI agent using LangChain, Gemini, DuckDuckGo, and IMDB.
     Returns a structured dict with keys: success, response, error (if any), validation_error (if any).
     """
     logger = get_logger("Chatbot")
-    agent = get_agent()
     if not isinstance(message, str) or not message.strip():
         logger.error("Validation error: Input message must be a non-empty string.")
         return {
@@ -69,7 +184,8 @@ def chat_with_bot(message: str) -> dict:
             "error": None,
             "validation_error": "Input message must be a non-empty string."
         }
-    if agent is None:
+    pool = get_agent_pool()
+    if pool is None:
         logger.error("Gemini LLM is not configured. Please set up Google credentials.")
         return {
             "success": False,
@@ -79,14 +195,18 @@ def chat_with_bot(message: str) -> dict:
         }
     try:
         logger.info(f"User message: {message}")
-        response = agent.invoke({"input": message})
+        agent_metrics = AgentMetrics()
+        with borrowed_agent(pool) as agent, stage('chat_agent'):
+            response = agent.invoke({"input": message}, config={"callbacks": [agent_metrics]})
+        AGENT_TOOL_HOPS.observe(agent_metrics.tool_hops)
         # If the response is a dict (as with new agent API), extract 'output' or 'result'
         if isinstance(response, dict):
-            logger.info(f"Agent response: {response}")
             output = response.get("output") or response.get("result") or str(response)
         else:
-            logger.info(f"Agent response: {response}")
             output = str(response)
+        logger.info(f"Agent answered in {agent_metrics.tool_hops} tool calls ({len(output)} chars)", extra=SAMPLED)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Agent response: {response}")
         return {
             "success": True,
             "response": output,
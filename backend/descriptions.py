@@ -0,0 +1,394 @@
+"""
+LLM movie descriptions behind a two-tier cache.
+
+Descriptions are looked up in an in-process LRU, then in a SQLite store keyed by
+(movieId, PROMPT_VERSION), and only generated by the LLM on a miss. Bump
+PROMPT_VERSION whenever the prompt changes so stale descriptions are not served.
+
+Pre-generate descriptions for the most recommended titles with:
+    python -m backend.descriptions warm --top 500
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed
+
+import numpy as np
+
+from backend.logging_config import get_logger
+from backend.lru_cache import LRUCache
+from backend.metrics import LLM_CALLS, count_cache, stage
+
+PROMPT_VERSION = 'v1'
+DESCRIPTION_DB_PATH = os.getenv('DESCRIPTION_DB_PATH', 'Data/descriptions.sqlite')
+DESCRIPTION_CACHE_SIZE = int(os.getenv('DESCRIPTION_CACHE_SIZE', '4096'))
+DESCRIPTION_CACHE_TTL = float(os.getenv('DESCRIPTION_CACHE_TTL', str(24 * 3600)))
+DESCRIPTION_WORKERS = int(os.getenv('DESCRIPTION_WORKERS', '8'))
+# Seconds a recommendation request waits for descriptions that are not cached
+DESCRIPTION_DEADLINE = float(os.getenv('DESCRIPTION_DEADLINE', '5'))
+# Cache misses of one request are described DESCRIPTION_BATCH_SIZE at a time in a single prompt
+DESCRIPTION_BATCH_SIZE = int(os.getenv('DESCRIPTION_BATCH_SIZE', '20'))
+# Prompts sent per batch: the first one plus retries for titles missing from the reply
+DESCRIPTION_BATCH_ATTEMPTS = 3
+# Seconds to wait before trying to build the LLM client again after it failed
+LLM_RETRY_INTERVAL = 60.0
+
+UNAVAILABLE_NOT_CONFIGURED = "Description unavailable (LLM not configured)."
+UNAVAILABLE_ERROR = "Description unavailable (error)."
+PENDING = "Description is still being generated."
+
+logger = get_logger("MovieDescription")
+
+
+def build_prompt(title):
+    return f"Give a concise, engaging description of the movie '{title}'. Limit to 2-3 sentences."
+
+
+def build_batch_prompt(movies):
+    lines = "\n".join(f"- {movie_id}: {title}" for movie_id, title in movies)
+    return (
+        "Give a concise, engaging description of each movie below. Limit each to 2-3 sentences.\n"
+        "Reply with only a JSON object mapping each movie id (as a string) to its description.\n"
+        f"{lines}"
+    )
+
+
+def parse_batch_response(text, movie_ids):
+    """Descriptions for the expected movie ids found in a batch reply; anything malformed is left out."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    descriptions = {}
+    for movie_id in movie_ids:
+        description = data.get(str(movie_id))
+        if isinstance(description, str) and description.strip():
+            descriptions[movie_id] = description.strip()
+    return descriptions
+
+
+def response_text(response):
+    """Extract the text of an LLM or agent response."""
+    if isinstance(response, dict):
+        return response.get("output") or response.get("result") or str(response)
+    content = getattr(response, "content", None)
+    if isinstance(content, str):
+        return content
+    return str(response)
+
+
+class DescriptionStore:
+    """Persistent description store backed by SQLite."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS descriptions ("
+                " movie_id INTEGER NOT NULL,"
+                " prompt_version TEXT NOT NULL,"
+                " description TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (movie_id, prompt_version))"
+            )
+
+    def get(self, movie_id, prompt_version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM descriptions WHERE movie_id = ? AND prompt_version = ?",
+                (int(movie_id), prompt_version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, movie_id, prompt_version, description):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?)",
+                (int(movie_id), prompt_version, description, time.time()),
+            )
+
+
+def _default_llm_factory():
+    from backend.chatbot import get_llm
+    return get_llm()
+
+
+class DescriptionCache:
+    """Movie descriptions served from the LRU, then the store, then the LLM.
+
+    `llm_factory` returns an object with an `invoke(prompt)` method, or None when
+    no LLM is configured; the client it returns is built once and reused, and
+    a failed build is only retried after LLM_RETRY_INTERVAL seconds.
+    Placeholders returned on failure are never cached.
+
+    Misses are generated on a bounded worker pool, several titles per prompt;
+    concurrent requests for the same movie share one in-flight generation.
+    """
+
+    def __init__(self, store, lru=None, llm_factory=_default_llm_factory, prompt_version=PROMPT_VERSION,
+                 workers=DESCRIPTION_WORKERS):
+        self.store = store
+        self.lru = lru if lru is not None else LRUCache(DESCRIPTION_CACHE_SIZE, DESCRIPTION_CACHE_TTL)
+        self.llm_factory = llm_factory
+        self.prompt_version = prompt_version
+        self._llm = None
+        self._llm_failed_at = None
+        self._llm_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="description")
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def llm(self):
+        with self._llm_lock:
+            if self._llm is None:
+                if self._llm_failed_at is not None and time.monotonic() - self._llm_failed_at < LLM_RETRY_INTERVAL:
+                    return None
+                self._llm = self.llm_factory()
+                self._llm_failed_at = time.monotonic() if self._llm is None else None
+            return self._llm
+
+    def cached(self, movie_id):
+        """Cached description of a movie, or None on a miss in both tiers."""
+        key = (int(movie_id), self.prompt_version)
+        description = self.lru.get(key)
+        count_cache('description_lru', description is not None)
+        if description is None:
+            description = self.store.get(movie_id, self.prompt_version)
+            count_cache('description_store', description is not None)
+            if description is not None:
+                self.lru.set(key, description)
+        return description
+
+    def remember(self, movie_id, description):
+        self.store.put(movie_id, self.prompt_version, description)
+        self.lru.set((int(movie_id), self.prompt_version), description)
+
+    def generate(self, title):
+        """Ask the LLM for a description; returns None on failure."""
+        llm = self.llm()
+        if llm is None:
+            return None
+        try:
+            with stage('llm_describe'):
+                description = response_text(llm.invoke(build_prompt(title))).strip()
+            LLM_CALLS.inc('description', 'ok')
+            return description or None
+        except Exception as e:
+            LLM_CALLS.inc('description', 'error')
+            logger.error(f"Failed to get description for '{title}': {e}")
+            return None
+
+    def fetch(self, movie_id, title):
+        """Generate and cache a description; returns (description, status) with status "fetched" or "failed"."""
+        description = self.generate(title)
+        if description is None:
+            return (UNAVAILABLE_NOT_CONFIGURED if self._llm is None else UNAVAILABLE_ERROR), "failed"
+        self.remember(movie_id, description)
+        return description, "fetched"
+
+    def get(self, movie_id, title):
+        description = self.cached(movie_id)
+        if description is not None:
+            return description
+        return self.fetch(movie_id, title)[0]
+
+    def generate_batch(self, movies):
+        """Describe (movie_id, title) pairs with one prompt per attempt.
+
+        Only movies missing or malformed in a reply are asked for again, up to
+        DESCRIPTION_BATCH_ATTEMPTS prompts. Returns movie_id -> description for the
+        movies that succeeded.
+        """
+        llm = self.llm()
+        if llm is None:
+            return {}
+        descriptions = {}
+        remaining = list(movies)
+        for _ in range(DESCRIPTION_BATCH_ATTEMPTS):
+            try:
+                with stage('llm_describe_batch'):
+                    reply = response_text(llm.invoke(build_batch_prompt(remaining)))
+                LLM_CALLS.inc('description_batch', 'ok')
+            except Exception as e:
+                LLM_CALLS.inc('description_batch', 'error')
+                logger.error(f"Failed to get descriptions for {len(remaining)} movies: {e}")
+                continue
+            descriptions.update(parse_batch_response(reply, [movie_id for movie_id, _ in remaining]))
+            remaining = [(movie_id, title) for movie_id, title in remaining if movie_id not in descriptions]
+            if not remaining:
+                break
+        return descriptions
+
+    def fetch_batch(self, movies):
+        """Generate and cache descriptions; returns movie_id -> (description, status) like fetch()."""
+        if len(movies) == 1:
+            movie_id, title = movies[0]
+            return {movie_id: self.fetch(movie_id, title)}
+        descriptions = self.generate_batch(movies)
+        placeholder = UNAVAILABLE_NOT_CONFIGURED if self._llm is None else UNAVAILABLE_ERROR
+        results = {}
+        for movie_id, _ in movies:
+            if movie_id in descriptions:
+                self.remember(movie_id, descriptions[movie_id])
+                results[movie_id] = (descriptions[movie_id], "fetched")
+            else:
+                results[movie_id] = (placeholder, "failed")
+        return results
+
+    def fetch_async(self, movie_id, title):
+        """Future of fetch() run on the worker pool, shared with any identical in-flight request."""
+        return self.fetch_many_async([(movie_id, title)])[movie_id]
+
+    def fetch_many_async(self, movies):
+        """Futures of (description, status) per movie id, generated DESCRIPTION_BATCH_SIZE per prompt.
+
+        Movies already being generated for another request share that request's future.
+        """
+        futures = {}
+        new = []
+        with self._inflight_lock:
+            for movie_id, title in movies:
+                future = self._inflight.get(int(movie_id))
+                if future is None:
+                    future = Future()
+                    self._inflight[int(movie_id)] = future
+                    new.append((movie_id, title))
+                futures[movie_id] = future
+        for start in range(0, len(new), DESCRIPTION_BATCH_SIZE):
+            batch = new[start:start + DESCRIPTION_BATCH_SIZE]
+            self._executor.submit(self._run_batch, batch, {movie_id: futures[movie_id] for movie_id, _ in batch})
+        return futures
+
+    def _run_batch(self, batch, futures):
+        try:
+            results = self.fetch_batch(batch)
+        except Exception as e:
+            logger.error(f"Description batch failed: {e}")
+            results = {}
+        with self._inflight_lock:
+            for movie_id, future in futures.items():
+                if self._inflight.get(int(movie_id)) is future:
+                    del self._inflight[int(movie_id)]
+        for movie_id, future in futures.items():
+            future.set_result(results.get(movie_id, (UNAVAILABLE_ERROR, "failed")))
+
+    def describe_iter(self, movies, deadline=DESCRIPTION_DEADLINE):
+        """Yield (movie_id, description, status) for (movie_id, title) pairs as they resolve.
+
+        Cached descriptions come first, then misses in the order they finish.
+        Status is "cached", "fetched", "failed" or "timed_out"; movies still missing
+        after `deadline` seconds get the PENDING placeholder and keep generating in
+        the background, so a later request finds them in the cache.
+        """
+        misses = []
+        for movie_id, title in movies:
+            description = self.cached(movie_id)
+            if description is not None:
+                yield movie_id, description, "cached"
+            else:
+                misses.append((movie_id, title))
+        futures = {future: movie_id for movie_id, future in self.fetch_many_async(misses).items()}
+        pending = set(futures.values())
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                movie_id = futures[future]
+                pending.discard(movie_id)
+                yield (movie_id,) + future.result()
+        except TimeoutError:
+            for movie_id in pending:
+                yield movie_id, PENDING, "timed_out"
+
+    def describe(self, movies, deadline=DESCRIPTION_DEADLINE):
+        """Descriptions of (movie_id, title) pairs, waiting at most `deadline` seconds for misses.
+
+        Returns a dict movie_id -> (description, status) and counts per status (see describe_iter).
+        """
+        results = {}
+        stats = {"cached": 0, "fetched": 0, "failed": 0, "timed_out": 0}
+        for movie_id, description, status in self.describe_iter(movies, deadline):
+            results[movie_id] = (description, status)
+            stats[status] += 1
+        return results, stats
+
+
+_description_cache = None
+_description_cache_lock = threading.Lock()
+
+
+def get_description_cache():
+    """Process-wide description cache, created on first use."""
+    global _description_cache
+    with _description_cache_lock:
+        if _description_cache is None:
+            _description_cache = DescriptionCache(DescriptionStore(DESCRIPTION_DB_PATH))
+        return _description_cache
+
+
+def most_recommended_movies(top, n=10):
+    """Movie ids ordered by how often they appear in users' top-n recommendations.
+
+    Uses the precomputed top-K store when there is one, otherwise the most rated movies.
+    """
+    from backend import recommender
+
+    state = recommender.get_state()
+    store = state.topk_store
+    if store is not None:
+        ids = np.asarray(store.records['ids'][:, :min(n, store.k)]).ravel()
+        ids = ids[ids >= 0]
+    else:
+        ids = state.engine.item_ids[state.rating_index.indices]
+    movie_ids, counts = np.unique(ids, return_counts=True)
+    return movie_ids[np.argsort(-counts, kind='stable')][:top].tolist()
+
+
+def warm(top, cache=None, batch_size=DESCRIPTION_BATCH_SIZE):
+    """Pre-generate descriptions for the `top` most recommended movies, `batch_size` titles per prompt."""
+    from backend import recommender
+
+    cache = cache or get_description_cache()
+    movies_by_id = recommender.get_state().movies_by_id
+    misses = []
+    skipped = 0
+    for movie_id in most_recommended_movies(top):
+        if movie_id not in movies_by_id.index or cache.cached(movie_id) is not None:
+            skipped += 1
+        else:
+            misses.append((movie_id, movies_by_id.at[movie_id, 'title']))
+    generated = failed = 0
+    for start in range(0, len(misses), batch_size):
+        results = cache.fetch_batch(misses[start:start + batch_size])
+        fetched = sum(status == "fetched" for _, status in results.values())
+        generated += fetched
+        failed += len(results) - fetched
+    logger.info(f"Description warm-up: {generated} generated, {skipped} skipped, {failed} failed.")
+    return {"generated": generated, "skipped": skipped, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the movie description cache.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    warm_parser = sub.add_parser('warm', help="Pre-generate descriptions for the most recommended movies.")
+    warm_parser.add_argument('--top', type=int, default=500, help="Number of movies to warm.")
+    warm_parser.add_argument('--batch-size', type=int, default=DESCRIPTION_BATCH_SIZE, help="Titles per prompt.")
+    args = parser.parse_args()
+    if args.command == 'warm':
+        warm(args.top, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
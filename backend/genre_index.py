@@ -0,0 +1,44 @@
+import numpy as np
+
+from backend.scoring import top_k
+
+
+class GenreIndex:
+    """Genre -> item incidence in CSR layout.
+
+    The items of genre g (`genres[g]`) are `items[indptr[g]:indptr[g + 1]]`, as
+    inner ids on the scoring engine's item axis. A movie appears under every
+    genre it has.
+    """
+
+    def __init__(self, genres, indptr, items):
+        self.genres = list(genres)
+        self.indptr = np.asarray(indptr)
+        self.items = np.asarray(items)
+
+    @classmethod
+    def from_frame(cls, movies_df_expanded, item_index):
+        """Build the index from movies exploded to one row per (movie, genre).
+
+        Movies the model was not trained on are left out: they would all get the
+        same baseline estimate.
+        """
+        genres = movies_df_expanded['genres'].to_numpy(dtype=object)
+        items = item_index(movies_df_expanded['movieId'].to_numpy())
+        keep = items >= 0
+        names, codes = np.unique(genres[keep].astype(str), return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(names)), out=indptr[1:])
+        return cls(names.tolist(), indptr, items[keep][order].astype(np.int32))
+
+    def top_n(self, scores, n, exclude=None):
+        """Yield (genre, item inner ids) with each genre's top-n unexcluded items, best first."""
+        for g, genre in enumerate(self.genres):
+            items = self.items[self.indptr[g]:self.indptr[g + 1]]
+            genre_scores = scores[items]
+            if exclude is not None:
+                genre_scores = np.where(exclude[items], -np.inf, genre_scores)
+            top = top_k(genre_scores, n)
+            if len(top):
+                yield genre, items[top]
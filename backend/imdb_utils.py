@@ -1,22 +1,133 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
 
 import requests
-from backend.logging_config import get_logger
+from requests.adapters import HTTPAdapter
+
+from backend.logging_config import SAMPLED, get_logger
+from backend.lru_cache import LRUCache
+from backend.metrics import REGISTRY, count_cache, stage
+
+# Uses the OMDb API (http://www.omdbapi.com/) for IMDB data.
+# Set your OMDb API key in the IMDB_API_KEY environment variable.
+OMDB_BASE_URL = os.getenv('OMDB_BASE_URL', 'http://www.omdbapi.com/')
+IMDB_CONNECT_TIMEOUT = float(os.getenv('IMDB_CONNECT_TIMEOUT', '3'))
+IMDB_READ_TIMEOUT = float(os.getenv('IMDB_READ_TIMEOUT', '10'))
+IMDB_CACHE_SIZE = int(os.getenv('IMDB_CACHE_SIZE', '1024'))
+IMDB_CACHE_TTL = float(os.getenv('IMDB_CACHE_TTL', str(6 * 3600)))
+# Seconds OMDb's "Movie not found!" answers are cached; other OMDb errors are never cached
+IMDB_NOT_FOUND_TTL = float(os.getenv('IMDB_NOT_FOUND_TTL', '600'))
+IMDB_POOL_SIZE = 10
+
+logger = get_logger("IMDBUtils")
+
+IMDB_COALESCED = REGISTRY.counter('imdb_coalesced_lookups_total', "IMDB lookups that waited on an identical in-flight one.")
+
+
+def normalize_title(query):
+    """Cache key for a title lookup: case and whitespace do not matter."""
+    return " ".join(str(query).lower().split())
+
+
+class OMDbClient:
+    """OMDb title lookups over a pooled session with timeouts, a TTL cache and
+    single-flight coalescing of concurrent identical lookups.
+
+    Only found titles are cached for the full TTL, and "Movie not found!"
+    answers for a short one. OMDb also reports errors such as an invalid key or
+    a reached request limit as HTTP 200 replies with "Response": "False"; those
+    are never cached.
+    """
+
+    def __init__(self, api_key=None, base_url=OMDB_BASE_URL, timeout=(IMDB_CONNECT_TIMEOUT, IMDB_READ_TIMEOUT),
+                 cache=None, pool_size=IMDB_POOL_SIZE):
+        self.api_key = api_key or os.getenv('IMDB_API_KEY', 'demo')
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache if cache is not None else LRUCache(IMDB_CACHE_SIZE, IMDB_CACHE_TTL)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def search(self, query):
+        key = normalize_title(query)
+        result = self.cache.get(key)
+        count_cache('imdb', result is not None)
+        if result is not None:
+            logger.info(f"IMDB cache hit for query '{query}'", extra=SAMPLED)
+            return result
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            IMDB_COALESCED.inc()
+            with stage('imdb_wait'):
+                return future.result()
+        try:
+            with stage('imdb_fetch'):
+                result, ttl = self._fetch(query)
+            if ttl:
+                self.cache.set(key, result, ttl)
+        except Exception as e:
+            result = {'error': str(e)}
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        future.set_result(result)
+        return result
+
+    async def search_async(self, query):
+        return await asyncio.to_thread(self.search, query)
+
+    def _fetch(self, query):
+        """Call OMDb; returns the result and the seconds it may be cached for (None: not at all)."""
+        try:
+            response = self.session.get(
+                self.base_url,
+                params={'apikey': self.api_key, 't': query},
+                timeout=self.timeout,
+            )
+            if response.status_code != 200:
+                logger.error(f"IMDB API error for query '{query}': {response.status_code}")
+                return {'error': 'IMDB API error'}, None
+            data = response.json()
+            if data.get('Response') == 'True':
+                logger.info(f"IMDB API success for query '{query}'", extra=SAMPLED)
+                return data, self.cache.ttl
+            if data.get('Error') == 'Movie not found!':
+                logger.info(f"IMDB API found no movie for query '{query}'", extra=SAMPLED)
+                return data, IMDB_NOT_FOUND_TTL
+            logger.error(f"IMDB API error for query '{query}': {data.get('Error')}")
+            return data, None
+        except Exception as e:
+            logger.error(f"Exception in search_imdb for query '{query}': {e}")
+            return {'error': str(e)}, None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_imdb_client():
+    """Process-wide OMDb client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OMDbClient()
+        return _client
+
 
 def search_imdb(query):
-    logger = get_logger("IMDBUtils")
-    # Example: Use OMDb API (http://www.omdbapi.com/) for IMDB data
-    # You need to set your OMDb API key as an environment variable or config
-    import os
-    api_key = os.getenv('IMDB_API_KEY', 'demo')
-    url = f'http://www.omdbapi.com/?apikey={api_key}&t={query}'
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            logger.info(f"IMDB API success for query '{query}'")
-            return response.json()
-        else:
-            logger.error(f"IMDB API error for query '{query}': {response.status_code}")
-            return {'error': 'IMDB API error'}
-    except Exception as e:
-        logger.error(f"Exception in search_imdb for query '{query}': {e}")
-        return {'error': str(e)}
+    return get_imdb_client().search(query)
+
+
+async def search_imdb_async(query):
+    return await get_imdb_client().search_async(query)
@@ -0,0 +1,84 @@
+import numpy as np
+
+from backend.catalog_search import split_title
+from backend.lru_cache import LRUCache
+
+# Release years are bucketed by decade; a year range ORs the buckets it covers
+YEAR_BUCKET = 10
+MASK_CACHE_SIZE = 256
+
+
+class ItemFilters:
+    """Precomputed boolean masks over the scoring engine's item axis for server-side filtering.
+
+    There is one mask per genre and one per release-year bucket (years are
+    parsed from titles like "Heat (1995)"). Combinations are built from those
+    with vectorized boolean ops and cached, so filtering costs a few passes over
+    the item axis before top-K selection instead of a pass over the catalog frame.
+    """
+
+    def __init__(self, genre_masks, year_masks, item_years):
+        # lower-cased genre -> mask
+        self.genre_masks = genre_masks
+        # first year of a bucket -> mask
+        self.year_masks = year_masks
+        # release year of each item, -1 if unknown
+        self.item_years = item_years
+        self._combined = LRUCache(MASK_CACHE_SIZE, float('inf'))
+
+    @classmethod
+    def build(cls, movies_df, item_index, n_items, genre_index):
+        genre_masks = {}
+        for g, genre in enumerate(genre_index.genres):
+            mask = np.zeros(n_items, dtype=bool)
+            mask[genre_index.items[genre_index.indptr[g]:genre_index.indptr[g + 1]]] = True
+            genre_masks[genre.lower()] = mask
+        items = item_index(movies_df['movieId'].to_numpy())
+        years = np.array([split_title(title)[1] or -1 for title in movies_df['title']], dtype=np.int32)
+        item_years = np.full(n_items, -1, dtype=np.int32)
+        item_years[items[items >= 0]] = years[items >= 0]
+        buckets = np.where(item_years >= 0, item_years // YEAR_BUCKET * YEAR_BUCKET, -1)
+        year_masks = {int(start): buckets == start for start in np.unique(buckets[buckets >= 0])}
+        return cls(genre_masks, year_masks, item_years)
+
+    def unknown_genres(self, genres):
+        return [genre for genre in genres if genre.lower() not in self.genre_masks]
+
+    def year_mask(self, year_from=None, year_to=None):
+        """Items released in [year_from, year_to]; items without a known year never match."""
+        low = -np.inf if year_from is None else year_from
+        high = np.inf if year_to is None else year_to
+        mask = np.zeros(len(self.item_years), dtype=bool)
+        for start, bucket in self.year_masks.items():
+            end = start + YEAR_BUCKET - 1
+            if end < low or start > high:
+                continue
+            if low <= start and end <= high:
+                mask |= bucket
+            else:
+                # Bucket straddles a bound: only its items inside the range
+                mask |= bucket & (self.item_years >= low) & (self.item_years <= high)
+        return mask
+
+    def allowed(self, genres=(), exclude_genres=(), year_from=None, year_to=None):
+        """Mask of items having any of `genres` (if given), none of `exclude_genres`, released
+        within the year range; None when nothing is filtered."""
+        key = (
+            tuple(sorted({genre.lower() for genre in genres})),
+            tuple(sorted({genre.lower() for genre in exclude_genres})),
+            year_from,
+            year_to,
+        )
+        if key == ((), (), None, None):
+            return None
+        mask = self._combined.get(key)
+        if mask is None:
+            mask = np.ones(len(self.item_years), dtype=bool)
+            if key[0]:
+                mask &= np.logical_or.reduce([self.genre_masks[genre] for genre in key[0]])
+            for genre in key[1]:
+                mask &= ~self.genre_masks[genre]
+            if year_from is not None or year_to is not None:
+                mask &= self.year_mask(year_from, year_to)
+            self._combined.set(key, mask)
+        return mask
@@ -1,16 +1,127 @@
+"""
+Process-wide logging setup.
+
+Loggers only put records on a bounded in-memory queue; a listener thread
+formats them (JSON lines by default) and writes them to stdout, so slow output
+never adds to request latency. When the queue is full, records are dropped and
+counted instead of blocking the caller.
+
+Messages longer than LOG_MAX_MESSAGE_CHARS are truncated, and records logged
+with `extra=SAMPLED` (high-volume success messages) are kept at a rate of
+LOG_SAMPLE_RATE.
+"""
+
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import time
+
+from backend.metrics import REGISTRY
 
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-LOG_LEVEL = logging.INFO
-
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format=LOG_FORMAT,
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+LOG_LEVEL = getattr(logging, os.getenv('RECOMMENDER_LOG_LEVEL', 'INFO').upper(), logging.INFO)
+# "json" writes one JSON object per line; "text" uses LOG_FORMAT
+LOG_OUTPUT = os.getenv('RECOMMENDER_LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('RECOMMENDER_LOG_QUEUE_SIZE', '10000'))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv('RECOMMENDER_LOG_MAX_CHARS', '2000'))
+# Fraction of records logged with extra=SAMPLED that are kept
+LOG_SAMPLE_RATE = float(os.getenv('RECOMMENDER_LOG_SAMPLE_RATE', '1.0'))
+
+SAMPLED = {'sampled': True}
+
+LOG_RECORDS_DROPPED = REGISTRY.counter('log_records_dropped_total', "Log records dropped because the log queue was full.")
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+
+
+def truncate(text, limit=LOG_MAX_MESSAGE_CHARS):
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record with time, level, logger, message, any `extra` fields and the traceback."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage()),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def formatMessage(self, record):
+        record.message = truncate(record.message)
+        return super().formatMessage(record)
+
+
+class SuccessSampler(logging.Filter):
+    """Keeps records marked with extra=SAMPLED at `rate`; all other records pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return not getattr(record, 'sampled', False) or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them and drops them when the queue is full."""
+
+    def prepare(self, record):
+        # Formatting is left to the listener; only merge the arguments so the record is self-contained
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener = None
+
+
+def configure_logging():
+    """Route the root logger through the queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_OUTPUT == 'json' else TextFormatter(LOG_FORMAT))
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    if LOG_SAMPLE_RATE < 1.0:
+        handler.addFilter(SuccessSampler(LOG_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued on interpreter exit
+    atexit.register(_listener.stop)
+
+
+configure_logging()
 
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
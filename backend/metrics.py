@@ -0,0 +1,220 @@
+"""
+In-process counters and latency histograms, exposed in Prometheus text format.
+
+Code paths time their stages with `stage()`:
+
+    with stage('score'):
+        top_idx, _ = engine.top_n(user_id, n, exclude)
+
+Each stage is observed into `stage_duration_seconds{stage=...}` and, when the
+request runs under MetricsMiddleware with RECOMMENDER_SERVER_TIMING=1, listed
+in the response's Server-Timing header. With RECOMMENDER_METRICS=0 `stage()`
+returns a shared no-op context manager and counters return immediately, so the
+instrumented code pays only a function call.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.getenv('RECOMMENDER_METRICS', '1') != '0'
+# Add a Server-Timing header listing the stages of each (non-streamed) response
+SERVER_TIMING = os.getenv('RECOMMENDER_SERVER_TIMING', '0') == '1'
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+# (stage, seconds) pairs of the current request, set by MetricsMiddleware when Server-Timing is on
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic count per combination of label values."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per combination of label values."""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('stage_duration_seconds', "Time spent in each stage of a request.", ('stage',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', "HTTP request latency by route.", ('method', 'route', 'status')
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'cache_lookups_total', "Cache lookups by cache and result (hit or miss).", ('cache', 'result')
+)
+LLM_CALLS = REGISTRY.counter('llm_calls_total', "LLM invocations by caller and outcome.", ('caller', 'outcome'))
+AGENT_TOOL_CALLS = REGISTRY.counter('agent_tool_calls_total', "Chatbot agent tool invocations by tool.", ('tool',))
+AGENT_TOOL_HOPS = REGISTRY.histogram(
+    'agent_tool_hops', "Tool invocations per chatbot agent run.", buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15)
+)
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, self.name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage of a request."""
+    return _Stage(name) if ENABLED else _NOOP
+
+
+def count_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache, 'hit' if hit else 'miss')
+
+
+def server_timing_header(timings, total):
+    entries = [f"{name};dur={1000 * seconds:.2f}" for name, seconds in timings]
+    entries.append(f"total;dur={1000 * total:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request by route template.
+
+    With `server_timing` it also collects the stages timed while the request is
+    handled and adds them as a Server-Timing header. Stages that run after the
+    headers are sent (streamed bodies) are only counted in the histograms.
+    """
+
+    def __init__(self, app, server_timing=False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        timings = [] if self.server_timing else None
+        token = _request_timings.set(timings)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                if timings is not None:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message = {**message, 'headers': list(message.get('headers', [])) + [
+                        (b'server-timing', header.encode('latin-1'))
+                    ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get('route')
+            # Route templates, not raw paths, so user ids do not become label values
+            path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope['method'], path, str(status[0]))
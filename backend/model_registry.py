@@ -0,0 +1,169 @@
+"""
+Versioned model registry.
+
+The registry is a directory of artifact directories (see backend/artifacts.py),
+one per model version, plus a CURRENT file naming the version to serve:
+
+    Model/registry/
+        CURRENT              e.g. "c11f6aba5319"
+        c11f6aba5319/        meta.json, factor and data arrays
+            topk/            optional top-K store for this version
+            neighbors/       optional similar-movies table for this version
+            ivf.npz          IVF index for this version, built on first use
+
+Publish the current CSVs and Model/recommendation_model.pkl as a new version,
+and make it the served one, with:
+    python -m backend.model_registry publish --activate
+
+Running backends pick up a changed CURRENT through their registry watcher or
+POST /admin/model/reload, without a restart.
+
+Published versions are never changed. Ratings compaction publishes a copy of
+the active version with the new ratings (e.g. "c11f6aba5319-r1") and activates it.
+"""
+
+import argparse
+import os
+import shutil
+import threading
+
+from backend.artifacts import export_artifacts, has_artifacts
+from backend.logging_config import get_logger
+
+logger = get_logger("ModelRegistry")
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, version):
+        return os.path.join(self.root, version)
+
+    def path(self, version):
+        """Directory of a published version; raises ValueError for any other name."""
+        if version not in self.versions():
+            raise ValueError(f"Model version {version} is not in the registry at {self.root}")
+        return self._dir(version)
+
+    def versions(self):
+        """Published versions, oldest first; copies and exports still being written are left out."""
+        if not os.path.isdir(self.root):
+            return []
+        versions = [v for v in os.listdir(self.root) if not v.endswith('.tmp') and has_artifacts(self._dir(v))]
+        return sorted(versions, key=lambda v: os.path.getmtime(os.path.join(self._dir(v), 'meta.json')))
+
+    def current(self):
+        """The version named by CURRENT, or None if nothing is active."""
+        try:
+            with open(os.path.join(self.root, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def activate(self, version):
+        """Point CURRENT at a published version; readers see either the old or the new name."""
+        self.path(version)
+        tmp_path = os.path.join(self.root, 'CURRENT.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, os.path.join(self.root, 'CURRENT'))
+        logger.info(f"Activated model version {version}")
+
+    def publish(self, state, activate=False):
+        """Export a loaded state as a new version and return the version."""
+        os.makedirs(self.root, exist_ok=True)
+        export_artifacts(state, self._dir(state.model_version))
+        if activate:
+            self.activate(state.model_version)
+        return state.model_version
+
+    def copy(self, version, new_version, update=None):
+        """Publish a copy of `version` as `new_version` and return its directory.
+
+        Files are hard-linked, so the copy takes no space until a file in it is
+        replaced (e.g. by write_ratings); files must never be changed in place.
+        `update(path)` changes the copy before it is published.
+        """
+        src = self.path(version)
+        out_dir = self._dir(new_version)
+        tmp_dir = out_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.copytree(src, tmp_dir, copy_function=os.link)
+        if update is not None:
+            update(tmp_dir)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.rename(tmp_dir, out_dir)
+        return out_dir
+
+    def remove(self, version):
+        """Delete a version that is not active; processes that mapped its files keep reading them."""
+        if version == self.current():
+            raise ValueError(f"Model version {version} is active and cannot be removed")
+        shutil.rmtree(self.path(version))
+
+
+class RegistryWatcher:
+    """Polls the registry's CURRENT file and calls `on_change(version)` whenever
+    it names a new version.
+
+    Only changes are acted on, so a version loaded explicitly through the
+    admin endpoint is kept until CURRENT is changed again.
+    """
+
+    def __init__(self, registry, on_change, interval=10.0):
+        self.registry = registry
+        self.on_change = on_change
+        self.interval = interval
+        self._seen = registry.current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-registry-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                version = self.registry.current()
+                if version is not None and version != self._seen:
+                    logger.info(f"Registry switched to model {version}; reloading.")
+                    self.on_change(version)
+                    self._seen = version
+            except Exception as e:
+                logger.error(f"Error while watching the model registry: {e}")
+
+
+def main():
+    from backend.recommender import MODEL_REGISTRY_DIR, load_state_from_csv
+
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry.")
+    parser.add_argument('--registry', default=MODEL_REGISTRY_DIR, help="Registry directory.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    publish = sub.add_parser('publish', help="Export the CSVs and pickled model as a new version.")
+    publish.add_argument('--activate', action='store_true', help="Also make it the served version.")
+    activate = sub.add_parser('activate', help="Serve a published version.")
+    activate.add_argument('version')
+    sub.add_parser('list', help="List published versions.")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'publish':
+        version = registry.publish(load_state_from_csv(), activate=args.activate)
+        print(version)
+    elif args.command == 'activate':
+        registry.activate(args.version)
+    else:
+        current = registry.current()
+        for version in registry.versions():
+            print(f"{'*' if version == current else ' '} {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Precomputed item-to-item neighbors for "more like this" recommendations.
+
+Similarity is the cosine of the SVD item factors `qi`. The table is built in
+blocks of rows, so only a (block x items) slice of the similarity matrix is in
+memory at a time, and stored as a directory holding
+
+    meta.json          model version the table was built from and k
+    neighbor_ids.npy   int32 (items x k) neighbor inner ids, most similar first, -1 padded
+    neighbor_sims.npy  float16 (items x k) cosine similarities
+
+which the backend memory-maps. Build it with:
+    python -m backend.neighbors --k 100
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from backend.logging_config import get_logger
+from backend.scoring import top_k
+
+logger = get_logger("Neighbors")
+
+
+def normalized_factors(qi):
+    """Item factors scaled to unit length; all-zero rows stay zero."""
+    qi = np.asarray(qi, dtype=np.float32)
+    norms = np.linalg.norm(qi, axis=1, keepdims=True)
+    return qi / np.where(norms > 0, norms, 1.0)
+
+
+def exact_neighbors(unit_qi, item, k, exclude=None):
+    """The k items most similar to one item (inner id) and their cosine similarities, best first."""
+    sims = unit_qi @ unit_qi[item]
+    sims[item] = -np.inf
+    if exclude is not None:
+        sims = np.where(exclude, -np.inf, sims)
+    top = top_k(sims, k)
+    return top, sims[top]
+
+
+def compute_neighbors(unit_qi, k, exclude=None, block_size=1024):
+    """(items x k) neighbor ids and similarities, scoring `block_size` items against the catalog at a time."""
+    n_items = len(unit_qi)
+    k = min(k, n_items - 1)
+    ids = np.full((n_items, k), -1, dtype=np.int32)
+    sims = np.zeros((n_items, k), dtype=np.float16)
+    rows = np.arange(n_items)
+    for start in range(0, n_items, block_size):
+        end = min(start + block_size, n_items)
+        block = unit_qi[start:end] @ unit_qi.T
+        block[rows[:end - start], rows[start:end]] = -np.inf
+        if exclude is not None:
+            block[:, exclude] = -np.inf
+        candidates = np.argpartition(block, -k, axis=1)[:, -k:]
+        candidate_sims = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-candidate_sims, axis=1)
+        top = np.take_along_axis(candidates, order, axis=1)
+        top_sims = np.take_along_axis(candidate_sims, order, axis=1)
+        valid = np.isfinite(top_sims)
+        ids[start:end] = np.where(valid, top, -1)
+        sims[start:end] = np.where(valid, top_sims, 0.0)
+    return ids, sims
+
+
+class NeighborTable:
+    """Read-only view of a neighbor table; the arrays are memory-mapped, not loaded."""
+
+    def __init__(self, meta, ids, sims):
+        self.meta = meta
+        self.k = meta['k']
+        self.model_version = meta['model_version']
+        self.ids = ids
+        self.sims = sims
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        ids = np.load(os.path.join(path, 'neighbor_ids.npy'), mmap_mode='r')
+        sims = np.load(os.path.join(path, 'neighbor_sims.npy'), mmap_mode='r')
+        return cls(meta, ids, sims)
+
+    @classmethod
+    def open(cls, path, model_version):
+        """Load the table at `path`, or return None if it is missing or built from another model."""
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            logger.info(f"No neighbor table at {path}; similar movies are computed live.")
+            return None
+        try:
+            table = cls.load(path)
+        except Exception as e:
+            logger.error(f"Failed to load neighbor table at {path}: {e}")
+            return None
+        if table.model_version != model_version:
+            logger.warning(
+                f"Ignoring neighbor table at {path}: built from model {table.model_version}, "
+                f"serving model {model_version}."
+            )
+            return None
+        logger.info(f"Loaded neighbor table at {path} for {len(table.ids)} movies (k={table.k}).")
+        return table
+
+    def lookup(self, item, k):
+        """Up to k neighbor inner ids and similarities of an item, or None if the table cannot answer."""
+        if k > self.k:
+            return None
+        ids = np.asarray(self.ids[item, :k])
+        valid = ids >= 0
+        return ids[valid], np.asarray(self.sims[item, :k], dtype=np.float32)[valid]
+
+
+def genre_overlap(genre_matrix, item, candidates):
+    """Jaccard overlap of the genres of `item` with each candidate's, from an (items x genres) bool matrix."""
+    own = genre_matrix[item]
+    other = genre_matrix[candidates]
+    union = (other | own).sum(axis=1)
+    return np.where(union > 0, (other & own).sum(axis=1) / np.maximum(union, 1), 0.0)
+
+
+def build_table(path, k=100, block_size=1024):
+    """Compute the neighbors of every item of the served model and write the table to `path`."""
+    from backend import recommender
+
+    state = recommender.get_state()
+    started = time.perf_counter()
+    ids, sims = compute_neighbors(normalized_factors(state.engine.qi), k, state.not_in_catalog, block_size)
+    tmp_path = path.rstrip('/') + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, 'neighbor_ids.npy'), ids)
+    np.save(os.path.join(tmp_path, 'neighbor_sims.npy'), sims)
+    meta = {
+        'model_version': state.trained_version,
+        'k': int(ids.shape[1]),
+        'n_items': int(len(ids)),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+    logger.info(f"Built top-{meta['k']} neighbors for {len(ids)} movies in {time.perf_counter() - started:.1f}s at {path}")
+    return meta
+
+
+def main():
+    from backend import recommender
+
+    parser = argparse.ArgumentParser(description="Precompute the most similar movies of every movie.")
+    parser.add_argument('--out', default=None,
+                        help="Table directory to write (default: where the served model version reads it).")
+    parser.add_argument('--k', type=int, default=100, help="Neighbors kept per movie.")
+    parser.add_argument('--block-size', type=int, default=1024, help="Movies scored per matrix product.")
+    args = parser.parse_args()
+    build_table(args.out or recommender.get_state().neighbors_path, k=args.k, block_size=args.block_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import numpy as np
+
+from backend.scoring import top_k
+
+# Length of the precomputed rankings; longer requests fall back to ranking the full catalog
+POPULAR_K = 500
+
+
+def bayesian_average(counts, sums, prior_count, prior_mean):
+    """Mean rating shrunk towards `prior_mean` as if every movie had `prior_count` extra ratings of it."""
+    return (prior_count * prior_mean + sums) / (prior_count + counts)
+
+
+class PopularityIndex:
+    """Movies ranked by number of ratings and by Bayesian-averaged rating, overall and per genre.
+
+    Built from the ratings at load time, so users the model cannot personalize
+    for are answered from these lists without scoring the catalog. Rankings are
+    item inner ids, best first, limited to movies with ratings that can be displayed.
+    """
+
+    def __init__(self, counts, bayesian, scores, k, genre_leaders):
+        self.counts = counts
+        self.bayesian = bayesian
+        self.k = k
+        # ranking name -> per-item score, -inf for items that are never listed
+        self.scores = scores
+        self.rankings = {by: top_k(item_scores, k) for by, item_scores in scores.items()}
+        # genre -> item inner ids by Bayesian average, best first
+        self.genre_leaders = genre_leaders
+
+    @classmethod
+    def build(cls, rating_index, n_items, genre_index, exclude=None, prior_count=None, k=POPULAR_K):
+        """Aggregate a RatingsIndex; `exclude` masks items that must never be listed (e.g. not in the catalog).
+
+        `prior_count` defaults to the median number of ratings of a rated movie.
+        """
+        counts = np.bincount(rating_index.indices, minlength=n_items)
+        sums = np.bincount(rating_index.indices, weights=rating_index.values, minlength=n_items)
+        rated = counts > 0
+        prior_mean = sums.sum() / max(counts.sum(), 1)
+        if prior_count is None:
+            prior_count = float(np.median(counts[rated])) if rated.any() else 1.0
+        bayesian = bayesian_average(counts, sums, prior_count, prior_mean).astype(np.float32)
+        hidden = ~rated if exclude is None else ~rated | exclude
+        scores = {
+            'most_rated': np.where(hidden, -np.inf, counts.astype(np.float64)),
+            'top_rated': np.where(hidden, -np.inf, bayesian),
+        }
+        genre_leaders = dict(genre_index.top_n(scores['top_rated'], k))
+        return cls(counts, bayesian, scores, k, genre_leaders)
+
+    def top_n(self, n, rated=None, by='top_rated'):
+        """The n best items of a ranking ("top_rated" or "most_rated"), leaving out `rated` (item inner ids)."""
+        n_rated = 0 if rated is None else len(rated)
+        ranking = self.rankings[by]
+        if n + n_rated > self.k:
+            ranking = top_k(self.scores[by], n + n_rated)
+        return self._unrated(ranking, rated)[:n]
+
+    def genre_top_n(self, n, rated=None):
+        """Yield (genre, item inner ids) with the n best-rated items of each genre that are not in `rated`."""
+        for genre, leaders in self.genre_leaders.items():
+            items = self._unrated(leaders, rated)[:n]
+            if len(items):
+                yield genre, items
+
+    @staticmethod
+    def _unrated(ranking, rated):
+        if rated is None or len(rated) == 0:
+            return ranking
+        return ranking[~np.isin(ranking, rated)]
@@ -0,0 +1,271 @@
+"""
+Append-only log of ratings received through POST /ratings.
+
+Rows use the ratings.csv columns (userId,movieId,rating,timestamp) and are
+fsynced before a rating is acknowledged. The log is shared by all worker
+processes: appends take an exclusive file lock, and every process tails the
+log (read_new) to pick up ratings the other workers received. On startup the
+log is replayed on top of the base ratings.
+
+Compaction runs in one process at a time (compaction_lock). It renames the log
+aside (rotate) and merges that file into the base data, so ratings appended
+meanwhile go to a fresh log and are never lost. The merged file is kept until
+the next compaction and replayed along with the log: a process that loaded the
+base data just before it was rewritten still gets those ratings.
+"""
+
+import csv
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+RATING_COLUMNS = ['userId', 'movieId', 'rating', 'timestamp']
+
+
+def _lock(f, blocking):
+    """Lock `f`; False if `blocking` is False and another holder has it."""
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    # msvcrt locks byte ranges from the current position; LK_LOCK gives up after ten tries
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.05)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Exclusive advisory lock on `path`, shared by threads and processes.
+
+    Yields True once the lock is held, or False right away if `blocking` is
+    False and another holder has it. Uses flock, or msvcrt.locking on Windows.
+    """
+    with open(path, 'a') as f:
+        if not _lock(f, blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _unlock(f)
+
+
+def _read_csv(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return pd.DataFrame(columns=RATING_COLUMNS)
+    return pd.read_csv(path)
+
+
+def _frame(rows):
+    frame = pd.DataFrame(rows, columns=RATING_COLUMNS)
+    return frame.astype({'userId': 'int64', 'movieId': 'int64', 'rating': 'float64', 'timestamp': 'int64'})
+
+
+class RatingLog:
+    def __init__(self, path):
+        self.path = path
+        # Log being merged by a compaction, and the one the last compaction merged
+        self.rotated_path = path + '.compacting'
+        self.merged_path = path + '.merged'
+        self.lock_path = path + '.lock'
+        self._lock = threading.Lock()
+        # Log file followed by read_new and the bytes of a line not yet completely written
+        self._tail = None
+        self._partial = b''
+
+    def append(self, user_id, ratings, timestamp=None):
+        """Durably record (movie_id, rating) pairs of one user."""
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        with self._lock, file_lock(self.lock_path):
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(RATING_COLUMNS)
+                for movie_id, rating in ratings:
+                    writer.writerow([int(user_id), int(movie_id), float(rating), timestamp])
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read(self):
+        """All ratings that may be missing from the base data, oldest first.
+
+        read_new continues from the end of what this returns.
+        """
+        with self._lock, file_lock(self.lock_path):
+            frames = [_read_csv(self.merged_path), _read_csv(self.rotated_path)]
+            if self._tail is not None:
+                self._tail.close()
+            try:
+                self._tail = open(self.path, 'rb')
+            except FileNotFoundError:
+                self._tail = None
+            else:
+                self._partial = b''
+                frames.append(self._read_tail())
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return _frame([])
+        return pd.concat(frames, ignore_index=True)
+
+    def read_new(self):
+        """Ratings appended by any process since the previous read or read_new, oldest first.
+
+        The log is followed across rotations: once it has been renamed aside, the
+        rest of the old file is read through the descriptor kept open on it.
+        """
+        with self._lock:
+            frames = []
+            while True:
+                if self._tail is None:
+                    try:
+                        self._tail = open(self.path, 'rb')
+                    except FileNotFoundError:
+                        break
+                    self._partial = b''
+                try:
+                    current = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    current = None
+                # Read after the stat: if the log was rotated by then, nothing is appended to the old file any more
+                frames.append(self._read_tail())
+                if current == os.fstat(self._tail.fileno()).st_ino:
+                    break
+                self._tail.close()
+                self._tail = None
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return _frame([])
+        return pd.concat(frames, ignore_index=True)
+
+    def _read_tail(self):
+        """Complete rows from the followed file that have not been read yet."""
+        data = self._partial + self._tail.read()
+        complete, _, self._partial = data.rpartition(b'\n')
+        rows = [
+            [int(u), int(m), float(r), int(t)]
+            for u, m, r, t in csv.reader(io.StringIO(complete.decode()))
+            if u != RATING_COLUMNS[0]
+        ] if complete else []
+        return _frame(rows)
+
+    def rotate(self):
+        """Move the logged ratings aside for a compaction and return every rating waiting to be merged.
+
+        Ratings left by a compaction that did not finish are merged along with them.
+        """
+        with self._lock, file_lock(self.lock_path):
+            if os.path.exists(self.path):
+                if os.path.exists(self.rotated_path):
+                    with open(self.path) as src, open(self.rotated_path, 'a') as dst:
+                        next(src, None)
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.rotated_path)
+        return _read_csv(self.rotated_path)
+
+    def finish_rotation(self):
+        """Mark the rotated ratings as merged once the base data holds them."""
+        if os.path.exists(self.rotated_path):
+            os.replace(self.rotated_path, self.merged_path)
+
+    def compaction_lock(self):
+        """Context manager yielding whether this process may compact; other processes skip meanwhile."""
+        return file_lock(self.path + '.compact.lock', blocking=False)
+
+
+class FoldedUsers:
+    """Users whose base ratings compaction changed after their model version was trained.
+
+    Stored as JSON {model version: [user ids]}. Neither the model nor lists
+    precomputed from it saw those ratings, so the users are re-fitted on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, model_version):
+        return self._read().get(model_version, [])
+
+    def add(self, model_version, user_ids):
+        folded = self._read()
+        folded[model_version] = sorted(set(folded.get(model_version, [])) | {int(u) for u in user_ids})
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(folded, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def merge_ratings(base_df, log_df):
+    """Base ratings with logged ratings applied; the last rating of a (user, movie) pair wins."""
+    merged = pd.concat([base_df, log_df[base_df.columns.intersection(log_df.columns)]], ignore_index=True)
+    return merged.drop_duplicates(['userId', 'movieId'], keep='last').reset_index(drop=True)
+
+
+def write_csv_atomically(df, path):
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+class PeriodicTask:
+    """Calls `fn()` every `interval` seconds on a daemon thread."""
+
+    def __init__(self, fn, interval, name):
+        self.fn = fn
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.fn()
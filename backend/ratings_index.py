@@ -0,0 +1,114 @@
+import numpy as np
+
+
+class RatingsIndex:
+    """Ratings grouped by user in CSR layout.
+
+    The ratings of the user stored at row r are `indices[indptr[r]:indptr[r + 1]]`
+    (item inner ids on the scoring engine's item axis) with the matching
+    `values`. Rows are ordered by raw user id so a lookup is a binary search.
+
+    Ratings added online (see add) are kept in a per-user overlay that replaces
+    the user's CSR row until compacted() merges them into new arrays.
+    """
+
+    def __init__(self, user_ids, indptr, indices, values):
+        self.user_ids = np.asarray(user_ids)
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.values = np.asarray(values)
+        self._overlay = {}
+
+    @classmethod
+    def from_frame(cls, ratings_df, item_index):
+        """Build the index from a ratings DataFrame.
+
+        `item_index` maps raw movie ids to inner ids (see ScoringEngine.item_index);
+        ratings of movies it does not know are dropped since they can never be scored.
+        """
+        users = ratings_df['userId'].to_numpy()
+        items = item_index(ratings_df['movieId'].to_numpy())
+        values = ratings_df['rating'].to_numpy(dtype=np.float32)
+        keep = items >= 0
+        users, items, values = users[keep], items[keep], values[keep]
+        order = np.argsort(users, kind='stable')
+        users = users[order]
+        user_ids, counts = np.unique(users, return_counts=True)
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(
+            user_ids,
+            indptr,
+            np.ascontiguousarray(items[order], dtype=np.int32),
+            np.ascontiguousarray(values[order]),
+        )
+
+    def row(self, user_id):
+        """Row of a raw user id, or None if the user has no ratings."""
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return int(pos)
+        return None
+
+    def history(self, user_id):
+        """Item inner ids and ratings of a user as views into the index."""
+        overlay = self._overlay.get(user_id)
+        if overlay is not None:
+            return overlay
+        r = self.row(user_id)
+        if r is None:
+            return self.indices[:0], self.values[:0]
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    def n_ratings(self, user_id):
+        return len(self.history(user_id)[0])
+
+    def add(self, user_id, items, values):
+        """Add or overwrite ratings of a user; returns the user's full (items, values) history."""
+        old_items, old_values = self.history(user_id)
+        items = np.asarray(items, dtype=np.int32)
+        values = np.asarray(values, dtype=np.float32)
+        # The last rating of an item wins, both within `items` and over the existing history
+        merged_items = np.concatenate([old_items, items])
+        merged_values = np.concatenate([old_values, values])
+        last = len(merged_items) - 1 - np.unique(merged_items[::-1], return_index=True)[1]
+        history = merged_items[last], merged_values[last]
+        self._overlay[user_id] = history
+        return history
+
+    def compacted(self):
+        """A new index holding the base rows with the overlay merged in."""
+        if not self._overlay:
+            return self
+        overlay_users = sorted(self._overlay)
+        rating_users = np.repeat(self.user_ids, np.diff(self.indptr))
+        keep = ~np.isin(rating_users, overlay_users)
+        users = np.concatenate([rating_users[keep]] + [
+            np.full(len(self._overlay[u][0]), u, dtype=rating_users.dtype) for u in overlay_users
+        ])
+        items = np.concatenate([self.indices[keep]] + [self._overlay[u][0] for u in overlay_users])
+        values = np.concatenate([self.values[keep]] + [self._overlay[u][1] for u in overlay_users])
+        order = np.argsort(users, kind='stable')
+        user_ids, counts = np.unique(users[order], return_counts=True)
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return RatingsIndex(
+            user_ids,
+            indptr,
+            np.ascontiguousarray(items[order], dtype=np.int32),
+            np.ascontiguousarray(values[order], dtype=np.float32),
+        )
+
+    def exclusion_mask(self, user_id, n_items):
+        """Boolean mask over the item axis that is True for the items a user has rated."""
+        mask = np.zeros(n_items, dtype=bool)
+        mask[self.history(user_id)[0]] = True
+        return mask
+
+    def exclusion_masks(self, user_ids, n_items):
+        """(users x items) mask that is True where each user has rated the item."""
+        mask = np.zeros((len(user_ids), n_items), dtype=bool)
+        for r, user_id in enumerate(user_ids):
+            mask[r, self.history(user_id)[0]] = True
+        return mask
@@ -1,92 +1,620 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
 import pickle
-from backend.logging_config import get_logger
-from backend.chatbot import get_llm
+from backend.logging_config import SAMPLED, get_logger
+from backend.descriptions import get_description_cache
+from backend.scoring import ScoringEngine, top_k
+from backend.ratings_index import RatingsIndex
+from backend.topk_store import TopKStore
+from backend.ann_index import IVFIndex
+from backend.genre_index import GenreIndex
+from backend.popularity import PopularityIndex
+from backend.item_filters import ItemFilters
+from backend.lru_cache import LRUCache
+from backend.neighbors import NeighborTable, normalized_factors, exact_neighbors, genre_overlap
+from backend.catalog_search import CatalogIndex
+from backend.artifacts import has_artifacts, load_artifacts, load_ratings, write_ratings
+from backend.rating_log import FoldedUsers, RatingLog, PeriodicTask, merge_ratings, write_csv_atomically
+from backend.model_registry import ModelRegistry, RegistryWatcher
+from backend.metrics import stage, count_cache
 
 MOVIES_PATH = 'Data/movies.csv'
 RATINGS_PATH = 'Data/ratings.csv'
 MODEL_PATH = 'Model/recommendation_model.pkl'
+# Exported with `python -m backend.artifacts export`; used instead of the CSVs and pickle when present
+ARTIFACT_DIR = os.getenv('RECOMMENDER_ARTIFACT_DIR', 'Model/artifacts')
+# Versioned artifacts; when it has an active version that is served ahead of ARTIFACT_DIR and the CSVs
+MODEL_REGISTRY_DIR = os.getenv('RECOMMENDER_REGISTRY_DIR', 'Model/registry')
+# Seconds between checks of the registry for a newly activated version (0 disables the watcher)
+REGISTRY_POLL_INTERVAL = float(os.getenv('RECOMMENDER_REGISTRY_POLL_INTERVAL', '10'))
+TOPK_STORE_PATH = 'Model/topk'
+# Built with `python -m backend.neighbors`; similar movies are computed live without it
+NEIGHBORS_PATH = 'Model/neighbors'
+ANN_INDEX_PATH = 'Model/recommendation_model.ivf.npz'
+# "exact" scores the whole catalog; "ivf" only scores the closest clusters of the IVF index
+RETRIEVAL_MODE = os.getenv('RECOMMENDER_RETRIEVAL', 'exact')
+# Clusters scored per query, at least 1
+IVF_NPROBE = max(1, int(os.getenv('RECOMMENDER_IVF_NPROBE', '8')))
+BATCH_CHUNK_SIZE = 256
+# Ratings received through POST /ratings, replayed on startup until compaction merges them into the base data
+RATINGS_LOG_PATH = os.getenv('RECOMMENDER_RATINGS_LOG', 'Data/ratings.log.csv')
+# Seconds between ratings compactions (0 disables them); one worker process compacts at a time
+RATINGS_COMPACT_INTERVAL = float(os.getenv('RECOMMENDER_RATINGS_COMPACT_INTERVAL', '3600'))
+# Seconds between reads of the ratings other worker processes logged (0 disables them)
+RATINGS_SYNC_INTERVAL = float(os.getenv('RECOMMENDER_RATINGS_SYNC_INTERVAL', '2'))
+# Users whose compacted ratings their model was not trained on, re-fitted whenever the model is loaded
+FOLDED_USERS_PATH = os.getenv('RECOMMENDER_FOLDED_USERS', 'Data/ratings.folded.json')
+# Ridge penalty per rating when re-estimating a user's factors from new ratings
+FOLD_IN_REG = float(os.getenv('RECOMMENDER_FOLD_IN_REG', '0.1'))
+# Users with fewer ratings (or no factors at all) are served from the popularity lists
+COLD_START_MIN_RATINGS = int(os.getenv('RECOMMENDER_COLD_START_MIN_RATINGS', '3'))
+# Popularity list for cold-start users: "top_rated" (Bayesian average) or "most_rated"
+COLD_START_RANKING = os.getenv('RECOMMENDER_COLD_START_RANKING', 'top_rated')
+# Ranked movies computed at once for filtered or paged recommendations; later pages are sliced from them
+RANKING_DEPTH = 200
+# Seconds and users the rankings of filtered or paged recommendations are kept for the next page
+SCORE_CACHE_TTL = float(os.getenv('RECOMMENDER_SCORE_CACHE_TTL', '300'))
+SCORE_CACHE_SIZE = int(os.getenv('RECOMMENDER_SCORE_CACHE_SIZE', '10000'))
+# Nearest movies re-ranked when similar movies are re-ranked by genre overlap
+SIMILAR_CANDIDATES = 50
+# Weight of the genre overlap (Jaccard, 0..1) against the cosine similarity in that re-rank
+SIMILAR_GENRE_WEIGHT = float(os.getenv('RECOMMENDER_SIMILAR_GENRE_WEIGHT', '0.2'))
 
 
 logger = get_logger("Recommender")
-try:
+
+
+class RecommenderState:
+    """Model, data and indexes a request needs, loaded together."""
+
+    def __init__(self, model_version, engine, rating_index, movies_df, genre_index=None,
+                 topk_path=TOPK_STORE_PATH, ann_path=ANN_INDEX_PATH, neighbors_path=NEIGHBORS_PATH,
+                 artifact_path=None, trained_version=None):
+        self.model_version = model_version
+        # Version the factors were published as; copies made by ratings compaction share it, and with it
+        # the indexes built from the factors and the list of users to re-fit
+        self.trained_version = trained_version or model_version
+        # Artifact directory the state was mapped from; ratings compaction rewrites it outside the registry
+        self.artifact_path = artifact_path
+        self.engine = engine
+        self.rating_index = rating_index
+        self.movies_df = movies_df
+        self.movies_df_expanded = movies_df.explode('genres')
+        self.movies_by_id = movies_df.set_index('movieId')
+        # Movies missing from movies.csv are never recommended because they cannot be displayed
+        self.not_in_catalog = ~pd.Index(engine.item_ids).isin(self.movies_by_id.index)
+        # Title and genres of each item inner id (None outside the catalog), so results are filled by indexing
+        items = engine.item_index(movies_df['movieId'].to_numpy())
+        known = items >= 0
+        self.item_titles = np.full(engine.n_items, None, dtype=object)
+        self.item_titles[items[known]] = movies_df['title'].to_numpy(dtype=object)[known]
+        self.item_genres = np.full(engine.n_items, None, dtype=object)
+        self.item_genres[items[known]] = movies_df['genres'].to_numpy()[known]
+        self.genre_index = genre_index or GenreIndex.from_frame(self.movies_df_expanded, engine.item_index)
+        self.popularity = PopularityIndex.build(rating_index, engine.n_items, self.genre_index, self.not_in_catalog)
+        # Where this version's top-K store and neighbor table are read, and built by default
+        self.topk_path = topk_path
+        self.neighbors_path = neighbors_path
+        self.topk_store = TopKStore.open(topk_path, self.trained_version)
+        self.ann_index = IVFIndex.open(ann_path, engine, self.trained_version) if RETRIEVAL_MODE == 'ivf' else None
+        self.neighbors = NeighborTable.open(neighbors_path, self.trained_version)
+        self._catalog_index = None
+        self._catalog_index_lock = threading.Lock()
+        self._unit_qi = None
+        self._genre_matrix = None
+        self._item_filters = None
+        self._item_filters_lock = threading.Lock()
+
+    @property
+    def catalog_index(self):
+        """Title search index, built on first use since only the chatbot and search need it."""
+        with self._catalog_index_lock:
+            if self._catalog_index is None:
+                items = self.engine.item_index(self.movies_df['movieId'].to_numpy())
+                counts = np.bincount(self.rating_index.indices, minlength=self.engine.n_items)
+                self._catalog_index = CatalogIndex.from_frame(self.movies_df, np.where(items >= 0, counts[items], 0))
+            return self._catalog_index
+
+    @property
+    def item_filters(self):
+        """Genre and release-year masks for filtered recommendations, built on first use."""
+        with self._item_filters_lock:
+            if self._item_filters is None:
+                self._item_filters = ItemFilters.build(
+                    self.movies_df, self.engine.item_index, self.engine.n_items, self.genre_index
+                )
+            return self._item_filters
+
+    @property
+    def unit_qi(self):
+        """Unit-length item factors for similar movies the neighbor table cannot answer."""
+        if self._unit_qi is None:
+            self._unit_qi = normalized_factors(self.engine.qi)
+        return self._unit_qi
+
+    @property
+    def genre_matrix(self):
+        """(items x genres) bool matrix of the genres of each item, for the genre re-rank of similar movies."""
+        if self._genre_matrix is None:
+            genre_index = self.genre_index
+            matrix = np.zeros((self.engine.n_items, len(genre_index.genres)), dtype=bool)
+            counts = np.diff(genre_index.indptr)
+            matrix[genre_index.items, np.repeat(np.arange(len(counts)), counts)] = True
+            self._genre_matrix = matrix
+        return self._genre_matrix
+
+
+def load_state_from_csv():
+    """Parse the CSVs and unpickle the model."""
     movies_df = pd.read_csv(MOVIES_PATH)
     ratings_df = pd.read_csv(RATINGS_PATH)
     with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
-    logger.info("Loaded movies, ratings, and model successfully.")
-except Exception as e:
-    logger.error(f"Error loading data or model: {e}")
-    raise
-
-movies_df['genres'] = movies_df['genres'].str.split('|')
-movies_df_expanded = movies_df.explode('genres')
-
-def get_movie_description(title: str) -> str:
-    """Get a short description of a movie using Gemini LLM."""
-    llm = get_llm()
-    if llm is None:
-        return "Description unavailable (LLM not configured)."
+        model_bytes = f.read()
+    model = pickle.loads(model_bytes)
+    # Derived artifacts (e.g. the top-K store) record this to detect that they are stale
+    model_version = hashlib.sha256(model_bytes).hexdigest()[:12]
+    movies_df['genres'] = movies_df['genres'].str.split('|')
+    engine = ScoringEngine.from_model(model)
+    rating_index = RatingsIndex.from_frame(ratings_df, engine.item_index)
+    return RecommenderState(model_version, engine, rating_index, movies_df)
+
+
+def load_state_from_artifacts(path, **index_paths):
+    """Memory-map an artifact directory written by `python -m backend.artifacts export`."""
+    meta, engine, rating_index, movies_df, genre_index = load_artifacts(path)
+    return RecommenderState(
+        meta['model_version'], engine, rating_index, movies_df, genre_index, artifact_path=path,
+        trained_version=meta.get('trained_version'), **index_paths
+    )
+
+
+def load_state_from_registry(version):
+    """Load a registry version; its top-K store and IVF index live inside the version directory."""
+    path = ModelRegistry(MODEL_REGISTRY_DIR).path(version)
+    return load_state_from_artifacts(
+        path, topk_path=os.path.join(path, 'topk'), ann_path=os.path.join(path, 'ivf.npz'),
+        neighbors_path=os.path.join(path, 'neighbors')
+    )
+
+
+def load_state(version=None):
+    """Load `version` from the registry, or by default the active registry version,
+    the artifacts in ARTIFACT_DIR, or the CSVs and pickle, whichever exists first."""
     try:
-        prompt = f"Give a concise, engaging description of the movie '{title}'. Limit to 2-3 sentences."
-        response = llm.invoke(prompt)
-        if isinstance(response, dict):
-            return response.get("output") or response.get("result") or str(response)
-        return str(response)
+        version = version or ModelRegistry(MODEL_REGISTRY_DIR).current()
+        if version:
+            state = load_state_from_registry(version)
+            logger.info(f"Loaded model {version} from the registry in {MODEL_REGISTRY_DIR}.")
+        elif has_artifacts(ARTIFACT_DIR):
+            state = load_state_from_artifacts(ARTIFACT_DIR)
+            logger.info(f"Loaded model {state.model_version} from artifacts in {ARTIFACT_DIR}.")
+        else:
+            state = load_state_from_csv()
+            logger.info("Loaded movies, ratings, and model successfully.")
+        return state
     except Exception as e:
-        logger = get_logger("MovieDescription")
-        logger.error(f"Failed to get description for '{title}': {e}")
-        return "Description unavailable (error)."
+        logger.error(f"Error loading data or model: {e}")
+        raise
+
+
+def warm_state(state):
+    """Touch everything a first request would, so a new version serves at full speed once swapped in."""
+    user_ids = state.rating_index.user_ids[:BATCH_CHUNK_SIZE].tolist()
+    if user_ids:
+        state.engine.top_n_batch(user_ids, 10, state.rating_index.exclusion_masks(user_ids, state.engine.n_items))
+    state.catalog_index
+
+
+rating_log = RatingLog(RATINGS_LOG_PATH)
+folded_users = FoldedUsers(FOLDED_USERS_PATH)
+# user id -> {(model version, filter key): (ranked item inner ids, source, exhausted)}
+score_cache = LRUCache(SCORE_CACHE_SIZE, SCORE_CACHE_TTL)
+
+
+def apply_ratings(state, user_id, items, values):
+    """Add ratings (item inner ids) to the state's index and re-fit the user's factors."""
+    history = state.rating_index.add(user_id, items, values)
+    state.engine.fold_in(user_id, *history, reg=FOLD_IN_REG)
+    score_cache.pop(user_id)
+
+
+def logged_by_user(logged, item_index):
+    """Yield (user_id, item inner ids, ratings) per user of logged ratings; unknown movies are dropped."""
+    for user_id, ratings in logged.groupby('userId', sort=False):
+        items = item_index(ratings['movieId'].to_numpy())
+        known = items >= 0
+        yield int(user_id), items[known], ratings['rating'].to_numpy(dtype=np.float32)[known]
+
+
+def holds_ratings(rating_index, user_id, items, values):
+    """Whether a user's history already has exactly these ratings (item inner ids)."""
+    history = dict(zip(*(array.tolist() for array in rating_index.history(user_id))))
+    return all(history.get(item) == value for item, value in zip(items.tolist(), values.tolist()))
+
+
+def fold_in_ratings(state):
+    """Bring a freshly loaded state up to date with ratings the model was not trained on.
+
+    Users the model has never seen, and users whose ratings were compacted into
+    the base data after the model was trained, get factors fitted to their base
+    ratings; then the ratings log is replayed.
+    """
+    engine, rating_index = state.engine, state.rating_index
+    refit = ~np.isin(rating_index.user_ids, engine.user_ids)
+    refit |= np.isin(rating_index.user_ids, folded_users.get(state.trained_version))
+    for user_id in rating_index.user_ids[refit].tolist():
+        engine.fold_in(user_id, *rating_index.history(user_id), reg=FOLD_IN_REG)
+    logged = rating_log.read()
+    for user_id, items, values in logged_by_user(logged, engine.item_index):
+        apply_ratings(state, user_id, items, values)
+    if len(logged):
+        logger.info(f"Replayed {len(logged)} logged ratings.")
+
+
+_state = None
+_state_lock = threading.Lock()
+_reload_lock = threading.Lock()
+# Held while ratings are logged and applied, so a compaction or a swap never loses one
+_ingest_lock = threading.Lock()
+
+
+def get_state():
+    """The loaded recommender state; data is loaded on first use rather than at import.
+
+    Callers take the state once per request and use only that object, so a
+    concurrent reload_state() never mixes two model versions in one response.
+    """
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                state = load_state()
+                fold_in_ratings(state)
+                _state = state
+    return _state
+
+
+def active_model_version():
+    """Version of the state being served, or None before the first load."""
+    state = _state
+    return state.model_version if state is not None else None
+
+
+def reload_state(version=None):
+    """Load and warm a model version next to the served one, then swap it in.
+
+    The swap is a single reference assignment; requests already running keep
+    the state they started with. Reloads are serialized.
+    """
+    with _reload_lock:
+        previous = active_model_version()
+        state = load_state(version)
+        warm_state(state)
+        with _ingest_lock:
+            fold_in_ratings(state)
+            swap_state(state)
+        logger.info(f"Swapped model {previous} for {state.model_version}.")
+        return {"previous_version": previous, "model_version": state.model_version}
+
 
-def get_user_recommendations(user_id, n=10):
-    logger.info(f"Getting recommendations for user_id={user_id}, n={n}")
-    # Input validation
+def swap_state(state):
+    """Serve `state` from now on, e.g. one built in-process by the benchmarks."""
+    global _state
+    with _state_lock:
+        _state = state
+
+
+def sync_ratings():
+    """Apply the ratings other worker processes logged since the last sync."""
+    state = _state
+    if state is None:
+        # Nothing is served yet; the first load replays the whole log
+        return
+    try:
+        with _ingest_lock:
+            applied = 0
+            for user_id, items, values in logged_by_user(rating_log.read_new(), state.engine.item_index):
+                if not holds_ratings(state.rating_index, user_id, items, values):
+                    apply_ratings(state, user_id, items, values)
+                    applied += 1
+        if applied:
+            logger.info(f"Applied new ratings of {applied} users logged by other workers.")
+    except Exception as e:
+        logger.error(f"Error in sync_ratings: {e}")
+
+
+def start_ratings_sync(interval=RATINGS_SYNC_INTERVAL):
+    """Apply ratings logged by other worker processes every `interval` seconds; returns the task or None if disabled."""
+    if interval <= 0:
+        return None
+    return PeriodicTask(sync_ratings, interval, "ratings-sync").start()
+
+
+def start_registry_watcher(interval=REGISTRY_POLL_INTERVAL):
+    """Reload whenever the registry's CURRENT version changes; returns the watcher or None if disabled."""
+    if interval <= 0:
+        return None
+    return RegistryWatcher(ModelRegistry(MODEL_REGISTRY_DIR), reload_state, interval=interval).start()
+
+def is_cold_start(state, user_id):
+    """Whether a user is served from the popularity lists: no factors, or too few ratings to trust them."""
+    return (state.engine.user_factors(user_id) is None
+            or state.rating_index.n_ratings(user_id) < COLD_START_MIN_RATINGS)
+
+def get_movie_description(movie_id: int, title: str) -> str:
+    """Get a short description of a movie, generated by Gemini LLM on a cache miss."""
+    return get_description_cache().get(movie_id, title)
+
+def validate_recommendation_request(user_id, n):
+    """Return the validation error message for a recommendation request, or None if it is valid."""
     if not isinstance(user_id, (int, float)) or int(user_id) != user_id or user_id <= 0:
         logger.warning(f"Validation error: user_id must be a positive integer. Got: {user_id}")
-        return {
-            "success": False,
-            "recommendations": None,
-            "error": None,
-            "validation_error": "user_id must be a positive integer."
-        }
+        return "user_id must be a positive integer."
     if not isinstance(n, int) or n <= 0:
         logger.warning(f"Validation error: n must be a positive integer. Got: {n}")
+        return "n must be a positive integer."
+    return None
+
+def normalize_filters(filters):
+    """Filters dict with every key present, or None if it filters nothing.
+
+    Keys: "genres" (any of), "exclude_genres" (none of), "year_from" and
+    "year_to" (release year, inclusive) and "exclude" (movie ids).
+    """
+    filters = filters or {}
+    normalized = {
+        "genres": list(filters.get("genres") or []),
+        "exclude_genres": list(filters.get("exclude_genres") or []),
+        "year_from": filters.get("year_from"),
+        "year_to": filters.get("year_to"),
+        "exclude": list(filters.get("exclude") or []),
+    }
+    if not any(value not in (None, []) for value in normalized.values()):
+        return None
+    return normalized
+
+def filter_key(filters):
+    """Hashable, order-independent form of normalized filters (None when unfiltered)."""
+    if filters is None:
+        return None
+    return (
+        tuple(sorted({genre.lower() for genre in filters["genres"]})),
+        tuple(sorted({genre.lower() for genre in filters["exclude_genres"]})),
+        filters["year_from"],
+        filters["year_to"],
+        tuple(sorted(set(filters["exclude"]))),
+    )
+
+def validate_filters(filters, state):
+    """Return the validation error message for normalized filters, or None if they are valid."""
+    if filters is None:
+        return None
+    unknown = state.item_filters.unknown_genres(filters["genres"] + filters["exclude_genres"])
+    if unknown:
+        return f"Unknown genres: {', '.join(unknown)}. Known genres: {', '.join(state.genre_index.genres)}."
+    year_from, year_to = filters["year_from"], filters["year_to"]
+    if year_from is not None and year_to is not None and year_from > year_to:
+        return "year_from must not be after year_to."
+    if not all(isinstance(movie_id, int) for movie_id in filters["exclude"]):
+        return "exclude must be a list of movie ids."
+    return None
+
+def _cursor_digest(key):
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:8]
+
+def encode_cursor(offset, key, ranking="exact"):
+    """Opaque cursor for the page starting at `offset` of the ranking for filter key `key`.
+
+    `ranking` ("exact" or "ivf") names the ranking the pages are sliced from,
+    so the following pages come from the same one as the first.
+    """
+    return base64.urlsafe_b64encode(f"{offset}.{ranking}.{_cursor_digest(key)}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, key):
+    """(offset, ranking) a cursor points at; raises ValueError if it is malformed or was issued for other filters."""
+    try:
+        offset, ranking, digest = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(".")
+        offset = int(offset)
+    except Exception:
+        raise ValueError("cursor is invalid.")
+    if ranking not in ("exact", "ivf"):
+        raise ValueError("cursor is invalid.")
+    if digest != _cursor_digest(key) or offset < 0:
+        raise ValueError("cursor was issued for different filters.")
+    return offset, ranking
+
+def ranked_items(state, user_id, filters, depth, approximate=False):
+    """At least `depth` best-first item inner ids for a user under normalized filters (fewer if the
+    candidates run out) and the path that ranked them, reusing the user's cached ranking when it is deep enough.
+
+    With approximate=True (no filters, IVF index loaded) the ranking is every
+    candidate of the IVF lists probed for RANKING_DEPTH items, scored exactly.
+    """
+    approximate = approximate and filters is None and state.ann_index is not None
+    cache_key = (state.model_version, filter_key(filters), approximate)
+    per_user = score_cache.get(user_id)
+    cached = per_user.get(cache_key) if per_user is not None else None
+    hit = cached is not None and (cached[2] or len(cached[0]) >= depth)
+    count_cache('score_cache', hit)
+    if hit:
+        return cached[0], cached[1]
+    engine = state.engine
+    depth = max(depth, RANKING_DEPTH, 2 * len(cached[0]) if cached is not None else 0)
+    with stage('history'):
+        exclude = state.rating_index.exclusion_mask(user_id, engine.n_items) | state.not_in_catalog
+    if filters is not None:
+        with stage('filter'):
+            allowed = state.item_filters.allowed(
+                filters["genres"], filters["exclude_genres"], filters["year_from"], filters["year_to"]
+            )
+            if allowed is not None:
+                exclude |= ~allowed
+            if filters["exclude"]:
+                exclude |= engine.item_mask(filters["exclude"])
+    exhausted = None
+    if is_cold_start(state, user_id):
+        source = "popularity"
+        if filters is None:
+            # The lists the first page is taken from, so later pages continue it even where counts tie
+            with stage('popularity'):
+                ranking = state.popularity.top_n(depth, state.rating_index.history(user_id)[0], by=COLD_START_RANKING)
+        else:
+            with stage('sort'):
+                ranking = top_k(np.where(exclude, -np.inf, state.popularity.scores[COLD_START_RANKING]), depth)
+    elif approximate:
+        source = "model"
+        with stage('ann_search'):
+            ranking = state.ann_index.ranking(engine, user_id, RANKING_DEPTH, exclude, nprobe=IVF_NPROBE)
+        # Probing more lists would reorder it, so it is never deepened
+        exhausted = True
+    else:
+        source = "model"
+        with stage('score'):
+            scores = engine.score_user(user_id)
+        with stage('sort'):
+            ranking = top_k(np.where(exclude, -np.inf, scores), depth)
+    if per_user is None:
+        per_user = {}
+        score_cache.set(user_id, per_user)
+    per_user[cache_key] = (ranking, source, len(ranking) < depth if exhausted is None else exhausted)
+    return ranking, source
+
+def get_user_recommendations(user_id, n=10, describe=True, filters=None, cursor=None):
+    """Top-n recommendations for a user.
+
+    With describe=False the ranked list is returned without waiting for LLM
+    descriptions ("description" is None); clients fetch them separately with
+    stream_movie_descriptions.
+
+    `filters` (see normalize_filters) are applied as item masks before top-n
+    selection. "next_cursor" of a response fetches the following page; filtered
+    and later pages are sliced from a per-user ranking cached for SCORE_CACHE_TTL
+    seconds, so paging does not rescore the catalog.
+    """
+    logger.info(f"Getting recommendations for user_id={user_id}, n={n}", extra=SAMPLED)
+    validation_error = validate_recommendation_request(user_id, n)
+    if validation_error:
         return {
             "success": False,
             "recommendations": None,
+            "source": None,
+            "next_cursor": None,
+            "model_version": active_model_version(),
             "error": None,
-            "validation_error": "n must be a positive integer."
+            "validation_error": validation_error
         }
+    state = None
     try:
-        movie_ids = ratings_df['movieId'].unique()
-        rated_movie_ids = ratings_df[ratings_df['userId'] == user_id]['movieId'].unique()
-        unrated_movie_ids = [mid for mid in movie_ids if mid not in rated_movie_ids]
-        if not unrated_movie_ids:
+        state = get_state()
+        engine = state.engine
+        filters = normalize_filters(filters)
+        offset, ranking_kind = 0, "exact"
+        try:
+            validation_error = validate_filters(filters, state)
+            if validation_error is None and cursor:
+                offset, ranking_kind = decode_cursor(cursor, filter_key(filters))
+        except ValueError as e:
+            validation_error = str(e)
+        if validation_error:
+            logger.warning(f"Validation error: {validation_error}")
+            return {
+                "success": False,
+                "recommendations": None,
+                "source": None,
+                "next_cursor": None,
+                "model_version": state.model_version,
+                "error": None,
+                "validation_error": validation_error
+            }
+        # Precomputed lists predate ratings received since, so users with new ratings (folded in from the
+        # log, or re-fitted on load because compaction merged ratings the model never saw) are scored live
+        use_store = state.topk_store is not None and not state.engine.is_folded(user_id)
+        # Pages after the first continue the ranking their cursor names; the precomputed lists were
+        # ranked exactly, but IVF results are only a prefix of the IVF ranking
+        approximate = ranking_kind == "ivf" and state.ann_index is not None
+        top_n_movie_ids = None
+        if filters is not None or offset:
+            # One extra item tells whether there is a next page
+            ranking, source = ranked_items(state, user_id, filters, offset + n + 1, approximate)
+            top_n_movie_ids = engine.item_ids[ranking[offset:offset + n]]
+            has_more = len(ranking) > offset + n
+        elif is_cold_start(state, user_id):
+            source = "popularity"
+            with stage('popularity'):
+                rated = state.rating_index.history(user_id)[0]
+                top_n_movie_ids = engine.item_ids[state.popularity.top_n(n, rated, by=COLD_START_RANKING)]
+        elif use_store:
+            source = "precomputed"
+            with stage('topk_lookup'):
+                top_n_movie_ids = state.topk_store.lookup(user_id, n)
+            count_cache('topk_store', top_n_movie_ids is not None)
+        if top_n_movie_ids is None and state.ann_index is not None:
+            approximate = True
+            ranking, source = ranked_items(state, user_id, None, n + 1, approximate)
+            top_n_movie_ids = engine.item_ids[ranking[:n]]
+            has_more = len(ranking) > n
+        elif top_n_movie_ids is None:
+            source = "model"
+            with stage('history'):
+                exclude = state.rating_index.exclusion_mask(user_id, engine.n_items) | state.not_in_catalog
+            with stage('score'):
+                scores = np.where(exclude, -np.inf, engine.score_user(user_id))
+            with stage('sort'):
+                top_idx = top_k(scores, n)
+            top_n_movie_ids = engine.item_ids[top_idx]
+            has_more = len(top_n_movie_ids) == n
+        elif filters is None and not offset:
+            has_more = len(top_n_movie_ids) == n
+        if len(top_n_movie_ids) == 0 and not offset:
             logger.warning(f"No unrated movies found for user {user_id}.")
             return {
                 "success": False,
                 "recommendations": [],
+                "source": source,
+                "next_cursor": None,
+                "model_version": state.model_version,
                 "error": None,
-                "validation_error": "No unrated movies found for this user."
+                "validation_error": "No unrated movies match these filters." if filters is not None
+                else "No unrated movies found for this user."
             }
-        predictions = [model.predict(user_id, mid) for mid in unrated_movie_ids]
-        predictions.sort(key=lambda x: x.est, reverse=True)
-        top_n_movie_ids = [pred.iid for pred in predictions[:n]]
-        top_n_movies = movies_df[movies_df['movieId'].isin(top_n_movie_ids)]
-        # Add LLM description for each movie
+        with stage('catalog_join'):
+            # .loc keeps the rank order of the ids it is given
+            top_n_movies = state.movies_by_id.loc[top_n_movie_ids].reset_index()
+        # Add LLM descriptions, fetching cache misses concurrently up to a deadline
+        if describe:
+            with stage('describe'):
+                descriptions, description_stats = get_description_cache().describe(
+                    [(int(movie.movieId), movie.title) for movie in top_n_movies.itertuples()]
+                )
+        else:
+            descriptions, description_stats = {}, None
         recs = []
         for movie in top_n_movies.itertuples():
-            description = get_movie_description(movie.title)
+            description, description_status = descriptions.get(int(movie.movieId), (None, "deferred"))
             recs.append({
-                "movieId": movie.movieId,
+                "movieId": int(movie.movieId),
                 "title": movie.title,
                 "genres": movie.genres,
-                "description": description
+                "description": description,
+                "description_status": description_status
             })
-        logger.info(f"Recommendations for user {user_id}: {recs}")
+        logger.info(f"Recommendations for user {user_id}: {[rec['movieId'] for rec in recs]}", extra=SAMPLED)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Recommendation payload for user {user_id}: {recs}")
         return {
             "success": True,
             "recommendations": recs,
+            "description_stats": description_stats,
+            "source": source,
+            "next_cursor": encode_cursor(offset + n, filter_key(filters), "ivf" if approximate else "exact")
+            if has_more else None,
+            "model_version": state.model_version,
             "error": None,
             "validation_error": None
         }
@@ -95,53 +623,171 @@ def get_user_recommendations(user_id, n=10):
         return {
             "success": False,
             "recommendations": None,
+            "source": None,
+            "next_cursor": None,
+            "model_version": state.model_version if state is not None else None,
             "error": f"Error in get_user_recommendations: {e}",
             "validation_error": None
         }
 
+def stream_movie_descriptions(movie_ids):
+    """Yield {"movieId", "description", "description_status"} for each movie as its description resolves."""
+    logger.info(f"Streaming descriptions for {len(movie_ids)} movies", extra=SAMPLED)
+    movies_by_id = get_state().movies_by_id
+    known = [int(movie_id) for movie_id in movie_ids if movie_id in movies_by_id.index]
+    for movie_id in movie_ids:
+        if movie_id not in movies_by_id.index:
+            yield {"movieId": movie_id, "description": None, "description_status": "unknown_movie"}
+    movies = [(movie_id, movies_by_id.at[movie_id, 'title']) for movie_id in known]
+    for movie_id, description, status in get_description_cache().describe_iter(movies):
+        yield {"movieId": movie_id, "description": description, "description_status": status}
+
+def get_batch_user_recommendations(user_ids, n=10, chunk_size=BATCH_CHUNK_SIZE):
+    """Yield one recommendation result per user id, in input order.
+
+    Users are scored chunk by chunk as a single (users x factors) @ (factors x items)
+    product. Each result follows the get_user_recommendations contract plus a
+    "userId" key; descriptions are not generated for batches.
+    """
+    logger.info(f"Getting batch recommendations for {len(user_ids)} users, n={n}")
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        results = [None] * len(chunk)
+        valid = []
+        state = None
+        for pos, user_id in enumerate(chunk):
+            validation_error = validate_recommendation_request(user_id, n)
+            if validation_error:
+                results[pos] = {
+                    "userId": user_id,
+                    "success": False,
+                    "recommendations": None,
+                    "source": None,
+                    "model_version": active_model_version(),
+                    "error": None,
+                    "validation_error": validation_error
+                }
+            else:
+                valid.append(pos)
+        try:
+            state = get_state()
+            engine = state.engine
+            # pos -> (ranked item inner ids, source); cold-start users are answered from the popularity lists
+            ranked_by_pos = {}
+            scored = []
+            for pos in valid:
+                if is_cold_start(state, chunk[pos]):
+                    rated = state.rating_index.history(chunk[pos])[0]
+                    ranked_by_pos[pos] = state.popularity.top_n(n, rated, by=COLD_START_RANKING), "popularity"
+                else:
+                    scored.append(pos)
+            scored_ids = [chunk[pos] for pos in scored]
+            with stage('batch_history'):
+                exclude = state.rating_index.exclusion_masks(scored_ids, engine.n_items) | state.not_in_catalog
+            with stage('batch_score'):
+                top_idx, top_scores = engine.top_n_batch(scored_ids, n, exclude) if scored_ids else (None, None)
+            for row, pos in enumerate(scored):
+                ranked_by_pos[pos] = top_idx[row][top_scores[row] > -float('inf')], "model"
+            for pos in valid:
+                ranked, source = ranked_by_pos[pos]
+                if len(ranked) == 0:
+                    results[pos] = {
+                        "userId": chunk[pos],
+                        "success": False,
+                        "recommendations": [],
+                        "source": source,
+                        "model_version": state.model_version,
+                        "error": None,
+                        "validation_error": "No unrated movies found for this user."
+                    }
+                    continue
+                results[pos] = {
+                    "userId": chunk[pos],
+                    "success": True,
+                    "recommendations": [
+                        {
+                            "movieId": movie_id,
+                            "title": title,
+                            "genres": genres,
+                            "description": None
+                        }
+                        for movie_id, title, genres in zip(
+                            engine.item_ids[ranked].tolist(), state.item_titles[ranked], state.item_genres[ranked]
+                        )
+                    ],
+                    "source": source,
+                    "model_version": state.model_version,
+                    "error": None,
+                    "validation_error": None
+                }
+        except Exception as e:
+            logger.error(f"Error in get_batch_user_recommendations: {e}")
+            for pos in valid:
+                results[pos] = {
+                    "userId": chunk[pos],
+                    "success": False,
+                    "recommendations": None,
+                    "source": None,
+                    "model_version": state.model_version if state is not None else None,
+                    "error": f"Error in get_batch_user_recommendations: {e}",
+                    "validation_error": None
+                }
+        yield from results
+
 def get_genre_recommendations(user_id, n=1):
-    logger.info(f"Getting genre recommendations for user_id={user_id}, n={n}")
-    # Input validation
-    if not isinstance(user_id, (int, float)) or int(user_id) != user_id or user_id <= 0:
-        logger.warning(f"Validation error: user_id must be a positive integer. Got: {user_id}")
-        return {
-            "success": False,
-            "genre_recommendations": None,
-            "error": None,
-            "validation_error": "user_id must be a positive integer."
-        }
-    if not isinstance(n, int) or n <= 0:
-        logger.warning(f"Validation error: n must be a positive integer. Got: {n}")
+    logger.info(f"Getting genre recommendations for user_id={user_id}, n={n}", extra=SAMPLED)
+    validation_error = validate_recommendation_request(user_id, n)
+    if validation_error:
         return {
             "success": False,
             "genre_recommendations": None,
+            "source": None,
+            "model_version": active_model_version(),
             "error": None,
-            "validation_error": "n must be a positive integer."
+            "validation_error": validation_error
         }
+    state = None
     try:
-        all_movies = movies_df[['movieId', 'title']]
-        rated_movies = ratings_df[ratings_df['userId'] == user_id]['movieId']
-        unrated_movies = all_movies[~all_movies['movieId'].isin(rated_movies)]
-        if unrated_movies.empty:
+        state = get_state()
+        engine = state.engine
+        if is_cold_start(state, user_id):
+            # Genre leaders by Bayesian average, which then also serves as the predicted rating
+            source = "popularity"
+            with stage('popularity'):
+                rated = state.rating_index.history(user_id)[0]
+                genre_tops = list(state.popularity.genre_top_n(n, rated))
+            scores = state.popularity.bayesian
+        else:
+            source = "model"
+            with stage('score'):
+                scores = engine.score_user(user_id)
+            with stage('history'):
+                exclude = state.rating_index.exclusion_mask(user_id, engine.n_items)
+            with stage('genre_top_n'):
+                genre_tops = list(state.genre_index.top_n(scores, n, exclude))
+        result = []
+        for genre, top_idx in genre_tops:
+            for movie_id, pred_rating in zip(engine.item_ids[top_idx], engine.clip(scores[top_idx])):
+                result.append({'genres': genre, 'movieId': int(movie_id), 'pred_rating': float(pred_rating)})
+        if not result:
             logger.warning(f"No unrated movies found for user {user_id}.")
             return {
                 "success": False,
                 "genre_recommendations": [],
+                "source": source,
+                "model_version": state.model_version,
                 "error": None,
                 "validation_error": "No unrated movies found for this user."
             }
-        genre_map = movies_df_expanded.set_index('movieId')['genres'].to_dict()
-        predictions = []
-        for movie_id in unrated_movies['movieId']:
-            pred = model.predict(user_id, movie_id)
-            predictions.append({'movieId': movie_id, 'pred_rating': pred.est, 'genres': genre_map.get(movie_id, [])})
-        pred_df = pd.DataFrame(predictions).explode('genres')
-        best_per_genre = pred_df.groupby('genres').apply(lambda x: x.nlargest(n, 'pred_rating')).reset_index(drop=True)
-        result = best_per_genre[['genres', 'movieId', 'pred_rating']].to_dict(orient='records')
-        logger.info(f"Genre recommendations for user {user_id}: {result}")
+        logger.info(f"Genre recommendations for user {user_id}: {len(result)} movies in "
+                    f"{len({rec['genres'] for rec in result})} genres", extra=SAMPLED)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Genre recommendation payload for user {user_id}: {result}")
         return {
             "success": True,
             "genre_recommendations": result,
+            "source": source,
+            "model_version": state.model_version,
             "error": None,
             "validation_error": None
         }
@@ -150,6 +796,307 @@ def get_genre_recommendations(user_id, n=1):
         return {
             "success": False,
             "genre_recommendations": None,
+            "source": None,
+            "model_version": state.model_version if state is not None else None,
             "error": f"Error in get_genre_recommendations: {e}",
             "validation_error": None
         }
+
+def get_similar_movies(movie_id, n=10, genre_rerank=False):
+    """Movies most similar to `movie_id` by cosine similarity of their item factors.
+
+    With genre_rerank the SIMILAR_CANDIDATES nearest movies are re-ranked by
+    similarity + SIMILAR_GENRE_WEIGHT * genre overlap. Answered from the neighbor
+    table when there is one ("source": "precomputed"), otherwise computed live.
+    """
+    logger.info(f"Similar movies for movie_id={movie_id}, n={n}, genre_rerank={genre_rerank}", extra=SAMPLED)
+    state = None
+    try:
+        state = get_state()
+        engine = state.engine
+        validation_error = None
+        if not isinstance(movie_id, int) or movie_id <= 0:
+            validation_error = "movie_id must be a positive integer."
+        elif not isinstance(n, int) or n <= 0:
+            validation_error = "n must be a positive integer."
+        elif engine.item_index([movie_id])[0] < 0:
+            validation_error = f"Unknown movieId: {movie_id}."
+        if validation_error:
+            logger.warning(f"Validation error: {validation_error}")
+            return {
+                "success": False,
+                "movieId": movie_id,
+                "similar": None,
+                "source": None,
+                "model_version": state.model_version,
+                "error": None,
+                "validation_error": validation_error
+            }
+        item = int(engine.item_index([movie_id])[0])
+        k = max(n, SIMILAR_CANDIDATES) if genre_rerank else n
+        found = state.neighbors.lookup(item, k) if state.neighbors is not None else None
+        source = "precomputed" if found is not None else "model"
+        with stage('similar'):
+            neighbors, sims = found if found is not None else exact_neighbors(
+                state.unit_qi, item, k, state.not_in_catalog
+            )
+        if genre_rerank and len(neighbors):
+            with stage('similar_rerank'):
+                reranked = sims + SIMILAR_GENRE_WEIGHT * genre_overlap(state.genre_matrix, item, neighbors)
+                order = np.argsort(-reranked, kind='stable')
+                neighbors, sims = neighbors[order], sims[order]
+        neighbors, sims = neighbors[:n], sims[:n]
+        movies = state.movies_by_id.loc[engine.item_ids[neighbors]].reset_index()
+        return {
+            "success": True,
+            "movieId": movie_id,
+            "similar": [
+                {
+                    "movieId": int(movie.movieId),
+                    "title": movie.title,
+                    "genres": movie.genres,
+                    "similarity": round(float(sim), 4)
+                }
+                for movie, sim in zip(movies.itertuples(), sims)
+            ],
+            "source": source,
+            "model_version": state.model_version,
+            "error": None,
+            "validation_error": None
+        }
+    except Exception as e:
+        logger.error(f"Error in get_similar_movies: {e}")
+        return {
+            "success": False,
+            "movieId": movie_id,
+            "similar": None,
+            "source": None,
+            "model_version": state.model_version if state is not None else None,
+            "error": f"Error in get_similar_movies: {e}",
+            "validation_error": None
+        }
+
+def get_popular_movies(n=10, by='top_rated', genre=None):
+    """Most rated or best rated (Bayesian average) movies, overall or within a genre."""
+    logger.info(f"Popular movies: n={n}, by={by}, genre={genre}", extra=SAMPLED)
+    validation_error = None
+    if not isinstance(n, int) or n <= 0:
+        validation_error = "n must be a positive integer."
+    elif by not in ('top_rated', 'most_rated'):
+        validation_error = "by must be 'top_rated' or 'most_rated'."
+    elif genre is not None and by != 'top_rated':
+        validation_error = "Genre leaders are only ranked by 'top_rated'."
+    if validation_error:
+        logger.warning(f"Validation error: {validation_error}")
+        return {"success": False, "movies": None, "error": None, "validation_error": validation_error}
+    try:
+        state = get_state()
+        popularity = state.popularity
+        if genre is None:
+            items = popularity.top_n(n, by=by)
+        else:
+            items = popularity.genre_leaders.get(genre, popularity.genre_leaders.get(genre.title(), []))[:n]
+        movies = state.movies_by_id.loc[state.engine.item_ids[items]].reset_index()
+        return {
+            "success": True,
+            "movies": [
+                {
+                    "movieId": int(movie.movieId),
+                    "title": movie.title,
+                    "genres": movie.genres,
+                    "n_ratings": int(popularity.counts[item]),
+                    "bayesian_rating": float(popularity.bayesian[item])
+                }
+                for item, movie in zip(items, movies.itertuples())
+            ],
+            "error": None,
+            "validation_error": None
+        }
+    except Exception as e:
+        logger.error(f"Error in get_popular_movies: {e}")
+        return {"success": False, "movies": None, "error": f"Error in get_popular_movies: {e}", "validation_error": None}
+
+def search_movies(query='', genre=None, year_from=None, year_to=None, limit=10):
+    """Search the local catalog by fuzzy title, genre and release year range."""
+    logger.info(f"Catalog search: query={query!r}, genre={genre}, years={year_from}-{year_to}, limit={limit}",
+                extra=SAMPLED)
+    if not isinstance(limit, int) or limit <= 0:
+        logger.warning(f"Validation error: limit must be a positive integer. Got: {limit}")
+        return {
+            "success": False,
+            "results": None,
+            "error": None,
+            "validation_error": "limit must be a positive integer."
+        }
+    try:
+        catalog_index = get_state().catalog_index
+        with stage('catalog_search'):
+            results = catalog_index.search(query, genre=genre, year_from=year_from, year_to=year_to, limit=limit)
+        return {
+            "success": True,
+            "results": results,
+            "error": None,
+            "validation_error": None
+        }
+    except Exception as e:
+        logger.error(f"Error in search_movies: {e}")
+        return {
+            "success": False,
+            "results": None,
+            "error": f"Error in search_movies: {e}",
+            "validation_error": None
+        }
+
+def validate_ratings_request(user_id, ratings, state):
+    """Return the validation error message for a ratings submission, or None if it is valid."""
+    if not isinstance(user_id, int) or user_id <= 0:
+        return "user_id must be a positive integer."
+    if not ratings:
+        return "ratings must not be empty."
+    low, high = state.engine.rating_scale
+    for rating in ratings:
+        movie_id, value = rating.get('movieId'), rating.get('rating')
+        if not isinstance(movie_id, int) or movie_id not in state.movies_by_id.index \
+                or state.engine.item_index([movie_id])[0] < 0:
+            return f"Unknown movieId: {movie_id}."
+        if not isinstance(value, (int, float)) or not low <= value <= high:
+            return f"rating must be between {low} and {high}. Got: {value}"
+    return None
+
+def add_user_ratings(user_id, ratings):
+    """Record a user's new ratings and update their recommendations in place.
+
+    `ratings` is a list of {"movieId", "rating"} dicts. The ratings are appended
+    to the durable log before the in-memory index and the user's factors are updated.
+    """
+    logger.info(f"Adding {len(ratings)} ratings for user_id={user_id}")
+    try:
+        validation_error = validate_ratings_request(user_id, ratings, get_state())
+        if validation_error:
+            logger.warning(f"Validation error: {validation_error}")
+            return {
+                "success": False,
+                "userId": user_id,
+                "n_ratings": None,
+                "model_version": active_model_version(),
+                "error": None,
+                "validation_error": validation_error
+            }
+        started = time.perf_counter()
+        pairs = [(rating['movieId'], rating['rating']) for rating in ratings]
+        with _ingest_lock:
+            with stage('rating_log_append'):
+                rating_log.append(user_id, pairs)
+            state = get_state()
+            items = state.engine.item_index([movie_id for movie_id, _ in pairs])
+            with stage('fold_in'):
+                apply_ratings(state, user_id, items, [value for _, value in pairs])
+        logger.info(f"Applied {len(pairs)} ratings for user {user_id} in {1000 * (time.perf_counter() - started):.1f}ms")
+        return {
+            "success": True,
+            "userId": user_id,
+            "n_ratings": state.rating_index.n_ratings(user_id),
+            "model_version": state.model_version,
+            "error": None,
+            "validation_error": None
+        }
+    except Exception as e:
+        logger.error(f"Error in add_user_ratings: {e}")
+        return {
+            "success": False,
+            "userId": user_id,
+            "n_ratings": None,
+            "model_version": active_model_version(),
+            "error": f"Error in add_user_ratings: {e}",
+            "validation_error": None
+        }
+
+def merge_logged(rating_index, logged, item_index):
+    """A new index holding `rating_index` with logged ratings applied."""
+    for user_id, items, values in logged_by_user(logged, item_index):
+        rating_index.add(user_id, items, values)
+    return rating_index.compacted()
+
+def swap_ratings(state, rating_index, user_ids):
+    """Serve a compacted ratings index in `state`, keeping ratings logged since the compaction began.
+
+    `user_ids` are the users whose ratings were compacted; they are re-fitted
+    from the new index, which may hold ratings other workers received.
+    """
+    engine = state.engine
+    popularity = PopularityIndex.build(rating_index, engine.n_items, state.genre_index, state.not_in_catalog)
+    with _ingest_lock:
+        if _state is not state:
+            # A reload swapped in a state that was loaded with these ratings
+            return
+        pending = list(logged_by_user(rating_log.read_new(), engine.item_index))
+        for user_id, items, values in pending:
+            rating_index.add(user_id, items, values)
+        state.rating_index = rating_index
+        state.popularity = popularity
+        for user_id in set(user_ids) | {user_id for user_id, _, _ in pending}:
+            engine.fold_in(user_id, *rating_index.history(user_id), reg=FOLD_IN_REG)
+            score_cache.pop(user_id)
+
+def compact_ratings():
+    """Merge the ratings log into the base ratings (ratings.csv and the served artifacts).
+
+    One process compacts at a time; the others skip. The new base is built from
+    the base data on disk plus the ratings every worker logged, not from this
+    process's index, and POST /ratings is only held up while it is swapped in.
+    When serving from the registry, the ratings go to a copy of the active
+    version that is then activated, so published versions are never changed.
+    """
+    try:
+        with rating_log.compaction_lock() as acquired:
+            if not acquired:
+                logger.info("Skipping ratings compaction: another process is compacting.")
+                return {"success": True, "compacted": 0, "error": None}
+            state = get_state()
+            logged = rating_log.rotate()
+            if len(logged) == 0:
+                return {"success": True, "compacted": 0, "error": None}
+            started = time.perf_counter()
+            user_ids = logged['userId'].unique().tolist()
+            registry = ModelRegistry(MODEL_REGISTRY_DIR)
+            source = registry.current() if state.artifact_path is not None else None
+            meta, engine, rating_index = {'model_version': state.model_version}, state.engine, None
+            trained_version = state.trained_version
+            if source is not None:
+                # The active version holds every earlier compaction, even if this process has not reloaded it yet
+                meta, engine, rating_index, _, _ = load_artifacts(registry.path(source))
+                trained_version = meta.get('trained_version', meta['model_version'])
+            elif state.artifact_path is not None:
+                rating_index = load_ratings(state.artifact_path)
+            # Recorded first: if the rewrite below fails, the users are only re-fitted needlessly
+            folded_users.add(trained_version, user_ids)
+            if rating_index is not None:
+                rating_index = merge_logged(rating_index, logged, engine.item_index)
+            if source is not None:
+                version = f"{trained_version}-r{meta.get('ratings_revision', 0) + 1}"
+                registry.copy(source, version, lambda path: write_ratings(path, rating_index, model_version=version))
+                registry.activate(version)
+                if meta.get('ratings_revision'):
+                    # The copy an earlier compaction made; the published version it came from is kept
+                    registry.remove(source)
+            elif rating_index is not None:
+                write_ratings(state.artifact_path, rating_index)
+            if os.path.exists(RATINGS_PATH):
+                ratings_df = merge_ratings(pd.read_csv(RATINGS_PATH), logged)
+                write_csv_atomically(ratings_df, RATINGS_PATH)
+                if rating_index is None:
+                    rating_index = RatingsIndex.from_frame(ratings_df, engine.item_index)
+            rating_log.finish_rotation()
+        if rating_index is not None and meta['model_version'] == state.model_version:
+            swap_ratings(state, rating_index, user_ids)
+        logger.info(f"Compacted {len(logged)} logged ratings in {time.perf_counter() - started:.1f}s.")
+        return {"success": True, "compacted": len(logged), "error": None}
+    except Exception as e:
+        logger.error(f"Error in compact_ratings: {e}")
+        return {"success": False, "compacted": 0, "error": f"Error in compact_ratings: {e}"}
+
+def start_ratings_compactor(interval=RATINGS_COMPACT_INTERVAL):
+    """Compact the ratings log every `interval` seconds; returns the compactor or None if disabled."""
+    if interval <= 0:
+        return None
+    return PeriodicTask(compact_ratings, interval, "ratings-compactor").start()
@@ -0,0 +1,169 @@
+import numpy as np
+
+
+def top_k(scores, k):
+    """Return the positions of the k largest finite scores, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(scores, -k)[-k:]
+    order = np.argsort(scores[candidates])[::-1]
+    top = candidates[order]
+    return top[np.isfinite(scores[top])]
+
+
+class ScoringEngine:
+    """Scores users against the whole catalog using the factors of a fitted SVD.
+
+    The arrays are indexed by Surprise inner id: row u of `pu` is the user whose
+    raw id is `user_ids[u]`, row i of `qi` is the movie `item_ids[i]`. Arrays that
+    are already contiguous float32 (e.g. memory-mapped artifacts) are used without copying.
+
+    Users whose factors were re-estimated online (see fold_in) are scored with
+    those instead of their trained row, or instead of the global mean if they are new.
+    """
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_ids, item_ids, rating_scale=(0.5, 5.0)):
+        self.pu = np.ascontiguousarray(pu, dtype=np.float32)
+        self.qi = np.ascontiguousarray(qi, dtype=np.float32)
+        self.bu = np.ascontiguousarray(bu, dtype=np.float32)
+        self.bi = np.ascontiguousarray(bi, dtype=np.float32)
+        self.global_mean = np.float32(global_mean)
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids)
+        self.rating_scale = rating_scale
+        self._user_order = np.argsort(self.user_ids, kind='stable')
+        self._sorted_user_ids = self.user_ids[self._user_order]
+        self._item_order = np.argsort(self.item_ids, kind='stable')
+        self._sorted_item_ids = self.item_ids[self._item_order]
+        self._folded = {}
+
+    @classmethod
+    def from_model(cls, model):
+        """Pull factors, biases and id mappings out of a fitted Surprise SVD."""
+        trainset = model.trainset
+        user_ids = [trainset.to_raw_uid(u) for u in range(trainset.n_users)]
+        item_ids = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+        if getattr(model, 'biased', True):
+            bu, bi, global_mean = model.bu, model.bi, trainset.global_mean
+        else:
+            bu, bi, global_mean = np.zeros(trainset.n_users), np.zeros(trainset.n_items), 0.0
+        return cls(
+            model.pu, model.qi, bu, bi, global_mean,
+            user_ids, item_ids, rating_scale=trainset.rating_scale
+        )
+
+    @property
+    def n_items(self):
+        return self.qi.shape[0]
+
+    def user_index(self, user_id):
+        """Inner id of a raw user id, or None if the model has never seen the user."""
+        pos = np.searchsorted(self._sorted_user_ids, user_id)
+        if pos < len(self._sorted_user_ids) and self._sorted_user_ids[pos] == user_id:
+            return int(self._user_order[pos])
+        return None
+
+    def item_index(self, movie_ids):
+        """Inner ids for raw movie ids; movies unknown to the model map to -1."""
+        movie_ids = np.asarray(movie_ids)
+        pos = np.searchsorted(self._sorted_item_ids, movie_ids)
+        pos = np.minimum(pos, len(self._sorted_item_ids) - 1)
+        found = self._sorted_item_ids[pos] == movie_ids
+        return np.where(found, self._item_order[pos], -1)
+
+    def item_mask(self, movie_ids):
+        """Boolean mask over the item axis that is True for the given raw movie ids."""
+        mask = np.zeros(self.n_items, dtype=bool)
+        idx = self.item_index(movie_ids)
+        mask[idx[idx >= 0]] = True
+        return mask
+
+    def user_factors(self, user_id):
+        """(factors, bias) of a user, or None if the user has neither trained nor folded-in factors."""
+        folded = self._folded.get(user_id)
+        if folded is not None:
+            return folded
+        inner = self.user_index(user_id)
+        if inner is None:
+            return None
+        return self.pu[inner], self.bu[inner]
+
+    def is_folded(self, user_id):
+        return user_id in self._folded
+
+    def fold_in(self, user_id, items, ratings, reg=0.1):
+        """Re-estimate a user's factors and bias from their ratings with the item factors held fixed.
+
+        Solves the ridge regression of (rating - global_mean - bi) on [qi, 1] over
+        the rated items (inner ids), with the penalty scaled by the number of ratings.
+        """
+        items = np.asarray(items, dtype=np.intp)
+        if len(items) == 0:
+            self._folded.pop(user_id, None)
+            return
+        features = np.hstack([self.qi[items], np.ones((len(items), 1), dtype=np.float32)]).astype(np.float64)
+        targets = np.asarray(ratings, dtype=np.float64) - self.global_mean - self.bi[items]
+        gram = features.T @ features + reg * len(items) * np.eye(features.shape[1])
+        solution = np.linalg.solve(gram, features.T @ targets)
+        # One dict assignment, so concurrent readers see either the old or the new factors
+        self._folded[user_id] = (solution[:-1].astype(np.float32), np.float32(solution[-1]))
+
+    def score_user(self, user_id):
+        """Estimated rating of every item for a user, before clipping."""
+        factors = self.user_factors(user_id)
+        if factors is None:
+            return self.global_mean + self.bi
+        pu, bu = factors
+        return self.qi @ pu + (self.global_mean + bu) + self.bi
+
+    def score_items(self, user_id, items):
+        """Estimated ratings of a subset of items (inner ids) for a user, before clipping."""
+        factors = self.user_factors(user_id)
+        if factors is None:
+            return self.global_mean + self.bi[items]
+        pu, bu = factors
+        return self.qi[items] @ pu + (self.global_mean + bu) + self.bi[items]
+
+    def score_users(self, user_ids):
+        """Estimated ratings of every item for several users as one (users x items) product."""
+        factors = np.zeros((len(user_ids), self.qi.shape[1]), dtype=np.float32)
+        user_bias = np.zeros(len(user_ids), dtype=np.float32)
+        for row, user_id in enumerate(user_ids):
+            found = self.user_factors(user_id)
+            if found is not None:
+                factors[row], user_bias[row] = found
+        return factors @ self.qi.T + (self.global_mean + user_bias)[:, None] + self.bi
+
+    def clip(self, scores):
+        low, high = self.rating_scale
+        return np.clip(scores, low, high)
+
+    def top_n(self, user_id, n, exclude=None):
+        """Top-n item inner ids and clipped scores for a user, best first.
+
+        `exclude` is a boolean mask over the item axis (typically the user's rated items).
+        """
+        scores = self.score_user(user_id)
+        if exclude is not None:
+            scores = np.where(exclude, -np.inf, scores)
+        top = top_k(scores, n)
+        return top, self.clip(scores[top])
+
+    def top_n_batch(self, user_ids, n, exclude=None):
+        """Top-n item inner ids and clipped scores for each of several users.
+
+        Returns two (users x n) arrays sorted best first per row. `exclude` is a
+        (users x items) boolean mask; slots left over when a user has fewer than
+        n candidate items hold -inf scores and must be skipped by the caller.
+        """
+        scores = self.score_users(user_ids)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(n, self.n_items)
+        candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        top = np.take_along_axis(candidates, order, axis=1)
+        top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        return top, np.where(np.isfinite(top_scores), self.clip(top_scores), -np.inf)
@@ -0,0 +1,58 @@
+"""
+Tests for the IVF maximum-inner-product index.
+Run with: pytest backend/test_ann_index.py
+"""
+
+import numpy as np
+
+from backend.ann_index import IVFIndex
+from backend.scoring import ScoringEngine
+
+
+def make_engine():
+    rng = np.random.default_rng(1)
+    return ScoringEngine(
+        pu=rng.normal(size=(5, 4)),
+        qi=rng.normal(size=(200, 4)),
+        bu=rng.normal(size=5),
+        bi=rng.normal(size=200),
+        global_mean=3.0,
+        user_ids=[1, 2, 3, 4, 5],
+        item_ids=np.arange(1000, 1200),
+    )
+
+
+def test_probing_every_list_matches_exact_scoring():
+    engine = make_engine()
+    index = IVFIndex.build(engine, 'v1', n_lists=10)
+    exclude = np.zeros(engine.n_items, dtype=bool)
+    exclude[:20] = True
+    for user_id in (1, 3, 99):
+        top, _ = index.top_n(engine, user_id, 10, exclude, nprobe=index.n_lists)
+        assert top.tolist() == engine.top_n(user_id, 10, exclude)[0].tolist()
+
+
+def test_every_item_is_in_exactly_one_list():
+    index = IVFIndex.build(make_engine(), 'v1', n_lists=10)
+    assert sorted(index.list_items.tolist()) == list(range(200))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    engine = make_engine()
+    path = str(tmp_path / 'model.ivf.npz')
+    IVFIndex.build(engine, 'v1', n_lists=10).save(path)
+    assert IVFIndex.open(path, engine, 'v1').model_version == 'v1'
+    assert IVFIndex.open(path, engine, 'v2').model_version == 'v2'
+
+
+def test_unreadable_index_falls_back_to_exact_scoring(tmp_path):
+    path = tmp_path / 'model.ivf.npz'
+    path.write_bytes(b'PK\x03\x04 truncated')
+    assert IVFIndex.open(str(path), make_engine(), 'v1') is None
+
+
+def test_probe_count_is_at_least_one():
+    engine = make_engine()
+    index = IVFIndex.build(engine, 'v1', n_lists=10)
+    top, _ = index.top_n(engine, 1, 10, nprobe=0)
+    assert len(top) == 10
@@ -0,0 +1,55 @@
+"""
+Tests for the memory-mapped model and data artifacts.
+Run with: pytest backend/test_artifacts.py
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from backend.artifacts import export_artifacts, has_artifacts, load_artifacts
+from backend.genre_index import GenreIndex
+from backend.ratings_index import RatingsIndex
+from backend.scoring import ScoringEngine
+
+
+def make_state():
+    rng = np.random.default_rng(0)
+    engine = ScoringEngine(
+        pu=rng.normal(size=(2, 3)), qi=rng.normal(size=(3, 3)),
+        bu=rng.normal(size=2), bi=rng.normal(size=3),
+        global_mean=3.5, user_ids=[7, 9], item_ids=[30, 10, 20],
+    )
+    ratings = pd.DataFrame({'userId': [7, 7, 9], 'movieId': [10, 20, 30], 'rating': [4.0, 3.5, 5.0]})
+    movies = pd.DataFrame({
+        'movieId': [10, 20, 30],
+        'title': ['Alpha (1999)', 'Beta (2001)', 'Alpha (1999)'],
+        'genres': [['Comedy', 'Drama'], ['(no genres listed)'], ['Drama']],
+    })
+    expanded = movies.explode('genres')
+    return SimpleNamespace(
+        model_version='abc123',
+        engine=engine,
+        rating_index=RatingsIndex.from_frame(ratings, engine.item_index),
+        movies_df=movies,
+        movies_df_expanded=expanded,
+        genre_index=GenreIndex.from_frame(expanded, engine.item_index),
+    )
+
+
+def test_export_round_trips_through_memory_maps(tmp_path):
+    state = make_state()
+    out = str(tmp_path / 'artifacts')
+    export_artifacts(state, out)
+    assert has_artifacts(out)
+
+    meta, engine, rating_index, movies, genre_index = load_artifacts(out)
+    assert meta['model_version'] == 'abc123'
+    assert isinstance(engine.qi.base, np.memmap)
+    np.testing.assert_allclose(engine.score_user(7), state.engine.score_user(7), rtol=1e-6)
+    assert rating_index.history(7)[0].tolist() == state.rating_index.history(7)[0].tolist()
+    assert movies['title'].tolist() == state.movies_df['title'].tolist()
+    assert movies['genres'].tolist() == state.movies_df['genres'].tolist()
+    assert genre_index.genres == state.genre_index.genres
+    assert genre_index.items.tolist() == state.genre_index.items.tolist()
@@ -0,0 +1,43 @@
+"""
+Tests for the local catalog title index.
+Run with: pytest backend/test_catalog_search.py
+"""
+
+import pandas as pd
+import pytest
+
+from backend.catalog_search import CatalogIndex, split_title
+
+
+@pytest.fixture
+def index():
+    movies = pd.DataFrame({
+        'movieId': [1, 2, 3, 4, 5],
+        'title': ['Toy Story (1995)', 'Godfather, The (1972)', 'Inception (2010)',
+                  'Grumpier Old Men (1995)', 'Toy Story 2 (1999)'],
+        'genres': [['Animation', 'Comedy'], ['Crime', 'Drama'], ['Action', 'Sci-Fi'],
+                   ['Comedy', 'Romance'], ['Animation', 'Comedy']],
+    })
+    return CatalogIndex.from_frame(movies, popularity=[10, 50, 40, 5, 8])
+
+
+def test_split_title_moves_trailing_article_and_year():
+    assert split_title('Godfather, The (1972)') == ('the godfather', 1972)
+    assert split_title('Untitled') == ('untitled', None)
+
+
+def test_fuzzy_title_match(index):
+    assert index.search('the godfathr')[0]['movieId'] == 2
+    assert index.search('Toy Story 2')[0]['movieId'] == 5
+
+
+def test_filters_rank_by_popularity_without_query(index):
+    results = index.search(genre='comedy', year_from=1990, year_to=1996)
+    assert [r['movieId'] for r in results] == [1, 4]
+
+
+def test_parse_query_extracts_filters(index):
+    assert index.parse_query('Find me a comedy movie') == {'genre': 'Comedy', 'query': ''}
+    assert index.parse_query('animation from the 1990s') == {
+        'genre': 'Animation', 'year_from': 1990, 'year_to': 1999, 'query': ''}
+    assert index.parse_query('Tell me about Inception on IMDB') == {'query': 'inception'}
@@ -0,0 +1,197 @@
+"""
+Tests for the two-tier movie description cache, using a local fake LLM.
+Run with: pytest backend/test_descriptions.py
+"""
+
+import json
+import re
+
+import pytest
+
+from backend.descriptions import (
+    DescriptionCache,
+    DescriptionStore,
+    LRUCache,
+    PENDING,
+    UNAVAILABLE_ERROR,
+    UNAVAILABLE_NOT_CONFIGURED,
+    most_recommended_movies,
+    parse_batch_response,
+    warm,
+)
+
+
+class FakeLLM:
+    def __init__(self, fail=False):
+        self.prompts = []
+        self.fail = fail
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return f"Description for prompt #{len(self.prompts)}"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DescriptionStore(str(tmp_path / "descriptions.sqlite"))
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+
+
+def test_lru_entries_expire():
+    clock = FakeClock()
+    lru = LRUCache(maxsize=10, ttl=5, clock=clock)
+    lru.set("a", 1)
+    clock.now = 5
+    assert lru.get("a") is None
+
+
+def test_llm_is_called_once_per_movie(store):
+    llm = FakeLLM()
+    cache = DescriptionCache(store, llm_factory=lambda: llm)
+    first = cache.get(1, "Toy Story (1995)")
+    assert cache.get(1, "Toy Story (1995)") == first
+    assert len(llm.prompts) == 1
+    assert "Toy Story (1995)" in llm.prompts[0]
+
+
+def test_store_survives_a_cold_lru(store):
+    llm = FakeLLM()
+    DescriptionCache(store, llm_factory=lambda: llm).get(1, "Toy Story (1995)")
+    restarted = DescriptionCache(store, llm_factory=lambda: llm)
+    assert restarted.get(1, "Toy Story (1995)") == "Description for prompt #1"
+    assert len(llm.prompts) == 1
+
+
+def test_prompt_version_is_part_of_the_key(store):
+    llm = FakeLLM()
+    DescriptionCache(store, llm_factory=lambda: llm, prompt_version="v1").get(1, "Toy Story (1995)")
+    DescriptionCache(store, llm_factory=lambda: llm, prompt_version="v2").get(1, "Toy Story (1995)")
+    assert len(llm.prompts) == 2
+
+
+def test_failures_are_not_cached(store):
+    llm = FakeLLM(fail=True)
+    cache = DescriptionCache(store, llm_factory=lambda: llm)
+    assert cache.get(1, "Toy Story (1995)") == UNAVAILABLE_ERROR
+    llm.fail = False
+    assert cache.get(1, "Toy Story (1995)") == "Description for prompt #2"
+
+
+def test_missing_llm_returns_placeholder(store):
+    cache = DescriptionCache(store, llm_factory=lambda: None)
+    assert cache.get(1, "Toy Story (1995)") == UNAVAILABLE_NOT_CONFIGURED
+    assert cache.cached(1) is None
+
+
+class SlowLLM:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def invoke(self, prompt):
+        import time
+        time.sleep(self.delay)
+        return f"Slow description of {prompt}"
+
+
+def test_describe_reports_cached_and_fetched(store):
+    cache = DescriptionCache(store, llm_factory=lambda: FakeLLM())
+    cache.get(1, "Toy Story (1995)")
+    results, stats = cache.describe([(1, "Toy Story (1995)"), (2, "Jumanji (1995)")])
+    assert results[1][1] == "cached"
+    assert results[2][1] == "fetched"
+    assert stats == {"cached": 1, "fetched": 1, "failed": 0, "timed_out": 0}
+
+
+def test_describe_returns_placeholders_after_deadline(store):
+    cache = DescriptionCache(store, llm_factory=lambda: SlowLLM(0.5))
+    results, stats = cache.describe([(1, "Toy Story (1995)")], deadline=0.05)
+    assert results[1] == (PENDING, "timed_out")
+    assert stats["timed_out"] == 1
+    cache.fetch_async(1, "Toy Story (1995)").result()
+    assert cache.cached(1) is not None
+
+
+class BatchStubLLM:
+    """Deterministic stand-in that answers batch prompts with JSON.
+
+    Ids listed in `drop_first` are left out of the first reply, ids in
+    `malformed_first` get a non-string value in it.
+    """
+
+    def __init__(self, drop_first=(), malformed_first=()):
+        self.prompts = []
+        self.drop_first = set(drop_first)
+        self.malformed_first = set(malformed_first)
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        first = len(self.prompts) == 1
+        reply = {}
+        for movie_id, title in re.findall(r"^- (\d+): (.*)$", prompt, re.MULTILINE):
+            if first and int(movie_id) in self.drop_first:
+                continue
+            reply[movie_id] = 42 if first and int(movie_id) in self.malformed_first else f"About {title}."
+        return "```json\n" + json.dumps(reply) + "\n```"
+
+
+def test_batch_prompt_describes_all_misses_at_once(store):
+    llm = BatchStubLLM()
+    cache = DescriptionCache(store, llm_factory=lambda: llm)
+    movies = [(1, "Toy Story (1995)"), (2, "Jumanji (1995)"), (3, "Heat (1995)")]
+    results, stats = cache.describe(movies)
+    assert len(llm.prompts) == 1
+    assert stats["fetched"] == 3
+    assert results[2] == ("About Jumanji (1995).", "fetched")
+    assert cache.get(3, "Heat (1995)") == "About Heat (1995)."
+
+
+def test_batch_retries_only_missing_and_malformed_titles(store):
+    llm = BatchStubLLM(drop_first={2}, malformed_first={3})
+    cache = DescriptionCache(store, llm_factory=lambda: llm)
+    movies = [(1, "Toy Story (1995)"), (2, "Jumanji (1995)"), (3, "Heat (1995)")]
+    assert cache.generate_batch(movies) == {
+        1: "About Toy Story (1995).",
+        2: "About Jumanji (1995).",
+        3: "About Heat (1995).",
+    }
+    assert len(llm.prompts) == 2
+    assert "Toy Story" not in llm.prompts[1]
+
+
+def test_parse_batch_response_ignores_unexpected_and_invalid_entries():
+    reply = 'Sure! {"1": "Fine.", "2": "", "7": "Not asked for."}'
+    assert parse_batch_response(reply, [1, 2]) == {1: "Fine."}
+    assert parse_batch_response("no json here", [1]) == {}
+
+
+def test_warm_describes_the_most_recommended_movies_in_batches(store, tmp_path, monkeypatch):
+    from backend import recommender
+    from backend.test_topk_store import make_recommender_state
+
+    monkeypatch.setattr(recommender, '_state', make_recommender_state(str(tmp_path)))
+    llm = BatchStubLLM()
+    cache = DescriptionCache(store, llm_factory=lambda: llm)
+    top = most_recommended_movies(5)
+    cache.remember(top[0], "Already described.")
+    assert warm(5, cache, batch_size=2) == {"generated": 4, "skipped": 1, "failed": 0}
+    assert len(llm.prompts) == 2
+    assert all(cache.cached(movie_id) is not None for movie_id in top)
@@ -0,0 +1,32 @@
+"""
+Tests for the genre -> item incidence index.
+Run with: pytest backend/test_genre_index.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from backend.genre_index import GenreIndex
+
+
+def make_index():
+    movies = pd.DataFrame({
+        'movieId': [1, 2, 3, 4],
+        'genres': [['Comedy', 'Drama'], ['Comedy'], ['Drama'], ['Horror']],
+    }).explode('genres')
+    item_ids = {1: 0, 2: 1, 3: 2}
+    return GenreIndex.from_frame(movies, lambda ids: np.array([item_ids.get(i, -1) for i in ids]))
+
+
+def test_movies_are_listed_under_every_genre():
+    index = make_index()
+    assert index.genres == ['Comedy', 'Drama']
+    assert index.items[index.indptr[0]:index.indptr[1]].tolist() == [0, 1]
+    assert index.items[index.indptr[1]:index.indptr[2]].tolist() == [0, 2]
+
+
+def test_top_n_per_genre_respects_exclusions():
+    scores = np.array([5.0, 3.0, 4.0])
+    exclude = np.array([False, False, True])
+    result = {genre: items.tolist() for genre, items in make_index().top_n(scores, 2, exclude)}
+    assert result == {'Comedy': [0, 1], 'Drama': [0]}
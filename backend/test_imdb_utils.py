@@ -0,0 +1,124 @@
+"""
+Tests for the OMDb client, run against a local stand-in OMDb HTTP server.
+Run with: pytest backend/test_imdb_utils.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from backend import imdb_utils
+from backend.imdb_utils import OMDbClient, normalize_title
+from backend.lru_cache import LRUCache
+
+
+class FakeOMDb(BaseHTTPRequestHandler):
+    requests_seen = []
+    delay = 0.0
+    status = 200
+    body = None
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        FakeOMDb.requests_seen.append(params)
+        time.sleep(FakeOMDb.delay)
+        body = json.dumps(FakeOMDb.body or {"Title": params["t"][0], "Response": "True"}).encode()
+        self.send_response(FakeOMDb.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def omdb_url():
+    FakeOMDb.requests_seen = []
+    FakeOMDb.delay = 0.0
+    FakeOMDb.status = 200
+    FakeOMDb.body = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOMDb)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_normalize_title():
+    assert normalize_title("  The   Godfather ") == normalize_title("the godfather")
+
+
+def test_query_is_url_encoded(omdb_url):
+    client = OMDbClient(api_key="key", base_url=omdb_url)
+    assert client.search("Tom & Jerry?")["Title"] == "Tom & Jerry?"
+    assert FakeOMDb.requests_seen[0]["apikey"] == ["key"]
+
+
+def test_repeated_lookups_are_cached(omdb_url):
+    client = OMDbClient(base_url=omdb_url)
+    client.search("Inception")
+    client.search(" inception ")
+    assert len(FakeOMDb.requests_seen) == 1
+
+
+def test_errors_are_not_cached(omdb_url):
+    FakeOMDb.status = 500
+    client = OMDbClient(base_url=omdb_url)
+    assert client.search("Inception") == {"error": "IMDB API error"}
+    FakeOMDb.status = 200
+    assert client.search("Inception")["Response"] == "True"
+    assert len(FakeOMDb.requests_seen) == 2
+
+
+def test_omdb_errors_sent_as_http_200_are_not_cached(omdb_url):
+    FakeOMDb.body = {"Response": "False", "Error": "Request limit reached!"}
+    client = OMDbClient(base_url=omdb_url)
+    assert client.search("Inception")["Error"] == "Request limit reached!"
+    FakeOMDb.body = None
+    assert client.search("Inception")["Response"] == "True"
+    assert len(FakeOMDb.requests_seen) == 2
+
+
+def test_not_found_answers_are_cached_briefly(omdb_url, monkeypatch):
+    monkeypatch.setattr(imdb_utils, 'IMDB_NOT_FOUND_TTL', 60)
+    now = [0.0]
+    FakeOMDb.body = {"Response": "False", "Error": "Movie not found!"}
+    client = OMDbClient(base_url=omdb_url, cache=LRUCache(10, 3600, clock=lambda: now[0]))
+    client.search("Nothing")
+    client.search("Nothing")
+    assert len(FakeOMDb.requests_seen) == 1
+    now[0] = 61.0
+    client.search("Nothing")
+    assert len(FakeOMDb.requests_seen) == 2
+
+
+def test_concurrent_identical_lookups_share_one_request(omdb_url):
+    FakeOMDb.delay = 0.2
+    client = OMDbClient(base_url=omdb_url)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.search("Heat"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(FakeOMDb.requests_seen) == 1
+    assert all(result["Title"] == "Heat" for result in results)
+
+
+def test_read_timeout_returns_error(omdb_url):
+    FakeOMDb.delay = 0.5
+    client = OMDbClient(base_url=omdb_url, timeout=(1, 0.1))
+    assert "error" in client.search("Heat")
+
+
+def test_async_search(omdb_url):
+    client = OMDbClient(base_url=omdb_url)
+    assert asyncio.run(client.search_async("Heat"))["Title"] == "Heat"
@@ -0,0 +1,38 @@
+"""
+Tests for the genre and release-year item masks.
+Run with: pytest backend/test_item_filters.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from backend.genre_index import GenreIndex
+from backend.item_filters import ItemFilters
+
+
+def make_filters():
+    movies = pd.DataFrame({
+        'movieId': [10, 11, 12, 13, 14],
+        'title': ['A (1988)', 'B (1990)', 'C (1995)', 'D (2001)', 'E'],
+        'genres': [['Comedy'], ['Drama'], ['Comedy', 'Horror'], ['Drama', 'Comedy'], ['Horror']],
+    })
+    item_index = lambda ids: np.asarray(ids) - 10
+    genre_index = GenreIndex.from_frame(movies.explode('genres'), item_index)
+    return ItemFilters.build(movies, item_index, 5, genre_index)
+
+
+def test_genre_masks_include_any_and_exclude_all():
+    filters = make_filters()
+    assert filters.allowed() is None
+    assert np.flatnonzero(filters.allowed(genres=['comedy', 'Drama'])).tolist() == [0, 1, 2, 3]
+    assert np.flatnonzero(filters.allowed(genres=['Comedy'], exclude_genres=['Horror'])).tolist() == [0, 3]
+    assert filters.unknown_genres(['Comedy', 'Western']) == ['Western']
+
+
+def test_year_ranges_cut_through_buckets():
+    filters = make_filters()
+    assert filters.item_years.tolist() == [1988, 1990, 1995, 2001, -1]
+    assert sorted(filters.year_masks) == [1980, 1990, 2000]
+    assert np.flatnonzero(filters.year_mask(1989, 1995)).tolist() == [1, 2]
+    assert np.flatnonzero(filters.year_mask(year_to=1990)).tolist() == [0, 1]
+    assert np.flatnonzero(filters.allowed(genres=['Comedy'], year_from=1995)).tolist() == [2, 3]
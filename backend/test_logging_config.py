@@ -0,0 +1,39 @@
+"""
+Tests for the queue-based JSON logging.
+Run with: pytest backend/test_logging_config.py
+"""
+
+import json
+import logging
+import queue
+
+from backend.logging_config import SAMPLED, DroppingQueueHandler, JsonFormatter, SuccessSampler, truncate
+
+
+def make_record(message, args=None, **extra):
+    record = logging.LogRecord('Test', logging.INFO, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields_and_truncates():
+    entry = json.loads(JsonFormatter().format(make_record('x' * 5000, user_id=7)))
+    assert entry['level'] == 'INFO' and entry['logger'] == 'Test'
+    assert entry['user_id'] == 7
+    assert entry['message'] == truncate('x' * 5000)
+    assert entry['message'].endswith('chars truncated]')
+
+
+def test_sampler_only_drops_sampled_records():
+    sampler = SuccessSampler(0.0)
+    assert not sampler.filter(make_record('ok', **SAMPLED))
+    assert sampler.filter(make_record('error'))
+
+
+def test_queue_handler_merges_arguments_and_drops_records_when_full():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    handler.handle(make_record('first %s', ('record',)))
+    handler.handle(make_record('second'))
+    queued = handler.queue.get_nowait()
+    assert queued.msg == 'first record' and queued.args is None
+    assert handler.queue.empty()
@@ -0,0 +1,61 @@
+"""
+Tests for the counters, histograms and stage timers.
+Run with: pytest backend/test_metrics.py
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import metrics
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('latency_seconds', "Latency.", ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, 'score')
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{stage="score",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="score",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{stage="score",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="score"} 4' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = metrics.Counter('lookups_total', "Lookups.", ('cache',))
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    assert counter.value('a"b') == 3
+    assert counter.render()[-1] == 'lookups_total{cache="a\\"b"} 3'
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    before = metrics.STAGE_SECONDS.count('disabled')
+    with metrics.stage('disabled'):
+        pass
+    metrics.count_cache('disabled', True)
+    assert metrics.STAGE_SECONDS.count('disabled') == before
+    assert metrics.CACHE_LOOKUPS.value('disabled', 'hit') == 0
+
+
+def test_middleware_adds_server_timing_and_route_latency():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=True)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with metrics.stage('lookup'):
+            return {"item_id": item_id}
+
+    before = metrics.HTTP_REQUEST_SECONDS.count('GET', '/items/{item_id}', '200')
+    response = TestClient(app).get("/items/7")
+    assert response.status_code == 200
+    assert response.headers['server-timing'].startswith('lookup;dur=')
+    assert 'total;dur=' in response.headers['server-timing']
+    assert metrics.HTTP_REQUEST_SECONDS.count('GET', '/items/{item_id}', '200') == before + 1
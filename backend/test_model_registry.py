@@ -0,0 +1,70 @@
+"""
+Tests for the versioned model registry.
+Run with: pytest backend/test_model_registry.py
+"""
+
+import os
+import threading
+
+import pytest
+
+from backend.model_registry import ModelRegistry, RegistryWatcher
+from backend.test_artifacts import make_state
+
+
+def test_publish_and_activate(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    assert registry.current() is None and registry.versions() == []
+
+    assert registry.publish(make_state(), activate=True) == 'abc123'
+    assert registry.versions() == ['abc123']
+    assert registry.current() == 'abc123'
+
+    with pytest.raises(ValueError):
+        registry.activate('missing')
+    assert registry.current() == 'abc123'
+    for version in ('missing', '..', 'abc123/..'):
+        with pytest.raises(ValueError):
+            registry.path(version)
+
+
+def test_copies_are_new_versions_sharing_unchanged_files(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    registry.publish(make_state(), activate=True)
+    seen = []
+    path = registry.copy('abc123', 'abc123-r1', lambda tmp_dir: seen.append(registry.versions()))
+    # The copy is written under a temporary name that is not a version
+    assert seen == [['abc123']]
+    with pytest.raises(ValueError):
+        registry.path('abc123-r1.tmp')
+    assert sorted(registry.versions()) == ['abc123', 'abc123-r1']
+    assert os.path.samefile(os.path.join(path, 'qi.npy'), os.path.join(registry.path('abc123'), 'qi.npy'))
+
+    with pytest.raises(ValueError):
+        registry.remove('abc123')
+    registry.activate('abc123-r1')
+    registry.remove('abc123')
+    assert registry.versions() == ['abc123-r1']
+
+
+def test_watcher_reports_only_changes_of_current(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    state = make_state()
+    registry.publish(state, activate=True)
+    state.model_version = 'def456'
+    registry.publish(state)
+
+    changed = threading.Event()
+    seen = []
+
+    def on_change(version):
+        seen.append(version)
+        changed.set()
+
+    watcher = RegistryWatcher(registry, on_change, interval=0.01).start()
+    try:
+        registry.activate('def456')
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+    assert seen == ['def456']
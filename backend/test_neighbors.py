@@ -0,0 +1,43 @@
+"""
+Tests for the item-to-item neighbor table.
+Run with: pytest backend/test_neighbors.py
+"""
+
+import json
+
+import numpy as np
+
+from backend.neighbors import NeighborTable, compute_neighbors, exact_neighbors, genre_overlap, normalized_factors
+
+
+def test_blocked_neighbors_match_exact_cosine_ranking():
+    unit_qi = normalized_factors(np.random.default_rng(0).normal(size=(50, 6)))
+    exclude = np.zeros(50, dtype=bool)
+    exclude[[3, 7]] = True
+    ids, sims = compute_neighbors(unit_qi, 5, exclude, block_size=8)
+    assert ids.dtype == np.int32 and sims.dtype == np.float16
+    for item in (0, 3, 49):
+        expected_ids, expected_sims = exact_neighbors(unit_qi, item, 5, exclude)
+        assert ids[item].tolist() == expected_ids.tolist()
+        assert np.allclose(sims[item], expected_sims, atol=1e-3)
+        assert item not in ids[item] and not exclude[ids[item]].any()
+
+
+def test_table_is_memory_mapped_and_rejects_other_models(tmp_path):
+    unit_qi = normalized_factors(np.random.default_rng(1).normal(size=(10, 3)))
+    ids, sims = compute_neighbors(unit_qi, 4)
+    np.save(tmp_path / 'neighbor_ids.npy', ids)
+    np.save(tmp_path / 'neighbor_sims.npy', sims)
+    (tmp_path / 'meta.json').write_text(json.dumps({'model_version': 'abc', 'k': 4}))
+
+    table = NeighborTable.open(str(tmp_path), 'abc')
+    assert isinstance(table.ids, np.memmap)
+    found, found_sims = table.lookup(2, 3)
+    assert found.tolist() == ids[2, :3].tolist() and found_sims.dtype == np.float32
+    assert table.lookup(2, 5) is None
+    assert NeighborTable.open(str(tmp_path), 'other') is None
+
+
+def test_genre_overlap_is_jaccard():
+    genres = np.array([[1, 1, 0], [1, 0, 0], [0, 0, 1], [0, 0, 0]], dtype=bool)
+    assert genre_overlap(genres, 0, np.array([1, 2, 3])).tolist() == [0.5, 0.0, 0.0]
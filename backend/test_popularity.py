@@ -0,0 +1,49 @@
+"""
+Tests for the popularity and Bayesian-average rankings.
+Run with: pytest backend/test_popularity.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from backend.genre_index import GenreIndex
+from backend.popularity import PopularityIndex, bayesian_average
+from backend.ratings_index import RatingsIndex
+
+
+def make_index(**kwargs):
+    # Item 0: many average ratings; item 1: one perfect rating; item 2: several good ratings; item 3: unrated
+    ratings = pd.DataFrame({
+        'userId': [1, 2, 3, 4, 5, 1, 1, 2, 3],
+        'movieId': [0, 0, 0, 0, 0, 1, 2, 2, 2],
+        'rating': [3.0, 3.0, 3.0, 3.0, 3.0, 5.0, 4.5, 4.5, 4.5],
+    })
+    rating_index = RatingsIndex.from_frame(ratings, lambda ids: np.asarray(ids))
+    movies = pd.DataFrame({
+        'movieId': [0, 1, 2, 3],
+        'genres': [['Drama'], ['Comedy'], ['Comedy', 'Drama'], ['Comedy']],
+    }).explode('genres')
+    genre_index = GenreIndex.from_frame(movies, lambda ids: np.asarray(ids))
+    return PopularityIndex.build(rating_index, 4, genre_index, **kwargs)
+
+
+def test_bayesian_average_shrinks_small_counts_towards_the_prior():
+    assert bayesian_average(np.array([1]), np.array([5.0]), 4, 3.0)[0] == 3.4
+    assert bayesian_average(np.array([0]), np.array([0.0]), 4, 3.0)[0] == 3.0
+
+
+def test_rankings_leave_out_unrated_and_excluded_items():
+    index = make_index(prior_count=3)
+    assert index.top_n(4, by='most_rated').tolist() == [0, 2, 1]
+    assert index.top_n(4).tolist() == [2, 1, 0]
+    assert index.top_n(2, rated=np.array([2])).tolist() == [1, 0]
+    excluded = make_index(prior_count=3, exclude=np.array([False, True, False, False]))
+    assert excluded.top_n(4).tolist() == [2, 0]
+
+
+def test_genre_leaders_skip_rated_items():
+    index = make_index(prior_count=3, k=1)
+    assert {genre: items.tolist() for genre, items in index.genre_top_n(1)} == {'Comedy': [2], 'Drama': [2]}
+    # Requests longer than the precomputed rankings rank the full catalog
+    assert index.top_n(3).tolist() == [2, 1, 0]
+    assert dict(index.genre_top_n(1, rated=np.array([2]))) == {}
@@ -0,0 +1,73 @@
+"""
+Tests for the durable ratings log.
+Run with: pytest backend/test_rating_log.py
+"""
+
+import pandas as pd
+
+from backend.rating_log import FoldedUsers, RatingLog, merge_ratings
+
+
+def rows(frame):
+    return frame[['userId', 'movieId', 'rating']].values.tolist()
+
+
+def test_append_read_and_rotate(tmp_path):
+    log = RatingLog(str(tmp_path / 'ratings.log.csv'))
+    assert len(log.read()) == 0
+    log.append(7, [(10, 4.0), (20, 2.5)], timestamp=100)
+    log.append(8, [(10, 1.0)], timestamp=101)
+    assert rows(log.read()) == [[7, 10, 4.0], [7, 20, 2.5], [8, 10, 1.0]]
+
+    assert rows(log.rotate()) == [[7, 10, 4.0], [7, 20, 2.5], [8, 10, 1.0]]
+    log.append(9, [(30, 5.0)], timestamp=102)
+    # Until the base data is rewritten, the rotated ratings are still pending
+    assert rows(log.read()) == [[7, 10, 4.0], [7, 20, 2.5], [8, 10, 1.0], [9, 30, 5.0]]
+    log.finish_rotation()
+    assert rows(log.rotate()) == [[9, 30, 5.0]]
+    log.finish_rotation()
+    # Only the last merged file is kept for replay
+    assert rows(log.read()) == [[9, 30, 5.0]]
+
+
+def test_read_new_follows_the_log_across_rotations(tmp_path):
+    # Two processes sharing one log: one appends and compacts, the other follows it
+    writer = RatingLog(str(tmp_path / 'ratings.log.csv'))
+    reader = RatingLog(str(tmp_path / 'ratings.log.csv'))
+    writer.append(7, [(10, 4.0)])
+    assert rows(reader.read()) == [[7, 10, 4.0]]
+    assert len(reader.read_new()) == 0
+    writer.append(8, [(20, 3.0)])
+    assert rows(reader.read_new()) == [[8, 20, 3.0]]
+    writer.append(9, [(30, 2.0)])
+    writer.rotate()
+    writer.append(10, [(40, 1.0)])
+    assert rows(reader.read_new()) == [[9, 30, 2.0], [10, 40, 1.0]]
+    assert len(reader.read_new()) == 0
+
+
+def test_only_one_process_compacts_at_a_time(tmp_path):
+    first = RatingLog(str(tmp_path / 'ratings.log.csv'))
+    second = RatingLog(str(tmp_path / 'ratings.log.csv'))
+    with first.compaction_lock() as acquired:
+        assert acquired
+        with second.compaction_lock() as also_acquired:
+            assert not also_acquired
+    with second.compaction_lock() as acquired:
+        assert acquired
+
+
+def test_folded_users_are_kept_per_model_version(tmp_path):
+    folded = FoldedUsers(str(tmp_path / 'ratings.folded.json'))
+    assert folded.get('v1') == []
+    folded.add('v1', [7, 3])
+    folded.add('v1', [3, 9])
+    folded.add('v2', [1])
+    assert folded.get('v1') == [3, 7, 9] and folded.get('v2') == [1]
+
+
+def test_merge_keeps_last_rating_per_pair():
+    base = pd.DataFrame({'userId': [7, 8], 'movieId': [10, 10], 'rating': [3.0, 2.0], 'timestamp': [1, 1]})
+    logged = pd.DataFrame({'userId': [7, 9], 'movieId': [10, 30], 'rating': [5.0, 4.0], 'timestamp': [2, 2]})
+    merged = merge_ratings(base, logged)
+    assert sorted(merged[['userId', 'movieId', 'rating']].values.tolist()) == [[7, 10, 5.0], [8, 10, 2.0], [9, 30, 4.0]]
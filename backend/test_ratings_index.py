@@ -0,0 +1,61 @@
+"""
+Tests for the per-user CSR ratings index.
+Run with: pytest backend/test_ratings_index.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from backend.ratings_index import RatingsIndex
+
+
+def make_index():
+    ratings = pd.DataFrame({
+        'userId': [3, 1, 3, 2, 1, 3],
+        'movieId': [30, 10, 20, 10, 99, 10],
+        'rating': [4.0, 3.5, 2.0, 5.0, 1.0, 4.5],
+    })
+    item_ids = {10: 0, 20: 1, 30: 2}
+    return RatingsIndex.from_frame(ratings, lambda ids: np.array([item_ids.get(i, -1) for i in ids]))
+
+
+def test_history_is_a_view_in_original_order():
+    index = make_index()
+    items, values = index.history(3)
+    assert items.tolist() == [2, 1, 0]
+    assert values.tolist() == [4.0, 2.0, 4.5]
+    assert items.base is not None
+
+
+def test_unknown_movies_are_dropped():
+    index = make_index()
+    assert index.history(1)[0].tolist() == [0]
+    assert index.n_ratings(1) == 1
+
+
+def test_missing_user_has_empty_history():
+    index = make_index()
+    assert index.row(42) is None
+    assert len(index.history(42)[0]) == 0
+    assert not index.exclusion_mask(42, 3).any()
+
+
+def test_exclusion_mask():
+    assert make_index().exclusion_mask(3, 4).tolist() == [True, True, True, False]
+
+
+def test_added_ratings_overwrite_and_compact():
+    index = make_index()
+    items, values = index.add(3, [1, 1], [5.0, 3.0])
+    assert dict(zip(items.tolist(), values.tolist())) == {0: 4.5, 1: 3.0, 2: 4.0}
+    index.add(7, [2], [1.0])
+    assert index.n_ratings(7) == 1
+
+    def ratings(index, user_id):
+        items, values = index.history(user_id)
+        return dict(zip(items.tolist(), values.tolist()))
+
+    compacted = index.compacted()
+    assert compacted.user_ids.tolist() == [1, 2, 3, 7]
+    for user_id in (1, 2, 3, 7):
+        assert ratings(compacted, user_id) == ratings(index, user_id)
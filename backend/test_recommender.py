@@ -0,0 +1,232 @@
+"""
+Tests for the recommendation service functions, run against a small in-process state.
+Run with: pytest backend/test_recommender.py
+"""
+
+import os
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module, recommender
+from backend.ann_index import IVFIndex
+from backend.app import app
+from backend.lru_cache import LRUCache
+from backend.model_registry import ModelRegistry
+from backend.rating_log import FoldedUsers, RatingLog
+from backend.test_topk_store import make_recommender_state
+from backend.topk_store import build_store
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    state = make_recommender_state(str(tmp_path))
+    monkeypatch.setattr(recommender, '_state', state)
+    monkeypatch.setattr(recommender, 'rating_log', RatingLog(str(tmp_path / 'ratings.log.csv')))
+    monkeypatch.setattr(recommender, 'score_cache', LRUCache(100, 300))
+    return state
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Serve version v1 from a registry, with a top-K store, as a fresh backend process would."""
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    monkeypatch.setattr(recommender, 'MODEL_REGISTRY_DIR', registry.root)
+    monkeypatch.setattr(recommender, 'RATINGS_PATH', str(tmp_path / 'ratings.csv'))
+    monkeypatch.setattr(recommender, 'rating_log', RatingLog(str(tmp_path / 'ratings.log.csv')))
+    monkeypatch.setattr(recommender, 'folded_users', FoldedUsers(str(tmp_path / 'ratings.folded.json')))
+    monkeypatch.setattr(recommender, 'score_cache', LRUCache(100, 300))
+    state = make_recommender_state(str(tmp_path))
+    registry.publish(state, activate=True)
+    monkeypatch.setattr(recommender, '_state', state)
+    build_store(os.path.join(registry.path('v1'), 'topk'), k=10, workers=1)
+    monkeypatch.setattr(recommender, '_state', None)
+    return registry
+
+
+def restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(recommender, '_state', None)
+    monkeypatch.setattr(recommender, 'rating_log', RatingLog(str(tmp_path / 'ratings.log.csv')))
+    monkeypatch.setattr(recommender, 'score_cache', LRUCache(100, 300))
+
+
+def recommended_ids(result):
+    return [rec['movieId'] for rec in result['recommendations']]
+
+
+def test_compacted_ratings_are_still_folded_in_after_a_restart(registry, tmp_path, monkeypatch):
+    client = TestClient(app)
+    before = recommender.get_user_recommendations(1, 5, describe=False)
+    assert before['source'] == 'precomputed'
+    disliked = recommended_ids(before)
+    response = client.post('/ratings', json={
+        'user_id': 1, 'ratings': [{'movieId': movie_id, 'rating': 0.5} for movie_id in disliked]
+    })
+    assert response.json()['success']
+    # Another worker process logged a rating that this one has not applied yet
+    RatingLog(recommender.rating_log.path).append(2, [(190, 5.0)])
+
+    assert recommender.compact_ratings()['compacted'] == 6
+    assert len(recommender.rating_log.read_new()) == 0
+    # A second compaction replaces the merged log that would otherwise still be replayed on load
+    assert recommender.add_user_ratings(3, [{'movieId': 10, 'rating': 4.0}])['success']
+    assert recommender.compact_ratings()['compacted'] == 1
+
+    # Each compaction published a copy of the active version and replaced the previous copy
+    assert registry.current() == 'v1-r2'
+    assert sorted(registry.versions()) == ['v1', 'v1-r2']
+    published = recommender.load_state_from_registry('v1')
+    assert 190 not in published.engine.item_ids[published.rating_index.history(2)[0]]
+
+    for reload in (lambda: restart(tmp_path, monkeypatch), recommender.reload_state):
+        reload()
+        after = recommender.get_user_recommendations(1, 5, describe=False)
+        assert after['source'] == 'model'
+        assert not set(disliked) & set(recommended_ids(after))
+        state = recommender.get_state()
+        assert 190 in state.engine.item_ids[state.rating_index.history(2)[0]]
+        assert state.engine.is_folded(2)
+        # The copy is served under its own name, with the indexes built from the factors it shares
+        assert after['model_version'] == state.model_version == 'v1-r2'
+        assert state.trained_version == 'v1' and state.topk_store is not None
+
+
+def test_reloads_swap_in_complete_states(registry, tmp_path):
+    state = make_recommender_state(str(tmp_path), model_version='v2')
+    registry.publish(state)
+    assert recommender.add_user_ratings(1, [{'movieId': 10, 'rating': 5.0}])['success']
+    stop = threading.Event()
+    seen, errors = set(), []
+
+    def serve():
+        while not stop.is_set():
+            state = recommender.get_state()
+            result = recommender.get_user_recommendations(1, 5, describe=False)
+            seen.add(state.model_version)
+            # Ratings are folded in before a state is swapped in, never after
+            if not (result['success'] and state.engine.is_folded(1)):
+                errors.append(result)
+
+    reader = threading.Thread(target=serve)
+    reader.start()
+    try:
+        for version in ('v2', 'v1') * 5:
+            assert recommender.reload_state(version)['model_version'] == version
+    finally:
+        stop.set()
+        reader.join()
+    assert not errors
+    assert seen == {'v1', 'v2'}
+
+
+def test_admin_endpoints_need_the_configured_token(registry, monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(app_module, 'MODEL_REGISTRY_DIR', registry.root)
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', None)
+    response = client.post('/admin/ratings/compact')
+    assert response.status_code == 403 and 'disabled' in response.json()['error']
+    assert client.get('/admin/model', headers={'X-Admin-Token': ''}).status_code == 403
+
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    assert client.get('/admin/model', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.get('/admin/model', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200 and response.json()['registry_version'] == 'v1'
+    response = client.post('/admin/model/reload', json={'version': '../v1'}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 404
+
+
+def test_ratings_logged_by_other_workers_are_synced(state):
+    RatingLog(recommender.rating_log.path).append(1, [(20, 5.0)])
+    recommender.sync_ratings()
+    items, values = state.rating_index.history(1)
+    assert 5.0 in values[state.engine.item_ids[items] == 20]
+    assert state.engine.is_folded(1)
+
+
+def test_batch_results_match_single_user_results(state):
+    # 99 is unknown to the model and answered from the popularity lists
+    user_ids = state.rating_index.user_ids.tolist() + [99]
+    batch = list(recommender.get_batch_user_recommendations(user_ids, 5, chunk_size=3))
+    assert [result['userId'] for result in batch] == user_ids
+    for user_id, result in zip(user_ids, batch):
+        single = recommender.get_user_recommendations(user_id, 5, describe=False)
+        assert result['success'] and single['success']
+        assert result['source'] == single['source']
+        assert result['recommendations'] == [
+            {key: rec[key] for key in ('movieId', 'title', 'genres', 'description')}
+            for rec in single['recommendations']
+        ]
+    assert batch[-1]['source'] == 'popularity'
+
+
+def test_cursor_round_trip_and_filter_check():
+    key = recommender.filter_key(recommender.normalize_filters({'genres': ['Drama'], 'year_from': 1990}))
+    cursor = recommender.encode_cursor(20, key)
+    assert recommender.decode_cursor(cursor, key) == (20, 'exact')
+    assert recommender.decode_cursor(recommender.encode_cursor(20, key, 'ivf'), key) == (20, 'ivf')
+    other = recommender.filter_key(recommender.normalize_filters({'genres': ['Comedy'], 'year_from': 1990}))
+    with pytest.raises(ValueError):
+        recommender.decode_cursor(cursor, other)
+    with pytest.raises(ValueError):
+        recommender.decode_cursor('not a cursor', key)
+
+
+def test_pages_continue_the_ranking_and_reject_cursors_of_other_filters(state):
+    filters = {'exclude_genres': ['Horror']}
+    whole = recommender.get_user_recommendations(1, 4, describe=False, filters=filters)
+    first = recommender.get_user_recommendations(1, 2, describe=False, filters=filters)
+    second = recommender.get_user_recommendations(1, 2, describe=False, filters=filters, cursor=first['next_cursor'])
+    ids = [rec['movieId'] for rec in first['recommendations'] + second['recommendations']]
+    assert ids == [rec['movieId'] for rec in whole['recommendations']]
+    assert all('Horror' not in rec['genres'] for rec in whole['recommendations'])
+
+    other = recommender.get_user_recommendations(
+        1, 2, describe=False, filters={'exclude_genres': ['Drama']}, cursor=first['next_cursor']
+    )
+    assert not other['success'] and other['validation_error'] == "cursor was issued for different filters."
+
+
+def test_ivf_pages_continue_the_first_page(state, monkeypatch):
+    monkeypatch.setattr(state, 'ann_index', IVFIndex.build(state.engine, state.model_version, n_lists=4))
+    monkeypatch.setattr(recommender, 'IVF_NPROBE', 1)
+    first = recommender.get_user_recommendations(1, 2, describe=False)
+    second = recommender.get_user_recommendations(1, 2, describe=False, cursor=first['next_cursor'])
+    ids = recommended_ids(first) + recommended_ids(second)
+    assert len(set(ids)) == 4
+
+    # The pages are the exact ranking of the candidates the probed lists hold
+    engine = state.engine
+    exclude = state.rating_index.exclusion_mask(1, engine.n_items) | state.not_in_catalog
+    candidates = state.ann_index.ranking(engine, 1, recommender.RANKING_DEPTH, exclude, nprobe=1)
+    scores = engine.score_items(1, candidates)
+    exact = engine.item_ids[candidates[np.argsort(-scores, kind='stable')]]
+    assert ids == list(exact[:4])
+
+
+def test_new_ratings_drop_the_cached_ranking(state):
+    filters = {'exclude_genres': ['Horror']}
+    first = recommender.get_user_recommendations(1, 2, describe=False, filters=filters)
+    assert recommender.score_cache.get(1) is not None
+    rated = first['recommendations'][0]['movieId']
+    assert recommender.add_user_ratings(1, [{'movieId': rated, 'rating': 1.0}])['success']
+    assert recommender.score_cache.get(1) is None
+    again = recommender.get_user_recommendations(1, 2, describe=False, filters=filters)
+    assert rated not in [rec['movieId'] for rec in again['recommendations']]
+
+
+def test_pages_past_the_cached_ranking_rank_deeper(state, monkeypatch):
+    monkeypatch.setattr(recommender, 'RANKING_DEPTH', 3)
+    filters = {'exclude_genres': ['Horror']}
+    first = recommender.get_user_recommendations(1, 2, describe=False, filters=filters)
+    per_user = recommender.score_cache.get(1)
+    (ranking, _, exhausted), = per_user.values()
+    assert len(ranking) == 3 and not exhausted
+
+    second = recommender.get_user_recommendations(1, 2, describe=False, filters=filters, cursor=first['next_cursor'])
+    (ranking, _, _), = per_user.values()
+    assert len(ranking) > 3
+    ids = [rec['movieId'] for rec in first['recommendations'] + second['recommendations']]
+    whole = recommender.get_user_recommendations(1, 4, describe=False, filters=filters)
+    assert ids == [rec['movieId'] for rec in whole['recommendations']]
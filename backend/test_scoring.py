@@ -0,0 +1,72 @@
+"""
+Tests for the vectorized SVD scoring engine.
+Run with: pytest backend/test_scoring.py
+"""
+
+import numpy as np
+import pytest
+
+from backend.scoring import ScoringEngine, top_k
+
+
+@pytest.fixture
+def engine():
+    rng = np.random.default_rng(0)
+    return ScoringEngine(
+        pu=rng.normal(size=(4, 3)),
+        qi=rng.normal(size=(6, 3)),
+        bu=rng.normal(size=4),
+        bi=rng.normal(size=6),
+        global_mean=3.5,
+        user_ids=[10, 20, 30, 40],
+        item_ids=[105, 101, 104, 102, 106, 103],
+    )
+
+
+def test_top_k_returns_best_first_and_skips_masked():
+    scores = np.array([1.0, 5.0, -np.inf, 3.0, 4.0])
+    assert top_k(scores, 3).tolist() == [1, 4, 3]
+    assert top_k(scores, 10).tolist() == [1, 4, 3, 0]
+
+
+def test_scores_match_svd_estimate(engine):
+    u = engine.user_index(20)
+    expected = engine.global_mean + engine.bu[u] + engine.bi + engine.qi @ engine.pu[u]
+    np.testing.assert_allclose(engine.score_user(20), expected, rtol=1e-6)
+
+
+def test_unknown_user_gets_item_baseline(engine):
+    np.testing.assert_allclose(engine.score_user(999), engine.global_mean + engine.bi)
+
+
+def test_item_index_maps_raw_ids(engine):
+    assert engine.item_index([104, 999, 105]).tolist() == [2, -1, 0]
+
+
+def test_top_n_excludes_rated_items(engine):
+    exclude = engine.item_mask([105, 101])
+    top, scores = engine.top_n(10, 6, exclude)
+    assert len(top) == 4
+    assert not set(top.tolist()) & {0, 1}
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_batch_matches_single_user_scoring(engine):
+    users = [10, 999, 40]
+    exclude = np.zeros((3, engine.n_items), dtype=bool)
+    exclude[0, [0, 1]] = True
+    top, scores = engine.top_n_batch(users, 3, exclude)
+    for row, user_id in enumerate(users):
+        expected_top, expected_scores = engine.top_n(user_id, 3, exclude[row])
+        assert top[row].tolist() == expected_top.tolist()
+        np.testing.assert_allclose(scores[row], expected_scores, rtol=1e-6)
+
+
+def test_fold_in_fits_new_user_ratings(engine):
+    items = np.arange(engine.n_items)
+    ratings = engine.score_user(30)[items]
+    engine.fold_in(555, items, ratings, reg=1e-6)
+    assert engine.is_folded(555)
+    np.testing.assert_allclose(engine.score_user(555), ratings, atol=1e-3)
+    top, _ = engine.top_n_batch([555], 2)
+    assert top[0].tolist() == engine.top_n(555, 2)[0].tolist()
@@ -0,0 +1,108 @@
+"""
+Tests for the offline top-K recommendation store.
+Run with: pytest backend/test_topk_store.py
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend import recommender
+from backend.ratings_index import RatingsIndex
+from backend.scoring import ScoringEngine
+from backend.topk_store import TopKStore, build_store, main, record_dtype
+
+
+def make_recommender_state(path, model_version='v1'):
+    """A served state over 6 users and 20 movies; the last movie is missing from the catalog."""
+    rng = np.random.default_rng(0)
+    n_users, n_items = 6, 20
+    user_ids = np.arange(1, n_users + 1)
+    item_ids = 10 * np.arange(1, n_items + 1)
+    engine = ScoringEngine(
+        rng.normal(0, 0.5, (n_users, 4)), rng.normal(0, 0.5, (n_items, 4)),
+        rng.normal(0, 0.2, n_users), rng.normal(0, 0.2, n_items), 3.5, user_ids, item_ids,
+    )
+    users, items = np.nonzero(rng.random((n_users, n_items)) < 0.4)
+    ratings = pd.DataFrame({
+        'userId': user_ids[users],
+        'movieId': item_ids[items],
+        'rating': rng.integers(1, 11, len(users)) / 2,
+    })
+    movies = pd.DataFrame({
+        'movieId': item_ids[:-1],
+        'title': [f"Movie {i} ({1980 + 2 * i})" for i in range(n_items - 1)],
+        'genres': [[('Comedy', 'Drama', 'Horror')[i % 3]] for i in range(n_items - 1)],
+    })
+    return recommender.RecommenderState(
+        model_version, engine, RatingsIndex.from_frame(ratings, engine.item_index), movies,
+        topk_path=os.path.join(path, 'topk'), ann_path=os.path.join(path, 'ivf.npz'),
+        neighbors_path=os.path.join(path, 'neighbors'),
+    )
+
+
+def write_store(path, ids_by_user, k, model_version='v1'):
+    dtype = record_dtype(k)
+    user_ids = sorted(ids_by_user)
+    records = np.zeros(len(user_ids), dtype=dtype)
+    records['ids'] = -1
+    for row, user_id in enumerate(user_ids):
+        ids = ids_by_user[user_id]
+        records['ids'][row, :len(ids)] = ids
+        records['scores'][row, :len(ids)] = np.linspace(5.0, 4.0, len(ids))
+    os.makedirs(path)
+    records.tofile(os.path.join(path, 'topk.bin'))
+    offsets = np.full(max(user_ids) + 1, -1, dtype=np.int64)
+    offsets[user_ids] = np.arange(len(user_ids)) * dtype.itemsize
+    np.save(os.path.join(path, 'offsets.npy'), offsets)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'model_version': model_version, 'k': k, 'record_size': dtype.itemsize}, f)
+
+
+def test_lookup_returns_stored_ids_in_order(tmp_path):
+    path = str(tmp_path / 'topk')
+    write_store(path, {3: [30, 10, 20], 7: [40, 50, 60, 70]}, k=4)
+    store = TopKStore.open(path, 'v1')
+    assert store.lookup(3, 2).tolist() == [30, 10]
+    assert store.lookup(7, 4).tolist() == [40, 50, 60, 70]
+    # Padding of users with fewer than k stored ids is dropped
+    assert store.lookup(3, 4).tolist() == [30, 10, 20]
+    # Unknown users, inside and beyond the offsets, and requests longer than k
+    assert store.lookup(5, 2) is None
+    assert store.lookup(99, 2) is None
+    assert store.lookup(3, 5) is None
+
+
+def test_store_of_another_model_is_refused(tmp_path):
+    path = str(tmp_path / 'topk')
+    write_store(path, {3: [30]}, k=2, model_version='v1')
+    assert TopKStore.open(path, 'v2') is None
+    assert TopKStore.open(str(tmp_path / 'missing'), 'v1') is None
+
+
+def test_build_store_matches_live_top_n(tmp_path, monkeypatch):
+    state = make_recommender_state(str(tmp_path))
+    monkeypatch.setattr(recommender, '_state', state)
+    k = 15
+    build_store(str(tmp_path / 'topk'), k=k, workers=1, chunk_size=4)
+
+    store = TopKStore.open(str(tmp_path / 'topk'), 'v1')
+    engine = state.engine
+    for user_id in state.rating_index.user_ids.tolist():
+        exclude = state.rating_index.exclusion_mask(user_id, engine.n_items) | state.not_in_catalog
+        expected, _ = engine.top_n(user_id, k, exclude)
+        assert store.lookup(user_id, k).tolist() == engine.item_ids[expected].tolist()
+    # Every user rated several of the 19 catalog movies, so their records are padded
+    assert len(store.lookup(1, k)) < k
+
+
+def test_cli_writes_where_the_served_version_reads_the_store(tmp_path, monkeypatch):
+    version_dir = tmp_path / 'registry' / 'v1'
+    version_dir.mkdir(parents=True)
+    state = make_recommender_state(str(version_dir))
+    monkeypatch.setattr(recommender, '_state', state)
+    monkeypatch.setattr('sys.argv', ['topk_store', '--k', '5', '--workers', '1'])
+    main()
+    assert TopKStore.open(str(version_dir / 'topk'), 'v1').lookup(1, 5) is not None
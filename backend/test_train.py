@@ -0,0 +1,62 @@
+"""
+Tests for the training pipeline.
+Run with: pytest backend/test_train.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from backend.train import _solve_side, encode_ratings, fit_als, predict, search
+
+
+def make_ratings(n_users=40, n_items=30, density=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    pu, qi = rng.normal(0, 0.5, (n_users, 3)), rng.normal(0, 0.5, (n_items, 3))
+    users, items = np.nonzero(rng.random((n_users, n_items)) < density)
+    ratings = np.clip(3.5 + np.einsum('ij,ij->i', pu[users], qi[items]), 0.5, 5.0)
+    return pd.DataFrame({'userId': users + 100, 'movieId': items + 1000, 'rating': ratings})
+
+
+def test_solve_side_matches_per_row_ridge():
+    rng = np.random.default_rng(1)
+    indptr = np.array([0, 3, 3, 8])
+    indices = rng.integers(0, 5, 8)
+    targets = rng.normal(size=8)
+    features = rng.normal(size=(5, 2))
+    solution = _solve_side(indptr, indices, targets, features, reg=0.1)
+    for row in (0, 2):
+        x = features[indices[indptr[row]:indptr[row + 1]]]
+        n = len(x)
+        expected = np.linalg.solve(x.T @ x + 0.1 * n * np.eye(2), x.T @ targets[indptr[row]:indptr[row + 1]])
+        np.testing.assert_allclose(solution[row], expected)
+    assert not solution[1].any()
+
+
+def test_solve_side_handles_rows_with_fewer_ratings_than_dimensions():
+    rng = np.random.default_rng(2)
+    counts = np.array([1, 2, 2, 5, 9])
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    indices = rng.integers(0, 12, indptr[-1])
+    targets = rng.normal(size=indptr[-1])
+    features = rng.normal(size=(12, 6))
+    solution = _solve_side(indptr, indices, targets, features, reg=0.2)
+    for row, n in enumerate(counts):
+        x = features[indices[indptr[row]:indptr[row + 1]]]
+        expected = np.linalg.solve(x.T @ x + 0.2 * n * np.eye(6), x.T @ targets[indptr[row]:indptr[row + 1]])
+        np.testing.assert_allclose(solution[row], expected, atol=1e-12)
+
+
+def test_als_fits_low_rank_ratings():
+    encoded = encode_ratings(make_ratings())
+    factors = fit_als(encoded['users'], encoded['items'], encoded['values'],
+                      len(encoded['user_ids']), len(encoded['item_ids']), n_factors=3, n_epochs=20, reg=0.001)
+    errors = predict(factors, encoded['users'], encoded['items']) - encoded['values']
+    assert np.sqrt(np.mean(errors ** 2)) < 0.1
+
+
+def test_search_reports_every_configuration():
+    configs = [{'n_factors': 3, 'n_epochs': 5, 'reg': 0.05}, {'n_factors': 2, 'n_epochs': 2, 'reg': 0.5}]
+    results = search(encode_ratings(make_ratings()), 'als', configs, cv=2, workers=1)
+    assert sorted(r['params']['n_factors'] for r in results) == [2, 3]
+    assert results[0]['rmse'] <= results[1]['rmse']
+    assert all(r['mae'] > 0 and r['fit_seconds'] > 0 for r in results)
@@ -0,0 +1,177 @@
+"""
+Offline top-K recommendation store.
+
+Build it for every user in the ratings with:
+    python -m backend.topk_store --k 100 --workers 4
+
+The store is a directory holding
+    meta.json    model version the store was built from, k and the record size
+    topk.bin     one fixed-width record per user: k int32 movie ids followed by
+                 k float32 scores, best first, padded with id -1
+    offsets.npy  int64 byte offset of each user's record in topk.bin, indexed
+                 by raw user id (-1 for users without a record)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backend.logging_config import get_logger
+
+logger = get_logger("TopKStore")
+
+
+def record_dtype(k):
+    return np.dtype([('ids', '<i4', (k,)), ('scores', '<f4', (k,))])
+
+
+class TopKStore:
+    """Read-only view of a top-K store; records are memory-mapped, not loaded."""
+
+    def __init__(self, path, meta, records, offsets):
+        self.path = path
+        self.meta = meta
+        self.k = meta['k']
+        self.model_version = meta['model_version']
+        self.records = records
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        records = np.memmap(os.path.join(path, 'topk.bin'), dtype=record_dtype(meta['k']), mode='r')
+        offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        return cls(path, meta, records, offsets)
+
+    @classmethod
+    def open(cls, path, model_version):
+        """Load the store at `path`, or return None if it is missing or built from another model."""
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            logger.info(f"No top-K store at {path}; serving live scores only.")
+            return None
+        try:
+            store = cls.load(path)
+        except Exception as e:
+            logger.error(f"Failed to load top-K store at {path}: {e}")
+            return None
+        if store.model_version != model_version:
+            logger.warning(
+                f"Ignoring top-K store at {path}: built from model {store.model_version}, "
+                f"serving model {model_version}."
+            )
+            return None
+        logger.info(f"Loaded top-K store at {path} for {len(store.records)} users (k={store.k}).")
+        return store
+
+    def lookup(self, user_id, n):
+        """Top-n raw movie ids for a user, or None if the store cannot answer."""
+        if n > self.k or user_id >= len(self.offsets):
+            return None
+        offset = self.offsets[int(user_id)]
+        if offset < 0:
+            return None
+        ids = self.records[offset // self.records.dtype.itemsize]['ids'][:n]
+        return ids[ids >= 0]
+
+
+def _score_shard(start, end, k, chunk_size):
+    """Score rows [start, end) of the ratings index in a worker process."""
+    from backend import recommender
+
+    state = recommender.get_state()
+    engine, rating_index = state.engine, state.rating_index
+    user_ids = rating_index.user_ids[start:end].tolist()
+    ids = np.full((len(user_ids), k), -1, dtype=np.int32)
+    scores = np.full((len(user_ids), k), np.nan, dtype=np.float32)
+    for c in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[c:c + chunk_size]
+        exclude = rating_index.exclusion_masks(chunk, engine.n_items) | state.not_in_catalog
+        top, top_scores = engine.top_n_batch(chunk, k, exclude)
+        valid = np.isfinite(top_scores)
+        width = top.shape[1]
+        ids[c:c + len(chunk), :width] = np.where(valid, engine.item_ids[top], -1)
+        scores[c:c + len(chunk), :width] = np.where(valid, top_scores, np.nan)
+    return start, ids, scores
+
+
+def _write_shards(records, results, k):
+    for start, ids, scores in results:
+        records['ids'][start:start + len(ids)] = ids
+        records['scores'][start:start + len(ids)] = scores
+        logger.info(f"Wrote top-{k} for users {start}..{start + len(ids)}")
+
+
+def build_store(path, k=100, workers=None, chunk_size=256):
+    """Compute top-k recommendations for every user with ratings and write the store to `path`.
+
+    With workers=1 the users are scored in this process instead of a process pool.
+    """
+    from backend import recommender
+
+    state = recommender.get_state()
+    user_ids = state.rating_index.user_ids
+    workers = workers or os.cpu_count() or 1
+    bounds = np.linspace(0, len(user_ids), workers + 1).astype(int)
+    dtype = record_dtype(k)
+
+    tmp_path = path.rstrip('/') + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    records = np.memmap(os.path.join(tmp_path, 'topk.bin'), dtype=dtype, mode='w+', shape=(len(user_ids),))
+
+    started = time.perf_counter()
+    shards = [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    if workers == 1:
+        # Score in this process, against the state it is serving
+        results = (_score_shard(start, end, k, chunk_size) for start, end in shards)
+        _write_shards(records, results, k)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_score_shard, start, end, k, chunk_size) for start, end in shards]
+            _write_shards(records, (future.result() for future in futures), k)
+    records.flush()
+    del records
+
+    offsets = np.full(int(user_ids.max()) + 1 if len(user_ids) else 0, -1, dtype=np.int64)
+    offsets[user_ids] = np.arange(len(user_ids), dtype=np.int64) * dtype.itemsize
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+    meta = {
+        'model_version': state.trained_version,
+        'k': k,
+        'record_size': dtype.itemsize,
+        'n_users': int(len(user_ids)),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+    logger.info(f"Built top-{k} store for {len(user_ids)} users in {time.perf_counter() - started:.1f}s at {path}")
+    return meta
+
+
+def main():
+    from backend import recommender
+
+    parser = argparse.ArgumentParser(description="Precompute top-K recommendations for every user.")
+    parser.add_argument('--out', default=None,
+                        help="Store directory to write (default: where the served model version reads it).")
+    parser.add_argument('--k', type=int, default=100, help="Recommendations kept per user.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--chunk-size', type=int, default=recommender.BATCH_CHUNK_SIZE,
+                        help="Users scored per matrix product.")
+    args = parser.parse_args()
+    # The active registry version reads its store from inside the version directory
+    out = args.out or recommender.get_state().topk_path
+    build_store(out, k=args.k, workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+Hyperparameter search and training for the recommendation model.
+
+Replaces the notebook's single-threaded GridSearchCV step. Every
+(configuration, fold) pair is fitted in a process pool; the encoded ratings are
+written once as .npy files that the workers memory-map, so they share a single
+read-only copy instead of each unpickling its own. The best configuration is
+then refitted on all ratings and published to the model registry.
+
+    python -m backend.train --algo svd --factors 50 100 150 --epochs 20 30 --lr 0.005 0.01
+    python -m backend.train --algo als --factors 20 50 --epochs 5 10 --reg 0.1 0.3 --activate
+
+`svd` is Surprise's SGD SVD (what the notebook used); `als` is a NumPy
+alternating-least-squares trainer for the same biased model that solves every
+user (then every item) exactly per pass, so it needs far fewer passes. `svd`
+is the default; `als` with its default regularization is about as accurate.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend.logging_config import get_logger
+
+RATING_SCALE = (0.5, 5.0)
+
+logger = get_logger("Train")
+
+
+def encode_ratings(ratings_df):
+    """Dense user and item codes for the ratings plus the raw ids of each code."""
+    user_ids, users = np.unique(ratings_df['userId'].to_numpy(), return_inverse=True)
+    item_ids, items = np.unique(ratings_df['movieId'].to_numpy(), return_inverse=True)
+    return {
+        'users': users.astype(np.int32),
+        'items': items.astype(np.int32),
+        'values': ratings_df['rating'].to_numpy(dtype=np.float32),
+        'user_ids': user_ids,
+        'item_ids': item_ids,
+    }
+
+
+def _csr(rows, cols, values, n_rows):
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+def _solve_side(indptr, indices, targets, features, reg, max_chunk_floats=1 << 23):
+    """Ridge solution per row: argmin_x sum_j (targets_j - features[indices_j] . x)^2 + reg * n * |x|^2.
+
+    Rows are bucketed by exact rating count, so each bucket's ratings form an
+    unpadded (rows x count x dim) block solved as one batched system. Rows with
+    fewer ratings than dimensions solve the equivalent count x count system
+    (X^T X + l I)^-1 X^T = X^T (X X^T + l I)^-1 instead of the dim x dim one.
+    """
+    n_rows, dim = len(indptr) - 1, features.shape[1]
+    solution = np.zeros((n_rows, dim), dtype=np.float64)
+    counts = np.diff(indptr)
+    order = np.argsort(counts, kind='stable')
+    order = order[counts[order] > 0]
+    for bucket in np.split(order, np.flatnonzero(np.diff(counts[order])) + 1):
+        count = int(counts[bucket[0]])
+        step = max(1, max_chunk_floats // (count * max(count, dim)))
+        for start in range(0, len(bucket), step):
+            rows = bucket[start:start + step]
+            positions = indptr[rows, None] + np.arange(count)
+            x = features[indices[positions]]
+            xt = x.transpose(0, 2, 1)
+            t = targets[positions][..., None]
+            if count < dim:
+                kernel = x @ xt + reg * count * np.eye(count)
+                solution[rows] = (xt @ np.linalg.solve(kernel, t))[..., 0]
+            else:
+                gram = xt @ x + reg * count * np.eye(dim)
+                solution[rows] = np.linalg.solve(gram, xt @ t)[..., 0]
+    return solution
+
+
+def fit_als(users, items, values, n_users, n_items, n_factors=50, n_epochs=10, reg=0.3, seed=0):
+    """Biased matrix factorization by alternating least squares.
+
+    Returns (pu, qi, bu, bi, global_mean) indexed by user and item code.
+    """
+    rng = np.random.default_rng(seed)
+    global_mean = float(values.mean()) if len(values) else 0.0
+    by_user = _csr(users, items, values, n_users)
+    by_item = _csr(items, users, values, n_items)
+    qi = rng.normal(0, 0.1, (n_items, n_factors))
+    bi = np.zeros(n_items)
+    pu, bu = np.zeros((n_users, n_factors)), np.zeros(n_users)
+    ones_u, ones_i = np.ones((n_users, 1)), np.ones((n_items, 1))
+    for _ in range(n_epochs):
+        indptr, cols, vals = by_user
+        solution = _solve_side(indptr, cols, vals - global_mean - bi[cols], np.hstack([qi, ones_i]), reg)
+        pu, bu = solution[:, :-1], solution[:, -1]
+        indptr, cols, vals = by_item
+        solution = _solve_side(indptr, cols, vals - global_mean - bu[cols], np.hstack([pu, ones_u]), reg)
+        qi, bi = solution[:, :-1], solution[:, -1]
+    return pu, qi, bu, bi, global_mean
+
+
+def fit_svd(users, items, values, n_users, n_items, n_factors=100, n_epochs=20, lr=0.005, reg=0.02, seed=0):
+    """Surprise SVD on coded ratings, returned as (pu, qi, bu, bi, global_mean) indexed by code."""
+    from surprise import SVD, Dataset, Reader
+
+    frame = pd.DataFrame({'user': users, 'item': items, 'rating': values})
+    trainset = Dataset.load_from_df(frame, Reader(rating_scale=RATING_SCALE)).build_full_trainset()
+    model = SVD(n_factors=n_factors, n_epochs=n_epochs, lr_all=lr, reg_all=reg, random_state=seed)
+    model.fit(trainset)
+    user_codes = [trainset.to_raw_uid(u) for u in range(trainset.n_users)]
+    item_codes = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+    pu, bu = np.zeros((n_users, n_factors)), np.zeros(n_users)
+    qi, bi = np.zeros((n_items, n_factors)), np.zeros(n_items)
+    pu[user_codes], bu[user_codes] = model.pu, model.bu
+    qi[item_codes], bi[item_codes] = model.qi, model.bi
+    return pu, qi, bu, bi, trainset.global_mean
+
+
+TRAINERS = {'svd': fit_svd, 'als': fit_als}
+
+
+def predict(factors, users, items):
+    pu, qi, bu, bi, global_mean = factors
+    estimates = global_mean + bu[users] + bi[items] + np.einsum('ij,ij->i', pu[users], qi[items])
+    return np.clip(estimates, *RATING_SCALE)
+
+
+_shared = {}
+
+
+def _attach(data_dir):
+    """Pool initializer: memory-map the shared rating arrays once per worker."""
+    for name in ('users', 'items', 'values', 'folds'):
+        _shared[name] = np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+    with open(os.path.join(data_dir, 'shape.json')) as f:
+        _shared.update(json.load(f))
+
+
+def _evaluate(algo, params, fold):
+    """Fit on every fold but `fold` and score the held-out ratings."""
+    test = _shared['folds'] == fold
+    users, items, values = _shared['users'], _shared['items'], _shared['values']
+    started = time.perf_counter()
+    factors = TRAINERS[algo](
+        users[~test], items[~test], values[~test], _shared['n_users'], _shared['n_items'], **params
+    )
+    fit_seconds = time.perf_counter() - started
+    errors = predict(factors, users[test], items[test]) - values[test]
+    return {
+        'fold': fold,
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'fit_seconds': fit_seconds,
+    }
+
+
+def grid(args):
+    keys = ['n_factors', 'n_epochs', 'reg'] + (['lr'] if args.algo == 'svd' else [])
+    values = [args.factors, args.epochs, args.reg] + ([args.lr] if args.algo == 'svd' else [])
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def search(encoded, algo, configs, cv=3, workers=None, seed=0):
+    """Cross-validated RMSE/MAE and fit time of every configuration, best RMSE first."""
+    folds = np.random.default_rng(seed).integers(0, cv, len(encoded['values'])).astype(np.int8)
+    with tempfile.TemporaryDirectory(prefix='train-') as data_dir:
+        for name in ('users', 'items', 'values'):
+            np.save(os.path.join(data_dir, f'{name}.npy'), encoded[name])
+        np.save(os.path.join(data_dir, 'folds.npy'), folds)
+        with open(os.path.join(data_dir, 'shape.json'), 'w') as f:
+            json.dump({'n_users': len(encoded['user_ids']), 'n_items': len(encoded['item_ids'])}, f)
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(data_dir,)) as pool:
+            futures = {
+                (i, fold): pool.submit(_evaluate, algo, params, fold)
+                for i, params in enumerate(configs) for fold in range(cv)
+            }
+            results = []
+            for i, params in enumerate(configs):
+                folds_done = [futures[i, fold].result() for fold in range(cv)]
+                result = {
+                    'algo': algo,
+                    'params': params,
+                    'rmse': float(np.mean([r['rmse'] for r in folds_done])),
+                    'mae': float(np.mean([r['mae'] for r in folds_done])),
+                    'fit_seconds': float(np.mean([r['fit_seconds'] for r in folds_done])),
+                    'total_seconds': float(sum(r['fit_seconds'] for r in folds_done)),
+                }
+                logger.info(
+                    f"{algo} {params}: RMSE {result['rmse']:.4f}, MAE {result['mae']:.4f}, "
+                    f"{result['fit_seconds']:.2f}s per fit"
+                )
+                results.append(result)
+        logger.info(f"Searched {len(configs)} configurations x {cv} folds in {time.perf_counter() - started:.1f}s")
+    return sorted(results, key=lambda r: r['rmse'])
+
+
+def train_final(ratings_df, algo, params, seed=0):
+    """Fit the chosen configuration on all ratings.
+
+    Returns (engine, model_version, model_bytes); model_bytes is the pickled
+    Surprise SVD for `svd` (the file the notebook produced) and None for `als`.
+    """
+    from backend.scoring import ScoringEngine
+
+    if algo == 'svd':
+        from surprise import SVD, Dataset, Reader
+
+        data = Dataset.load_from_df(ratings_df[['userId', 'movieId', 'rating']], Reader(rating_scale=RATING_SCALE))
+        model = SVD(n_factors=params['n_factors'], n_epochs=params['n_epochs'], lr_all=params['lr'],
+                    reg_all=params['reg'], random_state=seed)
+        model.fit(data.build_full_trainset())
+        model_bytes = pickle.dumps(model)
+        # Same version the server derives when it loads this pickle from MODEL_PATH
+        model_version = hashlib.sha256(model_bytes).hexdigest()[:12]
+        return ScoringEngine.from_model(model), model_version, model_bytes
+
+    encoded = encode_ratings(ratings_df)
+    pu, qi, bu, bi, global_mean = fit_als(
+        encoded['users'], encoded['items'], encoded['values'],
+        len(encoded['user_ids']), len(encoded['item_ids']), seed=seed, **params
+    )
+    engine = ScoringEngine(pu, qi, bu, bi, global_mean, encoded['user_ids'], encoded['item_ids'],
+                           rating_scale=RATING_SCALE)
+    digest = hashlib.sha256()
+    for array in (engine.pu, engine.qi, engine.bu, engine.bi):
+        digest.update(array.tobytes())
+    return engine, digest.hexdigest()[:12], None
+
+
+def main():
+    from backend.model_registry import ModelRegistry
+    from backend.ratings_index import RatingsIndex
+    from backend.recommender import MOVIES_PATH, RATINGS_PATH, MODEL_REGISTRY_DIR, RecommenderState
+
+    parser = argparse.ArgumentParser(description="Grid-search, train and publish the recommendation model.")
+    parser.add_argument('--algo', choices=sorted(TRAINERS), default='svd')
+    parser.add_argument('--factors', type=int, nargs='+', default=[50, 100, 150])
+    parser.add_argument('--epochs', type=int, nargs='+', default=None,
+                        help="Passes over the ratings (default: 20 30 for svd, 10 for als).")
+    parser.add_argument('--lr', type=float, nargs='+', default=[0.005, 0.01], help="SGD learning rate (svd only).")
+    parser.add_argument('--reg', type=float, nargs='+', default=None,
+                        help="Regularization (default: 0.02 for svd, 0.3 per rating for als).")
+    parser.add_argument('--cv', type=int, default=3, help="Cross-validation folds.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--ratings', default=RATINGS_PATH)
+    parser.add_argument('--registry', default=MODEL_REGISTRY_DIR, help="Registry to publish the best model to.")
+    parser.add_argument('--activate', action='store_true', help="Make the published model the served version.")
+    parser.add_argument('--pickle', default=None, help="Also write the fitted Surprise SVD here (svd only).")
+    parser.add_argument('--report', default=None, help="Write the search results as JSON to this file.")
+    parser.add_argument('--no-publish', action='store_true', help="Only run the search.")
+    args = parser.parse_args()
+    args.epochs = args.epochs or ([20, 30] if args.algo == 'svd' else [10])
+    args.reg = args.reg or [0.02 if args.algo == 'svd' else 0.3]
+
+    ratings_df = pd.read_csv(args.ratings)
+    configs = grid(args)
+    logger.info(f"Searching {len(configs)} {args.algo} configurations over {len(ratings_df)} ratings")
+    results = search(encode_ratings(ratings_df), args.algo, configs, cv=args.cv, workers=args.workers)
+    print(f"{'rmse':>8} {'mae':>8} {'fit s':>8}  params")
+    for result in results:
+        print(f"{result['rmse']:8.4f} {result['mae']:8.4f} {result['fit_seconds']:8.2f}  {result['params']}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.no_publish:
+        return
+
+    best = results[0]['params']
+    started = time.perf_counter()
+    engine, model_version, model_bytes = train_final(ratings_df, args.algo, best)
+    logger.info(f"Trained final {args.algo} model {model_version} with {best} in {time.perf_counter() - started:.1f}s")
+    if model_bytes is not None and args.pickle:
+        with open(args.pickle, 'wb') as f:
+            f.write(model_bytes)
+    movies_df = pd.read_csv(MOVIES_PATH)
+    movies_df['genres'] = movies_df['genres'].str.split('|')
+    registry = ModelRegistry(args.registry)
+    # Indexes the state opens or builds go to the new version, never to the served files
+    version_dir = os.path.join(registry.root, model_version)
+    os.makedirs(version_dir, exist_ok=True)
+    state = RecommenderState(
+        model_version, engine, RatingsIndex.from_frame(ratings_df, engine.item_index), movies_df,
+        topk_path=os.path.join(version_dir, 'topk'), ann_path=os.path.join(version_dir, 'ivf.npz'),
+        neighbors_path=os.path.join(version_dir, 'neighbors'),
+    )
+    registry.publish(state)
+    if state.ann_index is not None:
+        # Built above in IVF retrieval mode; publishing replaced the version directory
+        state.ann_index.save(os.path.join(registry.path(model_version), 'ivf.npz'))
+    if args.activate:
+        registry.activate(model_version)
+    print(f"Published model {model_version} to {args.registry}" + (" and activated it" if args.activate else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Microbenchmarks and an in-process load test of the recommendation backend.
+
+By default synthetic data is generated, a model is trained on it with the ALS
+trainer and served in-process; LLM descriptions come from a stub with a fixed
+latency, so no API key or network access is needed. Results are written as
+JSON to benchmarks/results/ (named by time and git commit), and two result
+files can be compared to spot regressions:
+
+    python -m benchmarks.run run --users 10000 --movies 5000 --ratings 1000000
+    python -m benchmarks.run run --data-dir Data --factors 100
+    python -m benchmarks.run compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class StubLLM:
+    """Answers single and batch description prompts after a fixed delay."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        movies = re.findall(r"^- (\d+): (.*)$", prompt, re.MULTILINE)
+        if movies:
+            return json.dumps({movie_id: f"A synthetic description of {title}." for movie_id, title in movies})
+        return "A synthetic description."
+
+
+def summarize(latencies, wall_seconds):
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {
+        'n': int(len(latencies_ms)),
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'throughput_per_s': float(len(latencies_ms) / wall_seconds) if wall_seconds > 0 else None,
+    }
+
+
+def measure(fn, calls):
+    """Call fn(*args) for each args tuple in turn, timing every call."""
+    latencies = []
+    started = time.perf_counter()
+    for args in calls:
+        call_started = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def set_up(args, work_dir):
+    """Load or generate the data, train a model and serve it in-process. Returns a description of the setup."""
+    from backend import descriptions, recommender
+    from backend.descriptions import DescriptionCache, DescriptionStore
+    from backend.rating_log import RatingLog
+    from backend.ratings_index import RatingsIndex
+    from backend.train import train_final
+
+    data_dir = args.data_dir
+    if data_dir is None:
+        data_dir = os.path.join(work_dir, 'data')
+        started = time.perf_counter()
+        generate(data_dir, args.users, args.movies, args.ratings, seed=args.seed)
+        print(f"Generated synthetic data in {time.perf_counter() - started:.1f}s")
+    movies_df = pd.read_csv(os.path.join(data_dir, 'movies.csv'))
+    movies_df['genres'] = movies_df['genres'].str.split('|')
+    ratings_df = pd.read_csv(os.path.join(data_dir, 'ratings.csv'))
+
+    started = time.perf_counter()
+    params = {'n_factors': args.factors, 'n_epochs': args.epochs, 'reg': 0.1}
+    engine, model_version, _ = train_final(ratings_df, 'als', params, seed=args.seed)
+    train_seconds = time.perf_counter() - started
+    print(f"Trained {args.factors}-factor ALS model in {train_seconds:.1f}s")
+
+    state = recommender.RecommenderState(
+        model_version, engine, RatingsIndex.from_frame(ratings_df, engine.item_index), movies_df,
+        topk_path=os.path.join(work_dir, 'topk'), ann_path=os.path.join(work_dir, 'ivf.npz'),
+    )
+    recommender.warm_state(state)
+    recommender.swap_state(state)
+    recommender.rating_log = RatingLog(os.path.join(work_dir, 'ratings.log.csv'))
+    descriptions._description_cache = DescriptionCache(
+        DescriptionStore(os.path.join(work_dir, 'descriptions.sqlite')),
+        llm_factory=lambda: StubLLM(args.llm_latency),
+    )
+    return {
+        'data_dir': args.data_dir or 'synthetic',
+        'n_users': int(ratings_df['userId'].nunique()),
+        'n_movies': int(len(movies_df)),
+        'n_ratings': int(len(ratings_df)),
+        'n_factors': args.factors,
+        'train_seconds': train_seconds,
+        'llm_latency_ms': 1000 * args.llm_latency,
+    }
+
+
+def run_microbenchmarks(args, rng):
+    from backend import recommender
+
+    state = recommender.get_state()
+    users = state.rating_index.user_ids
+    known = rng.choice(users, args.iterations).tolist()
+    unknown = (int(users.max()) + 1 + np.arange(args.iterations)).tolist()
+    titles = state.movies_df['title'].astype(str).to_numpy()
+    queries = [' '.join(title.split()[:2]) for title in rng.choice(titles, args.iterations)]
+    movie_ids = state.movies_df['movieId'].to_numpy()
+    exclude = state.rating_index.exclusion_mask(known[0], state.engine.n_items)
+
+    # Descriptions of the benchmarked users' recommendations are generated once up front,
+    # so "recommend_user_described" measures the cached path and "describe_misses" the LLM path
+    for user_id in known[:args.iterations // 2]:
+        recommender.get_user_recommendations(user_id, 10, describe=True)
+    batches = [rng.choice(users, args.batch_size).tolist() for _ in range(max(1, args.iterations // 50))]
+    results = {
+        'score_top_n': measure(lambda u: state.engine.top_n(u, 10, exclude), [(u,) for u in known]),
+        'recommend_user': measure(
+            lambda u: recommender.get_user_recommendations(u, 10, describe=False), [(u,) for u in known]),
+        'recommend_user_cold': measure(
+            lambda u: recommender.get_user_recommendations(u, 10, describe=False), [(u,) for u in unknown]),
+        'recommend_user_described': measure(
+            lambda u: recommender.get_user_recommendations(u, 10, describe=True),
+            [(u,) for u in known[:args.iterations // 2]]),
+        'describe_misses': measure(
+            lambda ids: list(recommender.stream_movie_descriptions(ids)),
+            [(rng.choice(movie_ids, 10, replace=False).tolist(),) for _ in range(max(1, args.iterations // 20))]),
+        f'recommend_batch_{args.batch_size}': measure(
+            lambda ids: list(recommender.get_batch_user_recommendations(ids, 10)), [(b,) for b in batches]),
+        'recommend_genre': measure(recommender.get_genre_recommendations, [(u, 1) for u in known]),
+        'search_movies': measure(recommender.search_movies, [(q,) for q in queries]),
+        'add_ratings': measure(
+            recommender.add_user_ratings,
+            [(u, [{'movieId': int(m), 'rating': 4.0} for m in rng.choice(movie_ids, 5, replace=False)])
+             for u in known[:args.iterations // 2]]),
+    }
+    for name, result in results.items():
+        print(f"  {name:28s} p50 {result['p50_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+              f"{result['throughput_per_s']:10.1f}/s")
+    return results
+
+
+async def _load(client, make_request, n_requests, concurrency):
+    latencies, statuses = [], {}
+    next_request = iter(range(n_requests))
+
+    async def worker():
+        for i in next_request:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result['concurrency'] = concurrency
+    result['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+def run_load_test(args, rng):
+    import httpx
+
+    from backend import recommender
+    from backend.app import app
+
+    state = recommender.get_state()
+    users = rng.choice(state.rating_index.user_ids, args.requests).tolist()
+    titles = state.movies_df['title'].astype(str).to_numpy()
+    queries = [title.split()[0] for title in rng.choice(titles, args.requests)]
+    movie_ids = state.movies_df['movieId'].to_numpy()
+    scenarios = {
+        'GET /recommend/user': lambda c, i: c.get(f"/recommend/user/{users[i]}", params={'n': 10, 'describe': 'false'}),
+        'GET /recommend/user?describe': lambda c, i: c.get(f"/recommend/user/{users[i]}", params={'n': 10}),
+        'GET /recommend/genre': lambda c, i: c.get(f"/recommend/genre/{users[i]}"),
+        'GET /movies/search': lambda c, i: c.get("/movies/search", params={'q': queries[i]}),
+        'POST /recommend/users': lambda c, i: c.post(
+            "/recommend/users", json={'user_ids': users[i:i + 50], 'n': 10}),
+        'POST /ratings': lambda c, i: c.post("/ratings", json={
+            'user_id': users[i], 'ratings': [{'movieId': int(movie_ids[i % len(movie_ids)]), 'rating': 3.5}]}),
+    }
+
+    async def run_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            results = {}
+            for name, make_request in scenarios.items():
+                results[name] = await _load(client, make_request, args.requests, args.concurrency)
+                result = results[name]
+                print(f"  {name:28s} p50 {result['p50_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                      f"{result['throughput_per_s']:10.1f}/s  {result['status_codes']}")
+            return results
+
+    return asyncio.run(run_all())
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    logging.disable(getattr(logging, args.log_level))
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as work_dir:
+        setup = set_up(args, work_dir)
+        print("Microbenchmarks:")
+        micro = run_microbenchmarks(args, rng)
+        print(f"Load test ({args.concurrency} concurrent clients, {args.requests} requests per endpoint):")
+        load = run_load_test(args, rng)
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            **setup,
+        },
+        'microbenchmarks': micro,
+        'load_test': load,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    for section in ('microbenchmarks', 'load_test'):
+        print(f"{section}:")
+        for name, new in after.get(section, {}).items():
+            old = before.get(section, {}).get(name)
+            if old is None:
+                print(f"  {name:28s} (new)")
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p99_ms', 'throughput_per_s'):
+                change = 100 * (new[key] - old[key]) / old[key] if old[key] else 0.0
+                deltas.append(f"{key} {old[key]:9.2f} -> {new[key]:9.2f} ({change:+6.1f}%)")
+            print(f"  {name:28s} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation backend.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('run', help="Run the microbenchmarks and the load test.")
+    bench.add_argument('--data-dir', default=None, help="Directory with movies.csv and ratings.csv "
+                                                        "(default: generate synthetic data).")
+    bench.add_argument('--users', type=int, default=10_000)
+    bench.add_argument('--movies', type=int, default=5_000)
+    bench.add_argument('--ratings', type=int, default=1_000_000)
+    bench.add_argument('--factors', type=int, default=50)
+    bench.add_argument('--epochs', type=int, default=5, help="ALS passes when training the benchmark model.")
+    bench.add_argument('--iterations', type=int, default=500, help="Calls per microbenchmark.")
+    bench.add_argument('--batch-size', type=int, default=256)
+    bench.add_argument('--requests', type=int, default=500, help="Requests per load-test endpoint.")
+    bench.add_argument('--concurrency', type=int, default=16)
+    bench.add_argument('--llm-latency', type=float, default=0.05, help="Seconds the stub LLM takes per prompt.")
+    bench.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                       help="Disable backend logging at and below this level (default: INFO).")
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--out', default=None, help="Result file (default: benchmarks/results/<time>-<commit>.json).")
+    diff = sub.add_parser('compare', help="Compare two result files.")
+    diff.add_argument('before')
+    diff.add_argument('after')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
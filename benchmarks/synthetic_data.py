@@ -0,0 +1,113 @@
+"""
+Synthetic MovieLens-style data at configurable scale.
+
+Writes movies.csv (movieId,title,genres) and ratings.csv
+(userId,movieId,rating,timestamp) in the formats the backend reads. User
+activity and movie popularity are heavy-tailed like the real data, and ratings
+come from a low-rank model plus noise, rounded to half stars, so trained models
+have structure to find.
+
+    python -m benchmarks.synthetic_data --out /tmp/synthetic --users 100000 --movies 20000 --ratings 10000000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+GENRES = [
+    'Action', 'Adventure', 'Animation', 'Children', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Fantasy',
+    'Film-Noir', 'Horror', 'IMAX', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western',
+]
+WORDS = [
+    'Last', 'Night', 'City', 'Dream', 'Star', 'Lost', 'Secret', 'Shadow', 'River', 'King', 'Love', 'War',
+    'Blue', 'Dark', 'Summer', 'Road', 'Ghost', 'Island', 'Fire', 'Silent', 'Iron', 'Golden', 'Wild', 'Heart',
+]
+RANK = 8
+
+
+def make_movies(n_movies, rng):
+    # Sparse ids like MovieLens, so nothing relies on movieId == row
+    movie_ids = np.sort(rng.choice(np.arange(1, 4 * n_movies + 1), n_movies, replace=False))
+    words = rng.integers(0, len(WORDS), (n_movies, 3))
+    years = rng.integers(1920, 2024, n_movies)
+    titles = [
+        f"{WORDS[a]} {WORDS[b]} {WORDS[c]} {movie_id} ({year})"
+        for (a, b, c), movie_id, year in zip(words, movie_ids, years)
+    ]
+    n_genres = rng.integers(1, 4, n_movies)
+    genres = ['|'.join(rng.choice(GENRES, k, replace=False)) for k in n_genres]
+    return pd.DataFrame({'movieId': movie_ids, 'title': titles, 'genres': genres})
+
+
+def ratings_per_user(n_users, n_ratings, n_movies, rng):
+    """Heavy-tailed ratings counts (at least 1, at most n_movies) summing to about n_ratings."""
+    weights = rng.pareto(1.5, n_users) + 1.0
+    counts = np.maximum(1, np.round(weights / weights.sum() * n_ratings)).astype(np.int64)
+    return np.minimum(counts, n_movies)
+
+
+def generate(out_dir, n_users=10_000, n_movies=5_000, n_ratings=1_000_000, seed=0, chunk_ratings=2_000_000):
+    """Write movies.csv and ratings.csv to `out_dir`; returns the number of ratings written."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    movies = make_movies(n_movies, rng)
+    movies.to_csv(os.path.join(out_dir, 'movies.csv'), index=False)
+
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity = rng.permutation(popularity / popularity.sum())
+    item_factors = rng.normal(0, 0.35, (n_movies, RANK)).astype(np.float32)
+    item_bias = rng.normal(0, 0.4, n_movies).astype(np.float32)
+
+    counts = ratings_per_user(n_users, n_ratings, n_movies, rng)
+    bounds = np.searchsorted(np.cumsum(2 * counts), np.arange(chunk_ratings, 2 * counts.sum(), chunk_ratings))
+    path = os.path.join(out_dir, 'ratings.csv')
+    written = 0
+    for chunk, users in enumerate(np.split(np.arange(n_users), bounds)):
+        if len(users) == 0:
+            continue
+        chunk_counts = counts[users]
+        # Popular movies get drawn repeatedly, so draw extra and keep a random subset of each user's distinct ones
+        user_rows = np.repeat(np.arange(len(users)), 2 * chunk_counts)
+        items = rng.choice(n_movies, len(user_rows), p=popularity)
+        keep = np.unique(user_rows.astype(np.int64) * n_movies + items, return_index=True)[1]
+        user_rows, items = user_rows[keep], items[keep]
+        order = np.lexsort((rng.random(len(items)), user_rows))
+        user_rows, items = user_rows[order], items[order]
+        starts = np.searchsorted(user_rows, np.arange(len(users)))
+        keep = np.arange(len(user_rows)) - starts[user_rows] < chunk_counts[user_rows]
+        user_rows, items = user_rows[keep], items[keep]
+        user_factors = rng.normal(0, 0.35, (len(users), RANK)).astype(np.float32)
+        user_bias = rng.normal(0, 0.3, len(users)).astype(np.float32)
+        scores = (3.5 + user_bias[user_rows] + item_bias[items]
+                  + np.einsum('ij,ij->i', user_factors[user_rows], item_factors[items])
+                  + rng.normal(0, 0.5, len(items)))
+        frame = pd.DataFrame({
+            'userId': users[user_rows] + 1,
+            'movieId': movies['movieId'].to_numpy()[items],
+            'rating': np.clip(np.round(scores * 2) / 2, 0.5, 5.0),
+            'timestamp': rng.integers(946684800, 1700000000, len(items)),
+        })
+        frame.to_csv(path, index=False, mode='w' if chunk == 0 else 'a', header=chunk == 0)
+        written += len(frame)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic movies.csv and ratings.csv.")
+    parser.add_argument('--out', required=True, help="Directory to write the CSVs to.")
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--movies', type=int, default=5_000)
+    parser.add_argument('--ratings', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    written = generate(args.out, args.users, args.movies, args.ratings, seed=args.seed)
+    print(f"Wrote {args.movies} movies and {written} ratings by {args.users} users to {args.out} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
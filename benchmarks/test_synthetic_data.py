@@ -0,0 +1,21 @@
+"""
+Tests for the synthetic data generator.
+Run with: pytest benchmarks/test_synthetic_data.py
+"""
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate
+
+
+def test_generated_csvs_match_the_movielens_format(tmp_path):
+    written = generate(str(tmp_path), n_users=200, n_movies=100, n_ratings=5000, chunk_ratings=1000)
+    movies = pd.read_csv(tmp_path / 'movies.csv')
+    ratings = pd.read_csv(tmp_path / 'ratings.csv')
+    assert list(movies.columns) == ['movieId', 'title', 'genres']
+    assert list(ratings.columns) == ['userId', 'movieId', 'rating', 'timestamp']
+    assert len(ratings) == written
+    assert ratings['userId'].nunique() == 200
+    assert ratings['movieId'].isin(movies['movieId']).all()
+    assert not ratings.duplicated(['userId', 'movieId']).any()
+    assert ratings['rating'].between(0.5, 5.0).all() and (ratings['rating'] * 2 % 1 == 0).all()
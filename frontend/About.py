@@ -14,7 +14,6 @@ def load_readme(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-st.set_page_config(page_title="About - Netflix Recommendation System")
 st.title("ℹ️ About This Project")
 st.markdown("Use the sidebar to navigate between features.")
 
@@ -1,21 +1,4 @@
 import streamlit as st
-import os
-
-st.set_page_config(page_title="Netflix Recommendation System", layout="wide")
-
-# Sidebar navigation
-st.sidebar.title("Navigation")
-pages = {
-    "Home": "Home.py",
-    "Recommendations": "Recommend.py",
-    "Chatbot": "Chatbot.py",
-    "About": "About.py"
-}
-selected_page = st.sidebar.radio("Go to", list(pages.keys()))
-
-if selected_page != "Home":
-    os.system(f"streamlit run frontend/{pages[selected_page]}")
-    st.stop()
 
 st.title("Netflix Recommendation System")
 st.markdown("""
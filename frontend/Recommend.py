@@ -1,41 +1,31 @@
 import streamlit as st
-import requests
+from backend_client import fetch_recommendations, fetch_genre_recommendations, stream_descriptions
 from examples import get_example_user_ids
 
 st.title("🎬 Movie Recommendations")
 st.markdown("Use the sidebar to navigate between features.")
 
 
-def fetch_recommendations(user_id: int):
+def show_recommendations(recommendations, user_id):
     """
-    Fetch top-N movie recommendations for a user from the backend API.
+    Render recommendations at once and fill in their descriptions as they arrive.
 
     Args:
-        user_id (int): The user ID.
-
-    Returns:
-        list: List of recommended movies or None if error.
-    """
-    resp = requests.get(f"http://localhost:8000/recommend/user/{user_id}")
-    if resp.status_code == 200:
-        return resp.json()
-    return {"success": False, "recommendations": None, "error": f"Status code: {resp.status_code}", "validation_error": None}
-
-
-def fetch_genre_recommendations(user_id: int):
-    """
-    Fetch best movie per genre for a user from the backend API.
-
-    Args:
-        user_id (int): The user ID.
-
-    Returns:
-        list: List of recommendations or None if error.
+        recommendations (list): Recommended movies without descriptions.
+        user_id (int): User they were recommended to.
     """
-    resp = requests.get(f"http://localhost:8000/recommend/genre/{user_id}")
-    if resp.status_code == 200:
-        return resp.json()
-    return {"success": False, "genre_recommendations": None, "error": f"Status code: {resp.status_code}", "validation_error": None}
+    slots = {}
+    for rec in recommendations:
+        st.markdown(f"**{rec['title']}** · {', '.join(rec['genres'])}")
+        slots[rec["movieId"]] = st.empty()
+        slots[rec["movieId"]].caption("Loading description...")
+    try:
+        for update in stream_descriptions(list(slots), user_id):
+            slot = slots.get(update["movieId"])
+            if slot is not None:
+                slot.write(update["description"] or "Description unavailable.")
+    except Exception as e:
+        st.warning(f"Could not load descriptions: {e}")
 
 
 example_ids = get_example_user_ids()
@@ -52,7 +42,7 @@ with col1:
             st.error(recs.get("error") or "Unknown error.")
         else:
             st.success("Recommendations:")
-            st.write(recs.get("recommendations"))
+            show_recommendations(recs.get("recommendations"), user_id)
 
 with col2:
     if st.button("Get Genre Recommendations"):
@@ -73,4 +63,4 @@ if st.button("Test with Example User (ID 1)"):
         st.error(recs.get("error") or "Unknown error.")
     else:
         st.success("Example recommendations for User 1:")
-        st.write(recs.get("recommendations"))
+        show_recommendations(recs.get("recommendations"), 1)
@@ -0,0 +1,13 @@
+import streamlit as st
+
+# Entry point of the multipage app: `streamlit run frontend/app.py`.
+# Pages run in this process on navigation, so switching pages does not start a new server.
+st.set_page_config(page_title="Netflix Recommendation System", layout="wide")
+
+pages = [
+    st.Page("Home.py", title="Home", icon="🏠", default=True),
+    st.Page("Recommend.py", title="Recommendations", icon="🎬"),
+    st.Page("Chatbot.py", title="Chatbot", icon="🤖"),
+    st.Page("About.py", title="About", icon="ℹ️"),
+]
+st.navigation(pages).run()
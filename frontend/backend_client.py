@@ -0,0 +1,158 @@
+"""
+Shared client for the recommendation backend, used by every page.
+
+All pages and user sessions of the Streamlit process share one pooled HTTP
+session. Recommendation responses are cached per user with a TTL in a single
+bounded cache, so repeat views do not hit the backend and memory does not grow
+with the number of sessions. Failed calls are never cached.
+
+Configure with BACKEND_URL, BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT,
+BACKEND_CHATBOT_TIMEOUT, FRONTEND_CACHE_TTL and FRONTEND_CACHE_MAX_ENTRIES.
+"""
+
+import json
+import os
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000").rstrip("/")
+CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "30"))
+# An agent run may take up to the backend's CHATBOT_TIMEOUT (60s by default)
+CHATBOT_READ_TIMEOUT = float(os.getenv("BACKEND_CHATBOT_TIMEOUT", "65"))
+CACHE_TTL = int(os.getenv("FRONTEND_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("FRONTEND_CACHE_MAX_ENTRIES", "1000"))
+POOL_SIZE = 20
+
+
+class BackendError(Exception):
+    pass
+
+
+@st.cache_resource
+def get_session():
+    """One pooled HTTP session for the whole Streamlit process."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_json(path, params=None):
+    """GET a backend endpoint; raises BackendError if it cannot be reached or does not answer 200."""
+    try:
+        resp = get_session().get(f"{BACKEND_URL}{path}", params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except requests.RequestException as e:
+        raise BackendError(f"Error contacting the backend: {e}")
+    if resp.status_code != 200:
+        raise BackendError(f"Status code: {resp.status_code}")
+    return resp.json()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_recommendations(user_id, n, describe):
+    return _get_json(f"/recommend/user/{user_id}", {"n": n, "describe": describe})
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_genre_recommendations(user_id, n):
+    return _get_json(f"/recommend/genre/{user_id}", {"n": n})
+
+
+def fetch_recommendations(user_id: int, n: int = 10, describe: bool = False):
+    """
+    Fetch top-N movie recommendations for a user, cached for FRONTEND_CACHE_TTL seconds.
+
+    Args:
+        user_id (int): The user ID.
+        n (int): Number of recommendations.
+        describe (bool): Wait for LLM descriptions instead of streaming them afterwards.
+
+    Returns:
+        dict: The backend response, or an error response if the call failed.
+    """
+    try:
+        return _cached_recommendations(int(user_id), n, describe)
+    except BackendError as e:
+        return {"success": False, "recommendations": None, "error": str(e), "validation_error": None}
+
+
+def fetch_genre_recommendations(user_id: int, n: int = 1):
+    """
+    Fetch the best movies per genre for a user, cached for FRONTEND_CACHE_TTL seconds.
+
+    Args:
+        user_id (int): The user ID.
+        n (int): Movies per genre.
+
+    Returns:
+        dict: The backend response, or an error response if the call failed.
+    """
+    try:
+        return _cached_genre_recommendations(int(user_id), n)
+    except BackendError as e:
+        return {"success": False, "genre_recommendations": None, "error": str(e), "validation_error": None}
+
+
+def stream_descriptions(movie_ids, user_id=None):
+    """
+    Stream movie descriptions from the backend as they are generated.
+
+    If the stream cannot be opened, the descriptions of a user's recommendations
+    are fetched at once instead (describe=True).
+
+    Args:
+        movie_ids (list): Movie IDs to describe.
+        user_id (int): User the movies were recommended to, for the fallback.
+
+    Yields:
+        dict: Description update with movieId, description and description_status.
+
+    Raises:
+        BackendError: If neither the stream nor the fallback succeeds.
+    """
+    try:
+        with get_session().get(f"{BACKEND_URL}/movies/descriptions", params={"movie_ids": movie_ids},
+                               stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+            if resp.status_code == 200:
+                for line in resp.iter_lines():
+                    if line:
+                        yield json.loads(line)
+                return
+            error = f"Status code: {resp.status_code}"
+    except requests.ConnectionError as e:
+        error = f"Error contacting the backend: {e}"
+    if user_id is None:
+        raise BackendError(error)
+    recs = fetch_recommendations(user_id, len(movie_ids), describe=True)
+    if not recs.get("success"):
+        raise BackendError(recs.get("error") or recs.get("validation_error") or error)
+    wanted = set(movie_ids)
+    for rec in recs["recommendations"]:
+        if rec["movieId"] in wanted:
+            yield {key: rec.get(key) for key in ("movieId", "description", "description_status")}
+
+
+def ask_chatbot(message: str):
+    """
+    Send a message to the chatbot backend and return the structured response.
+
+    Args:
+        message (str): User's message.
+
+    Returns:
+        dict: Structured chatbot response.
+    """
+    try:
+        resp = get_session().post(f"{BACKEND_URL}/chatbot", json={"message": message},
+                                  timeout=(CONNECT_TIMEOUT, CHATBOT_READ_TIMEOUT))
+        if resp.status_code in (200, 503, 504):
+            # Busy (503) and timed-out (504) answers carry a structured error too
+            return resp.json()
+        else:
+            return {"success": False, "response": None, "error": f"Error contacting chatbot. Status code: {resp.status_code}", "validation_error": None}
+    except Exception as e:
+        return {"success": False, "response": None, "error": f"Error contacting chatbot: {e}", "validation_error": None}
@@ -1,24 +1,35 @@
 """
 Basic tests for the Streamlit Netflix Recommendation app.
+They need a running backend (BACKEND_URL, default http://localhost:8000) and are skipped otherwise.
 Run with: pytest test_app.py
 """
 
+import os
+
 import pytest
 import requests
 import logging
 
 
-BACKEND_URL = "http://localhost:8000"
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger("TestApp")
 
+try:
+    requests.get(f"{BACKEND_URL}/docs", timeout=2)
+except requests.ConnectionError:
+    pytest.skip(f"No backend running at {BACKEND_URL}", allow_module_level=True)
+
 @pytest.mark.parametrize("user_id", [1, 10, 50])
 def test_recommendations_endpoint(user_id):
     logger.info(f"Testing /recommend/user/{user_id}")
-    resp = requests.get(f"{BACKEND_URL}/recommend/user/{user_id}")
+    resp = requests.get(f"{BACKEND_URL}/recommend/user/{user_id}", params={"describe": False})
     logger.info(f"Response: {resp.status_code} {resp.text}")
     assert resp.status_code == 200
-    assert isinstance(resp.json(), list)
+    data = resp.json()
+    assert data["success"], data
+    assert isinstance(data["recommendations"], list)
+    assert {"movieId", "title", "genres"} <= set(data["recommendations"][0])
 
 @pytest.mark.parametrize("user_id", [1, 10, 50])
 def test_genre_recommendations_endpoint(user_id):
@@ -26,7 +37,10 @@ def test_genre_recommendations_endpoint(user_id):
     resp = requests.get(f"{BACKEND_URL}/recommend/genre/{user_id}")
     logger.info(f"Response: {resp.status_code} {resp.text}")
     assert resp.status_code == 200
-    assert isinstance(resp.json(), list)
+    data = resp.json()
+    assert data["success"], data
+    assert isinstance(data["genre_recommendations"], list)
+    assert {"genres", "movieId", "pred_rating"} <= set(data["genre_recommendations"][0])
 
 def test_chatbot_endpoint():
     logger.info("Testing /chatbot endpoint")